@@ -2,14 +2,11 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
 
-class TokenHandlerMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        response = self.get_response(request)
-        return response
+class TokenHandlerMiddleware(MiddlewareMixin):
+    # MiddlewareMixin makes this usable in both sync and async request stacks,
+    # so async views under ASGI aren't forced through a thread here.
 
     def process_exception(self, request, exception):
         if isinstance(exception, (TokenError, InvalidToken)):
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Single-flight defaults. The lock must outlive the worst-case computation,
+# and followers should wait about as long, or they all compute on their own
+# exactly when upstream is slow. Callers with slow computations pass timeouts
+# derived from their own worst case (see SEARCH_LOCK_TIMEOUT in `api.youtube`).
+SINGLE_FLIGHT_LOCK_TIMEOUT = 20  # seconds
+SINGLE_FLIGHT_WAIT_TIMEOUT = 12  # seconds a follower waits before computing itself
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05  # seconds
+
+# Background refreshes of stale-while-revalidate entries.
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+
+def _lock_key(cache_key):
+    return f"{cache_key}:lock"
+
+
+def _release_lock(lock_key, token):
+    # Only release a lock we still own; it may have expired and been taken
+    # over by another worker in the meantime.
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+async def _arelease_lock(lock_key, token):
+    if await cache.aget(lock_key) == token:
+        await cache.adelete(lock_key)
+
+
+def single_flight(cache_key, compute, lock_timeout=SINGLE_FLIGHT_LOCK_TIMEOUT,
+                  wait_timeout=SINGLE_FLIGHT_WAIT_TIMEOUT, poll_interval=SINGLE_FLIGHT_POLL_INTERVAL,
+                  read=None):
+    """
+    Coalesce concurrent computations of the same cache entry.
+
+    The caller that wins `cache.add()` on `<cache_key>:lock` runs `compute()`,
+    which is expected to store its result under `cache_key` itself (it knows the
+    right TTL) and return it. Everyone else polls `cache_key` (through `read`,
+    `cache.get` by default) until the value appears. If the leader releases the
+    lock without caching anything (e.g. an upstream error), the next waiter
+    takes over; after `wait_timeout` a waiter gives up and computes on its own.
+
+    The lock lives in the Django cache, so with Redis it coalesces across
+    gunicorn workers and hosts. With LocMemCache it only covers one process.
+    """
+    read = read or cache.get
+    lock_key = _lock_key(cache_key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait_timeout
+
+    while True:
+        if cache.add(lock_key, token, timeout=lock_timeout):
+            try:
+                return compute()
+            finally:
+                _release_lock(lock_key, token)
+
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(poll_interval)
+        cached = read(cache_key)
+        if cached is not None:
+            logger.info(f"Single-flight: served {cache_key} computed by another worker")
+            return cached
+
+    logger.warning(f"Single-flight: timed out waiting for {cache_key}, computing without the lock")
+    return compute()
+
+
+async def asingle_flight(cache_key, compute, lock_timeout=SINGLE_FLIGHT_LOCK_TIMEOUT,
+                         wait_timeout=SINGLE_FLIGHT_WAIT_TIMEOUT, poll_interval=SINGLE_FLIGHT_POLL_INTERVAL,
+                         read=None):
+    """
+    Async variant of `single_flight()`: `compute` and `read` are coroutine
+    functions, and waiting followers sleep without blocking the event loop.
+    Uses the same lock key, so sync and async callers coalesce with each other.
+    """
+    read = read or cache.aget
+    lock_key = _lock_key(cache_key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait_timeout
+
+    while True:
+        if await cache.aadd(lock_key, token, timeout=lock_timeout):
+            try:
+                return await compute()
+            finally:
+                await _arelease_lock(lock_key, token)
+
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(poll_interval)
+        cached = await read(cache_key)
+        if cached is not None:
+            logger.info(f"Single-flight: served {cache_key} computed by another worker")
+            return cached
+
+    logger.warning(f"Single-flight: timed out waiting for {cache_key}, computing without the lock")
+    return await compute()
+
+
+def _soft_expiry_entry(value, soft_timeout):
+    now = time.time()
+    return {
+        'swr': 1,
+        'value': value,
+        'stored_at': now,
+        'soft_expires_at': now + soft_timeout,
+    }
+
+
+def _unwrap_soft_expiry(entry):
+    if entry is None:
+        return None
+    if not (isinstance(entry, dict) and entry.get('swr') == 1):
+        return entry, 0, False
+    now = time.time()
+    return entry['value'], max(0.0, now - entry['stored_at']), now >= entry['soft_expires_at']
+
+
+def set_with_soft_expiry(cache_key, value, soft_timeout, hard_timeout):
+    """
+    Store `value` with a soft and a hard expiry.
+
+    The cache backend evicts the entry after `hard_timeout`. Between
+    `soft_timeout` and `hard_timeout` the value is still returned, but flagged
+    as stale so the caller can serve it and refresh it in the background.
+    """
+    cache.set(cache_key, _soft_expiry_entry(value, soft_timeout), timeout=hard_timeout)
+
+
+async def aset_with_soft_expiry(cache_key, value, soft_timeout, hard_timeout):
+    await cache.aset(cache_key, _soft_expiry_entry(value, soft_timeout), timeout=hard_timeout)
+
+
+def get_with_soft_expiry(cache_key):
+    """
+    Read an entry written by `set_with_soft_expiry`.
+
+    Returns a `(value, age_seconds, is_stale)` tuple, or None on a miss.
+    Plain values written before soft expiry was introduced are treated as fresh.
+    """
+    return _unwrap_soft_expiry(cache.get(cache_key))
+
+
+async def aget_with_soft_expiry(cache_key):
+    return _unwrap_soft_expiry(await cache.aget(cache_key))
+
+
+def get_value_with_soft_expiry(cache_key):
+    """Like `get_with_soft_expiry`, but return only the value (or None)."""
+    entry = get_with_soft_expiry(cache_key)
+    return entry[0] if entry is not None else None
+
+
+async def aget_value_with_soft_expiry(cache_key):
+    entry = await aget_with_soft_expiry(cache_key)
+    return entry[0] if entry is not None else None
+
+
+def refresh_in_background(cache_key, compute, lock_timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+    """
+    Schedule one background run of `compute()` to refresh `cache_key`.
+
+    Shares the single-flight lock of the key, so at most one refresh (or
+    foreground computation) runs at a time across workers. Returns True if a
+    refresh was scheduled, False if one is already in progress.
+    """
+    lock_key = _lock_key(cache_key)
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, timeout=lock_timeout):
+        return False
+
+    def run():
+        try:
+            compute()
+        except Exception:
+            logger.exception(f"Background refresh of {cache_key} failed")
+        finally:
+            _release_lock(lock_key, token)
+
+    _refresh_executor.submit(run)
+    logger.info(f"Scheduled background refresh of {cache_key}")
+    return True
+
+
+class TwoTierCache:
+    """
+    Bounded per-process LRU with a short TTL in front of the shared Django cache.
+
+    Meant for small, hot, rarely-changing entries (video stats, channel
+    thumbnails). Reads check the local tier first and fall back to one
+    `get_many` on the shared cache; writes go to both tiers. Values held in the
+    local tier are shared between callers and must be treated as read-only.
+
+    `delete()` evicts from both tiers of this process; other processes drop
+    their local copy when its `local_timeout` runs out.
+    """
+
+    def __init__(self, max_entries=4096, local_timeout=300):
+        self.max_entries = max_entries
+        self.local_timeout = local_timeout
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {'lookups': 0, 'local_hits': 0, 'shared_hits': 0}
+
+    def get_many(self, keys):
+        """Return a dict of the keys found in either tier."""
+        keys = list(keys)
+        found, missing = self._get_local(keys)
+        shared = cache.get_many(missing) if missing else {}
+        return self._merge_shared(keys, found, missing, shared)
+
+    async def aget_many(self, keys):
+        """Async variant of `get_many()`; only the shared tier is awaited."""
+        keys = list(keys)
+        found, missing = self._get_local(keys)
+        shared = await cache.aget_many(missing) if missing else {}
+        return self._merge_shared(keys, found, missing, shared)
+
+    def set_many(self, mapping, timeout):
+        cache.set_many(mapping, timeout=timeout)
+        self._store_local(mapping, timeout)
+
+    async def aset_many(self, mapping, timeout):
+        await cache.aset_many(mapping, timeout=timeout)
+        self._store_local(mapping, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        cache.delete(key)
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit counts and ratios per tier. The shared ratio is over local misses."""
+        with self._lock:
+            lookups = self._counters['lookups']
+            local_hits = self._counters['local_hits']
+            shared_hits = self._counters['shared_hits']
+            size = len(self._entries)
+        shared_lookups = lookups - local_hits
+        return {
+            'lookups': lookups,
+            'local': {
+                'hits': local_hits,
+                'hit_ratio': round(local_hits / lookups, 4) if lookups else 0.0,
+                'size': size,
+                'max_entries': self.max_entries,
+            },
+            'shared': {
+                'hits': shared_hits,
+                'hit_ratio': round(shared_hits / shared_lookups, 4) if shared_lookups else 0.0,
+            },
+            'misses': shared_lookups - shared_hits,
+        }
+
+    def _get_local(self, keys):
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(key)
+        return found, missing
+
+    def _merge_shared(self, keys, found, missing, shared):
+        if shared:
+            self._store_local(shared)
+            found.update(shared)
+
+        with self._lock:
+            self._counters['lookups'] += len(keys)
+            self._counters['local_hits'] += len(keys) - len(missing)
+            self._counters['shared_hits'] += len(shared)
+        return found
+
+    def _store_local(self, mapping, timeout=None):
+        local_timeout = self.local_timeout if timeout is None else min(self.local_timeout, timeout)
+        expires_at = time.monotonic() + local_timeout
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,153 @@
+"""
+Durable video metadata catalog: the `Video` table.
+
+Video details are looked up in the per-process LRU, then the shared cache
+(both in `api.youtube.detail_cache`), then here, and only then fetched from
+YouTube. The caches are lost on a Redis flush or, with LocMemCache, on every
+deploy; the catalog is not, so refilling them costs a few `id__in` reads
+instead of quota. Fetched videos are written through to the catalog by a
+single writer thread, after the search that fetched them has its results, and
+rows older than VIDEO_CATALOG_MAX_AGE are refreshed in bulk by the
+`refresh_video_catalog` command. Videos a successful `videos.list` call no
+longer returns (deleted or made private) are dropped from the catalog.
+
+Lookups run on the enrichment worker threads as well as on request threads.
+The catalog is only a cache tier: database errors are logged and treated as
+misses. Each worker thread keeps one connection for its lifetime (no request
+cycle closes it), drops it after a database error so the next lookup
+reconnects, and has it closed at exit once the pools have shut down.
+"""
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from decouple import config
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Video
+from .video_records import VideoRecord, record_from_api_item
+
+logger = logging.getLogger(__name__)
+
+VIDEO_CATALOG_MAX_AGE = config('VIDEO_CATALOG_MAX_AGE', default=7 * 86400, cast=int)  # seconds
+CATALOG_WRITE_BATCH_SIZE = 500
+
+RECORD_FIELDS = ('view_count', 'like_count', 'comment_count', 'duration_seconds')
+UPDATE_FIELDS = (
+    'title', 'channel_id', 'channel_title', 'thumbnails', 'published_at', 'fetched_at'
+) + RECORD_FIELDS
+
+_thread_state = threading.local()
+_worker_connections = []  # the connection of every worker thread, closed at exit
+_worker_connections_lock = threading.Lock()
+
+
+def mark_worker_thread():
+    """ThreadPoolExecutor initializer for pools whose threads use the catalog."""
+    _thread_state.worker = True
+    with _worker_connections_lock:
+        _worker_connections.append(connections[DEFAULT_DB_ALIAS])
+
+
+def _close_worker_connections():
+    # Runs after the executors' own exit hooks have joined their threads.
+    with _worker_connections_lock:
+        for connection in _worker_connections:
+            connection.inc_thread_sharing()
+            connection.close()
+        _worker_connections.clear()
+
+
+atexit.register(_close_worker_connections)
+
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-write',
+                                     initializer=mark_worker_thread)
+
+
+@contextmanager
+def _guarded_db(action):
+    try:
+        yield
+    except DatabaseError as e:
+        logger.error(f"Video catalog {action} failed: {str(e)}")
+        if getattr(_thread_state, 'worker', False):
+            # The connection may be broken; the thread's next lookup reconnects.
+            connections[DEFAULT_DB_ALIAS].close()
+
+
+def _record(video):
+    return VideoRecord(**{field: getattr(video, field) for field in RECORD_FIELDS})
+
+
+def get_records(video_ids, include_stale=False):
+    """
+    Catalog `VideoRecord`s for `video_ids`, read with one `id__in` query.
+    Rows older than VIDEO_CATALOG_MAX_AGE are skipped unless `include_stale`
+    (e.g. when quota is too tight to refetch them).
+    """
+    if not video_ids:
+        return {}
+    queryset = Video.objects.filter(id__in=list(video_ids)).only('id', *RECORD_FIELDS)
+    if not include_stale:
+        queryset = queryset.filter(fetched_at__gte=timezone.now() - timedelta(seconds=VIDEO_CATALOG_MAX_AGE))
+    records = {}
+    with _guarded_db("read"):
+        records = {video.id: _record(video) for video in queryset}
+    return records
+
+
+def video_from_api_item(item, fetched_at=None):
+    """Build an unsaved `Video` from a `videos.list` item (snippet, contentDetails, statistics)."""
+    snippet = item.get('snippet', {})
+    record = record_from_api_item(item)
+    return Video(
+        id=item['id'],
+        title=snippet.get('title', '')[:255],
+        channel_id=snippet.get('channelId', ''),
+        channel_title=snippet.get('channelTitle', '')[:255],
+        thumbnails=snippet.get('thumbnails', {}),
+        published_at=parse_datetime(snippet.get('publishedAt') or ''),
+        fetched_at=fetched_at or timezone.now(),
+        **record._asdict(),
+    )
+
+
+def save_api_items(items, requested_ids=()):
+    """
+    Upsert `videos.list` items into the catalog, and delete the rows of
+    `requested_ids` that the (successful) call did not return.
+    """
+    now = timezone.now()
+    videos = [video_from_api_item(item, now) for item in items]
+    gone = set(requested_ids) - {video.id for video in videos}
+    if not videos and not gone:
+        return
+    with _guarded_db("write"):
+        if videos:
+            Video.objects.bulk_create(
+                videos,
+                batch_size=CATALOG_WRITE_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=list(UPDATE_FIELDS),
+            )
+        if gone:
+            Video.objects.filter(id__in=gone).delete()
+
+
+def save_api_items_later(items, requested_ids=()):
+    """Hand `save_api_items()` to the catalog writer thread and return at once."""
+    _write_executor.submit(save_api_items, items, requested_ids)
+
+
+def stale_video_ids(max_age=VIDEO_CATALOG_MAX_AGE, limit=None):
+    """IDs of catalog rows fetched more than `max_age` seconds ago, oldest first."""
+    queryset = Video.objects.filter(
+        fetched_at__lt=timezone.now() - timedelta(seconds=max_age)
+    ).order_by('fetched_at').values_list('id', flat=True)
+    return list(queryset[:limit] if limit else queryset)
@@ -0,0 +1,172 @@
+"""
+Bulk import of watch history (e.g. a Google Takeout `watch-history.json`, or
+records exported from another device) into `WatchedVideo`.
+
+The file is parsed incrementally with `json.JSONDecoder.raw_decode`, so only
+the current read buffer and one chunk of rows are held in memory whatever the
+file size. Both a top-level JSON array and JSON Lines are accepted. Each
+chunk is written with one `bulk_create(update_conflicts=True)`: new videos are
+inserted, and videos already in the history only get a later `watched_at`.
+"""
+import datetime
+import json
+import logging
+import re
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import WatchedVideo
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024  # characters read from the file at a time
+MAX_ENTRY_SIZE = 1024 * 1024  # larger "entries" mean the file is not valid JSON
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,\[\]]*")
+
+
+def iter_json_objects(stream, read_size=READ_SIZE):
+    """
+    Yield the objects of a JSON array (or of JSON Lines) read from the text
+    stream `stream`, without loading the whole document.
+    """
+    buffer, pos, eof = "", 0, False
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer):
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or len(buffer) - pos > MAX_ENTRY_SIZE:
+                    raise ValueError(f"Invalid JSON near: {buffer[pos:pos + 80]!r}")
+            else:
+                # A value ending exactly at the buffer's end may be cut short
+                # (e.g. a number); read on unless the stream is exhausted.
+                if end < len(buffer) or eof:
+                    pos = end
+                    yield value
+                    continue
+        elif eof:
+            return
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def _parse_time(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def normalize_record(entry):
+    """
+    Map one history entry to `WatchedVideo` field values, or None if it can't
+    be imported. Understands Takeout entries (`titleUrl`, `time`, `subtitles`)
+    and this API's own watched-video format (`video_id`, `watched_at`, ...).
+    """
+    if not isinstance(entry, dict):
+        return None
+    if 'titleUrl' in entry:
+        # Takeout: {"title": "Watched <title>", "titleUrl": "https://www.youtube.com/watch?v=<id>",
+        #           "subtitles": [{"name": <channel>}], "time": <ISO 8601>}
+        video_id = parse_qs(urlparse(entry['titleUrl']).query).get('v', [None])[0]
+        watched_at = _parse_time(entry.get('time'))
+        title = entry.get('title') or ''
+        if title.startswith('Watched '):
+            title = title[len('Watched '):]
+        channels = entry.get('subtitles') or [{}]
+        record = {
+            'video_id': video_id,
+            'title': title,
+            'channel_title': channels[0].get('name') or '',
+            'watched_at': watched_at,
+            # Takeout has no publish date; the watch time is the closest known bound.
+            'published_at': watched_at,
+        }
+    else:
+        record = {
+            'video_id': entry.get('video_id'),
+            'title': entry.get('title') or '',
+            'description': entry.get('description') or '',
+            'thumbnail': entry.get('thumbnail') or '',
+            'channel_title': entry.get('channel_title') or '',
+            'published_at': _parse_time(entry.get('published_at')),
+            'watched_at': _parse_time(entry.get('watched_at')) or timezone.now(),
+            'likes': entry.get('likes') or 0,
+            'comment_count': entry.get('comment_count') or 0,
+            'duration': entry.get('duration') or '',
+        }
+    if not isinstance(record['video_id'], str) or not record['video_id'] or not record['title'] or not record['published_at'] or not record['watched_at']:
+        return None
+    record['video_id'] = record['video_id'][:100]
+    record['title'] = record['title'][:255]
+    record['channel_title'] = record['channel_title'][:255]
+    return record
+
+
+def _write_chunk(user, records):
+    """Upsert one chunk of normalized records; returns (rows written, rows skipped as older)."""
+    latest = {}
+    for record in records:
+        current = latest.get(record['video_id'])
+        if current is None or record['watched_at'] > current['watched_at']:
+            latest[record['video_id']] = record
+
+    # Never move an existing entry's watched_at backwards.
+    stored = dict(WatchedVideo.objects.filter(user=user, video_id__in=latest.keys()).values_list(
+        'video_id', 'watched_at'
+    ))
+    rows = [
+        WatchedVideo(user=user, **record)
+        for video_id, record in latest.items()
+        if video_id not in stored or record['watched_at'] > stored[video_id]
+    ]
+    WatchedVideo.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'video_id'],
+        update_fields=['watched_at'],
+    )
+    return len(rows), len(records) - len(rows)
+
+
+def import_watch_history(user, stream, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import the history entries read from the text stream `stream` for `user`.
+
+    Returns a dict with the number of entries read, rows written, entries
+    skipped (invalid, duplicates or older than the stored entry), the elapsed
+    seconds and the rows written per second.
+    """
+    started = time.perf_counter()
+    stats = {'read': 0, 'written': 0, 'skipped': 0}
+    chunk = []
+    for entry in iter_json_objects(stream):
+        stats['read'] += 1
+        record = normalize_record(entry)
+        if record is None:
+            stats['skipped'] += 1
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            written, skipped = _write_chunk(user, chunk)
+            stats['written'] += written
+            stats['skipped'] += skipped
+            chunk = []
+    if chunk:
+        written, skipped = _write_chunk(user, chunk)
+        stats['written'] += written
+        stats['skipped'] += skipped
+
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['written'] / elapsed) if elapsed else stats['written']
+    logger.info(f"Imported watch history for user {user.pk}: {stats}")
+    return stats
@@ -0,0 +1,116 @@
+"""
+Keyword sets used by search relevance scoring, and a matcher for them.
+
+The sets are plain data: the defaults below can be replaced per set through
+the SEARCH_KEYWORD_SETS setting, e.g.
+
+    SEARCH_KEYWORD_SETS = {'educational_channel': ['academy', 'school', 'lectures']}
+
+Each set is compiled once, at import time, into a `KeywordMatcher`: a single
+regular expression shaped like a trie of the keywords (shared prefixes are
+factored out), so a text is scanned once per set instead of once per keyword.
+"""
+import re
+
+from django.conf import settings
+
+DEFAULT_KEYWORD_SETS = {
+    'educational': [
+        'tutorial', 'learn', 'lesson', 'course', 'education', 'training',
+        'guide', 'explanation', 'explained', 'introduction', 'basics',
+        'how to', 'beginner', 'instructor', 'teaching', 'class', 'lecture',
+        'masterclass', 'workshop', 'insights', 'analysis', 'cbse', 'jee',
+        'a-level', 'exam', 'chapter', 'syllabus', 'problem', 'solution',
+        'practice', 'demonstration', 'experiment', 'lab', 'teacher', 'professor',
+        'university', 'school', 'study', 'revision', 'concept', 'topic',
+        'exercises', 'questions', 'answers',
+    ],
+    'educational_channel': [
+        'academy', 'school', 'university', 'education', 'tutorial', 'teacher',
+        'professor', 'cbse', 'jee', 'neet', 'class', 'study', 'learn', 'science',
+        'physics', 'chemistry', 'math', 'biology',
+    ],
+    # Keywords/patterns that might indicate lower quality or clickbait for educational content
+    'spammy_title': [
+        'must watch!!!', 'shocking', 'secret revealed', 'ultimate guide', 'easy way',
+        'guaranteed', 'free money', 'hack your', 'top 10 secrets',  # Be cautious with these
+    ],
+}
+
+
+def keyword_sets():
+    """The default keyword sets with any SEARCH_KEYWORD_SETS overrides applied."""
+    overrides = getattr(settings, 'SEARCH_KEYWORD_SETS', None) or {}
+    return {**DEFAULT_KEYWORD_SETS, **overrides}
+
+
+def _trie_pattern(keywords):
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional group: the longest keyword at a position wins.
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds which keywords of a set occur (as substrings) in a text.
+
+    Matching is case-sensitive; keywords are lowercased, so callers pass
+    lowercased text. A regex scan reports non-overlapping, longest-first
+    matches, so a keyword can be hidden by a match that overlaps it ('lab'
+    inside 'syllabus', 'class' after 'master'). For every keyword we
+    precompute the keywords that could overlap one of its matches, and only
+    those are verified with a direct substring check. `matches()` therefore
+    returns exactly `{kw for kw in keywords if kw in text}`.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = frozenset(keyword.lower() for keyword in keywords if keyword)
+        self.pattern = re.compile(_trie_pattern(self.keywords)) if self.keywords else None
+        self.overlapping = {keyword: self._overlapping(keyword) for keyword in self.keywords}
+
+    def _overlapping(self, keyword):
+        # Keywords that start inside `keyword` (or at its start) and overlap it.
+        return frozenset(
+            other for other in self.keywords
+            if other != keyword and any(
+                keyword[i:].startswith(other) or other.startswith(keyword[i:]) for i in range(len(keyword))
+            )
+        )
+
+    def search(self, text):
+        """True if any keyword occurs in `text`; stops at the first hit."""
+        return self.pattern is not None and self.pattern.search(text) is not None
+
+    def matches(self, text):
+        """The set of distinct keywords occurring in `text`."""
+        if self.pattern is None:
+            return set()
+        found = set(self.pattern.findall(text))
+        for keyword in list(found):
+            for other in self.overlapping[keyword]:
+                if other not in found and other in text:
+                    found.add(other)
+        return found
+
+    def count(self, text):
+        """Number of distinct keywords occurring in `text`."""
+        return len(self.matches(text))
+
+
+_KEYWORD_SETS = keyword_sets()
+EDUCATIONAL = KeywordMatcher(_KEYWORD_SETS['educational'])
+EDUCATIONAL_CHANNEL = KeywordMatcher(_KEYWORD_SETS['educational_channel'])
+SPAMMY_TITLE = KeywordMatcher(_KEYWORD_SETS['spammy_title'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import progress_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Write buffered video progress (PROGRESS_WRITE_BEHIND) to the database. With a Redis "
+        "cache this flushes the progress buffered by every worker, including workers that "
+        "died without flushing; with a per-process cache it only sees this process."
+    )
+
+    def handle(self, *args, **options):
+        written = progress_buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {written} buffered progress records"))
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.history_import import IMPORT_CHUNK_SIZE, import_watch_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a watch history file (Google Takeout watch-history.json, or a JSON array / "
+        "JSON Lines of watched-video records) into a user's watch history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the history file")
+        parser.add_argument('--user', required=True, help="Email of the user to import for")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help=f"Rows written per statement (default {IMPORT_CHUNK_SIZE})")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+
+        try:
+            with open(options['path'], encoding='utf-8-sig') as stream:
+                stats = import_watch_history(user, stream, chunk_size=options['chunk_size'])
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not import {options['path']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {stats['read']} entries: {stats['written']} written, {stats['skipped']} skipped "
+            f"in {stats['seconds']}s ({stats['rows_per_second']} rows/s)"
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.catalog import VIDEO_CATALOG_MAX_AGE, stale_video_ids
+from api.youtube import refresh_video_details
+
+REFRESH_BATCH_SIZE = 500  # IDs per pass; fetched 50 per videos.list call
+
+
+class Command(BaseCommand):
+    help = (
+        "Refetch video catalog rows older than --max-age seconds from the YouTube API, "
+        "oldest first. Each videos.list call refreshes up to 50 videos for 1 quota unit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=VIDEO_CATALOG_MAX_AGE,
+                            help=f"Refresh rows fetched more than this many seconds ago (default {VIDEO_CATALOG_MAX_AGE})")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Refresh at most this many rows")
+
+    def handle(self, *args, **options):
+        video_ids = stale_video_ids(options['max_age'], options['limit'])
+        refreshed = 0
+        for start in range(0, len(video_ids), REFRESH_BATCH_SIZE):
+            refreshed += refresh_video_details(video_ids[start:start + REFRESH_BATCH_SIZE])
+        # Videos YouTube no longer returns (deleted, made private) were dropped
+        # from the catalog, so later runs don't pick them again.
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {refreshed} of {len(video_ids)} stale catalog rows"
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='videoprogress',
+            index=models.Index(fields=['user', '-last_watched', '-id'], name='progress_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchedvideo',
+            index=models.Index(fields=['user', '-watched_at', '-id'], name='watched_user_recent_idx'),
+        ),
+    ]
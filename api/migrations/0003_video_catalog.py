@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_watch_history_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Video',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('channel_id', models.CharField(blank=True, max_length=100)),
+                ('channel_title', models.CharField(blank=True, max_length=255)),
+                ('thumbnails', models.JSONField(blank=True, default=dict)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('view_count', models.PositiveBigIntegerField(default=0)),
+                ('like_count', models.PositiveBigIntegerField(default=0)),
+                ('comment_count', models.PositiveBigIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
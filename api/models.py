@@ -24,6 +24,10 @@ class WatchedVideo(models.Model):
     class Meta:
         unique_together = ('user', 'video_id') 
         ordering = ['-watched_at']
+        indexes = [
+            # Backs the keyset pagination of a user's watch history
+            models.Index(fields=['user', '-watched_at', '-id'], name='watched_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} watched by {self.user.get_full_name()}"
@@ -80,6 +84,31 @@ class VideoProgress(models.Model):
     class Meta:
         unique_together = ('user', 'video_id')
         ordering = ['-last_watched']
+        indexes = [
+            # Backs the keyset pagination of a user's progress list
+            models.Index(fields=['user', '-last_watched', '-id'], name='progress_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email}'s progress on {self.video_id}"
+
+
+class Video(models.Model):
+    """
+    Durable catalog of YouTube video metadata, the tier behind the detail
+    caches (see `api.catalog`). Rows are refreshed in bulk by `fetched_at`.
+    """
+    id = models.CharField(max_length=100, primary_key=True)  # YouTube video ID
+    title = models.CharField(max_length=255, blank=True)
+    channel_id = models.CharField(max_length=100, blank=True)
+    channel_title = models.CharField(max_length=255, blank=True)
+    thumbnails = models.JSONField(default=dict, blank=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    view_count = models.PositiveBigIntegerField(default=0)
+    like_count = models.PositiveBigIntegerField(default=0)
+    comment_count = models.PositiveBigIntegerField(default=0)
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.title or self.id
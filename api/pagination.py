@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class WatchHistoryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a user's watch history, newest first.
+
+    The cursor holds the `watched_at` of the last row served, so each page is
+    an index range scan on (user, -watched_at, -id) whatever its depth. `id`
+    breaks ties between rows watched at the same instant.
+    """
+    ordering = ('-watched_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class VideoProgressCursorPagination(WatchHistoryCursorPagination):
+    """Same as WatchHistoryCursorPagination, over (user, -last_watched, -id)."""
+    ordering = ('-last_watched', '-id')
@@ -0,0 +1,99 @@
+"""
+Speculative prefetch of the next search results page.
+
+When a search is popular (several requests for it within a short window) or
+the client is already paging through it, the page behind `next_page_token`
+is computed in the background so that the client's next request is a cache
+hit. Prefetches are capped in number and only run while the quota ledger is
+comfortably in full service (see `api.quota`).
+
+Disabled by default; enable with YOUTUBE_PREFETCH_ENABLED=True.
+"""
+import logging
+import threading
+
+from decouple import config
+from django.core.cache import cache
+
+from . import quota
+from .caching import SINGLE_FLIGHT_LOCK_TIMEOUT, get_with_soft_expiry, refresh_in_background
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = config('YOUTUBE_PREFETCH_ENABLED', default=False, cast=bool)
+# A first page counts as popular after this many requests within the window.
+PREFETCH_MIN_HITS = config('YOUTUBE_PREFETCH_MIN_HITS', default=3, cast=int)
+PREFETCH_POPULARITY_WINDOW = 600  # seconds
+# Prefetches in flight per process, on top of regular background refreshes.
+PREFETCH_MAX_CONCURRENCY = config('YOUTUBE_PREFETCH_MAX_CONCURRENCY', default=2, cast=int)
+# search.list plus one videos.list and one channels.list call.
+PREFETCH_QUOTA_COST = quota.QUOTA_COSTS['search'] + quota.QUOTA_COSTS['videos'] + quota.QUOTA_COSTS['channels']
+
+_slots = threading.BoundedSemaphore(PREFETCH_MAX_CONCURRENCY)
+
+
+def _popularity_key(search_key):
+    return f"{search_key}:hits"
+
+
+def record_hit(search_key):
+    """Count one request for the search identified by `search_key`; returns the count in the window."""
+    key = _popularity_key(search_key)
+    cache.add(key, 0, timeout=PREFETCH_POPULARITY_WINDOW)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=PREFETCH_POPULARITY_WINDOW)
+        return 1
+
+
+def prefetch_allowed():
+    """
+    Whether a prefetch may run now: prefetching is enabled and the quota
+    budget stays in full service after paying for one. Cheap enough to ask
+    before building the prefetch's request.
+    """
+    if not PREFETCH_ENABLED:
+        return False
+    if quota.degradation_level(quota.units_used() + PREFETCH_QUOTA_COST) != quota.FULL_SERVICE:
+        logger.info("Skipping prefetch: quota budget reserved for user searches")
+        return False
+    return True
+
+
+def maybe_prefetch(cache_key, compute, search_key, paging=False, lock_timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+    """
+    Warm `cache_key` by running `compute()` in the background, if worthwhile.
+    Call it only once `prefetch_allowed()` has returned True.
+
+    `search_key` identifies the search independently of the page (used for the
+    popularity count); `paging` says the current request already carried a
+    page token. `compute()` must store its result under `cache_key`, like the
+    computations passed to `single_flight`. It shares that key's single-flight
+    lock, so a client asking for the page while it is being prefetched waits
+    for the prefetch instead of searching again; `lock_timeout` should cover
+    the worst case of `compute()`.
+
+    Returns True if a prefetch was scheduled.
+    """
+    hits = record_hit(search_key)
+    if not paging and hits < PREFETCH_MIN_HITS:
+        return False
+    cached = get_with_soft_expiry(cache_key)
+    if cached is not None and not cached[2]:
+        return False
+    if not _slots.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            compute()
+        finally:
+            _slots.release()
+
+    if not refresh_in_background(cache_key, run, lock_timeout=lock_timeout):
+        # Already being computed (or prefetched) by someone else.
+        _slots.release()
+        return False
+    logger.info(f"Prefetching next search page into {cache_key}")
+    return True
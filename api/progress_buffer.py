@@ -0,0 +1,241 @@
+"""
+Write-behind buffer for video progress heartbeats.
+
+Players report progress every few seconds. With PROGRESS_WRITE_BEHIND=True
+each report only replaces a record in the cache and marks the (user, video)
+pair dirty; a background thread periodically writes the latest record of every
+dirty pair to `VideoProgress` in bulk (with the last-writer-wins upsert of
+`api.progress_sync`, keeping the heartbeat's own `last_watched`). A video
+watched for ten minutes then costs a handful of row writes instead of
+hundreds.
+
+When the cache is Redis, the dirty index is a Redis set next to the buffered
+records, so pairs buffered by a worker that died without flushing are picked
+up by any other worker's flusher (or by `manage.py flush_progress_buffer`).
+With a per-process cache such as LocMemCache, buffered records live and die
+with the process, and so does the index.
+
+Reads go through `get()` / `merge()`, which prefer the buffered record unless
+the row is newer, so clients always see their latest position. Buffered
+records are kept well past the next flush (they are simply the newest copy of
+the row), and pending records are flushed when the process exits.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+
+from decouple import config
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import VideoProgress
+from .progress_sync import upsert_progress
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_WRITE_BEHIND = config('PROGRESS_WRITE_BEHIND', default=False, cast=bool)
+PROGRESS_FLUSH_INTERVAL = config('PROGRESS_FLUSH_INTERVAL', default=30, cast=int)  # seconds
+# Buffered records must outlive several flush intervals, including a flusher
+# that is briefly unable to reach the database.
+PROGRESS_BUFFER_TIMEOUT = 86400  # seconds
+FLUSH_BATCH_SIZE = 500
+
+BUFFERED_FIELDS = ('current_time', 'duration', 'percentage_watched')
+
+_DIRTY_SET_KEY = "progress_buffer:dirty"
+
+_dirty = set()  # (user_id, video_id) pairs buffered by this process, when the cache isn't Redis
+_lock = threading.Lock()
+_flusher = None
+_stop = threading.Event()
+
+
+def _buffer_key(user_id, video_id):
+    digest = hashlib.md5(f"{user_id}:{video_id}".encode()).hexdigest()
+    return f"progress_buffer:{digest}"
+
+
+def _redis_client():
+    """The raw client of the default cache if it is Redis (django-redis or Django's own backend), else None."""
+    django_redis_client = getattr(cache, 'client', None)
+    if django_redis_client is not None and hasattr(django_redis_client, 'get_client'):
+        return django_redis_client.get_client(write=True)
+    redis_cache_client = getattr(cache, '_cache', None)
+    if redis_cache_client is not None and hasattr(redis_cache_client, 'get_client'):
+        return redis_cache_client.get_client(write=True)
+    return None
+
+
+def _mark_dirty(pairs):
+    client = _redis_client()
+    if client is None:
+        with _lock:
+            _dirty.update(pairs)
+        return
+    client.sadd(cache.make_key(_DIRTY_SET_KEY), *(f"{user_id}:{video_id}" for user_id, video_id in pairs))
+
+
+def _unmark_dirty(user_id, video_id):
+    client = _redis_client()
+    if client is None:
+        with _lock:
+            _dirty.discard((user_id, video_id))
+        return
+    client.srem(cache.make_key(_DIRTY_SET_KEY), f"{user_id}:{video_id}")
+
+
+def _take_dirty():
+    """
+    Remove and return every dirty pair. With Redis, SPOP hands each pair to
+    one flusher only; pairs requeued locally after a failed flush are included.
+    """
+    global _dirty
+    with _lock:
+        pending, _dirty = _dirty, set()
+    client = _redis_client()
+    if client is None:
+        return pending
+    while True:
+        members = client.spop(cache.make_key(_DIRTY_SET_KEY), FLUSH_BATCH_SIZE)
+        if not members:
+            return pending
+        for member in members:
+            user_id, video_id = (member.decode() if isinstance(member, bytes) else member).split(':', 1)
+            pending.add((user_id, video_id))
+
+
+def _to_instance(user_id, video_id, record):
+    return VideoProgress(user_id=user_id, video_id=video_id, **record)
+
+
+def record(user, video_id, values):
+    """
+    Buffer a progress report for `user` and `video_id`; `values` holds the
+    BUFFERED_FIELDS (missing ones take the model defaults). Returns an unsaved
+    `VideoProgress` with the new state.
+    """
+    buffered = {
+        field: values[field] if field in values else VideoProgress._meta.get_field(field).get_default()
+        for field in BUFFERED_FIELDS
+    }
+    buffered['last_watched'] = timezone.now()
+    cache.set(_buffer_key(user.pk, video_id), buffered, timeout=PROGRESS_BUFFER_TIMEOUT)
+    _mark_dirty([(user.pk, video_id)])
+    _ensure_flusher()
+    return _to_instance(user.pk, video_id, buffered)
+
+
+def get(user, video_id):
+    """The buffered progress of `user` for `video_id` as an unsaved `VideoProgress`, or None."""
+    buffered = cache.get(_buffer_key(user.pk, video_id))
+    if buffered is None:
+        return None
+    return _to_instance(user.pk, video_id, buffered)
+
+
+def get_many(user, video_ids):
+    """The buffered progress of `user` for any of `video_ids`, as unsaved `VideoProgress` instances."""
+    keys = {_buffer_key(user.pk, video_id): video_id for video_id in video_ids}
+    if not keys:
+        return []
+    return [_to_instance(user.pk, keys[key], buffered) for key, buffered in cache.get_many(keys.keys()).items()]
+
+
+def merge(user, progress_rows):
+    """Overlay buffered records onto `progress_rows` (one cache round trip); returns the rows."""
+    keys = {_buffer_key(user.pk, row.video_id): row for row in progress_rows}
+    for key, buffered in cache.get_many(keys.keys()).items():
+        row = keys[key]
+        if buffered['last_watched'] < row.last_watched:
+            continue  # superseded by a later write straight to the row
+        for field, value in buffered.items():
+            setattr(row, field, value)
+    return progress_rows
+
+
+def discard(user, video_id):
+    """Drop any buffered progress, e.g. before deleting the row."""
+    cache.delete(_buffer_key(user.pk, video_id))
+    _unmark_dirty(user.pk, video_id)
+
+
+def drop_superseded(user, written):
+    """
+    Drop buffered records older than progress just written straight to the
+    database; `written` maps video_id to the `last_watched` written.
+    """
+    keys = {_buffer_key(user.pk, video_id): last_watched for video_id, last_watched in written.items()}
+    if not keys:
+        return
+    stale = [key for key, buffered in cache.get_many(keys.keys()).items() if buffered['last_watched'] <= keys[key]]
+    if stale:
+        cache.delete_many(stale)
+
+
+def flush():
+    """Write the latest buffered record of every dirty pair to the database. Returns the rows written."""
+    pending = _take_dirty()
+    if not pending:
+        return 0
+
+    keys = {_buffer_key(user_id, video_id): (user_id, video_id) for user_id, video_id in pending}
+    try:
+        buffered_records = cache.get_many(keys.keys())
+    except Exception:
+        # Cache unreachable: keep the pairs for the next attempt, in this
+        # process since the shared index is likely unreachable too.
+        with _lock:
+            _dirty.update(pending)
+        raise
+    rows = [
+        {'user_id': keys[key][0], 'video_id': keys[key][1], **buffered}
+        for key, buffered in buffered_records.items()
+    ]
+    written = 0
+    for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+        written += _write(rows[start:start + FLUSH_BATCH_SIZE])
+    logger.info(f"Flushed {written} buffered progress records")
+    return written
+
+
+def _write(rows):
+    try:
+        return len(upsert_progress(rows))
+    except Exception as e:
+        # One bad row (e.g. its user was deleted) must not block the rest.
+        logger.error(f"Bulk progress flush failed, retrying row by row: {str(e)}")
+    written = 0
+    for row in rows:
+        try:
+            written += len(upsert_progress([row]))
+        except Exception as e:
+            logger.error(f"Dropping buffered progress for user {row['user_id']}, video {row['video_id']}: {str(e)}")
+    return written
+
+
+def _run_flusher():
+    while not _stop.wait(PROGRESS_FLUSH_INTERVAL):
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Progress flush failed: {str(e)}")
+        finally:
+            close_old_connections()
+
+
+def _shutdown():
+    _stop.set()
+    flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run_flusher, name='progress-flush', daemon=True)
+            _flusher.start()
+            atexit.register(_shutdown)
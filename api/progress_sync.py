@@ -0,0 +1,61 @@
+"""
+Bulk last-writer-wins upsert of `VideoProgress` rows.
+
+Used by the progress sync endpoint (offline clients uploading many records at
+once) and by the write-behind flusher in `api.progress_buffer`. Every record
+carries the time the progress was made (`last_watched`); a record replaces the
+stored row only if it is at least as recent, so late or replayed uploads never
+roll a position back. The whole batch is one
+`INSERT ... ON CONFLICT (user_id, video_id) DO UPDATE ... WHERE` statement.
+"""
+import uuid
+
+from django.db import connections, router
+
+from .models import VideoProgress
+
+UPSERT_FIELDS = ('current_time', 'duration', 'percentage_watched', 'last_watched')
+
+
+def upsert_progress(records):
+    """
+    Write `records`, dicts with `user_id`, `video_id` and the UPSERT_FIELDS
+    (missing ones take the model defaults), keeping for each (user, video) whichever of the record and the stored row
+    has the later `last_watched`. Records must be unique per (user, video).
+
+    Returns the set of (user_id, video_id) pairs whose record was written.
+    """
+    if not records:
+        return set()
+    connection = connections[router.db_for_write(VideoProgress)]
+    meta = VideoProgress._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    fields = [meta.pk, meta.get_field('user'), meta.get_field('video_id')] + [meta.get_field(f) for f in UPSERT_FIELDS]
+    columns = [quote(field.column) for field in fields]
+    user_column, video_column, last_watched_column = (
+        quote(meta.get_field(name).column) for name in ('user', 'video_id', 'last_watched')
+    )
+
+    defaults = {field: meta.get_field(field).get_default() for field in UPSERT_FIELDS}
+    params = []
+    for record in records:
+        values = [uuid.uuid4(), record['user_id'], record['video_id']] + [
+            record[f] if f in record else defaults[f] for f in UPSERT_FIELDS
+        ]
+        params += [field.get_db_prep_save(value, connection) for field, value in zip(fields, values)]
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(fields)) + ")"] * len(records))
+    updates = ", ".join(f"{quote(meta.get_field(f).column)} = excluded.{quote(meta.get_field(f).column)}"
+                        for f in UPSERT_FIELDS)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES {placeholders} "
+        f"ON CONFLICT ({user_column}, {video_column}) DO UPDATE SET {updates} "
+        f"WHERE excluded.{last_watched_column} >= {table}.{last_watched_column} "
+        f"RETURNING {user_column}, {video_column}"
+    )
+    user_field = meta.get_field('user').target_field
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {
+            (user_field.to_python(user_id), video_id) for user_id, video_id in cursor.fetchall()
+        }
@@ -0,0 +1,120 @@
+import logging
+import math
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from decouple import config
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Quota units charged by the YouTube Data API per call.
+QUOTA_COSTS = {
+    'search': 100,
+    'videos': 1,
+    'channels': 1,
+}
+DEFAULT_QUOTA_COST = 1
+
+DAILY_QUOTA_BUDGET = config('YOUTUBE_DAILY_QUOTA', default=10000, cast=int)
+
+# Fractions of the daily budget at which the search pipeline starts shedding work.
+SKIP_CHANNELS_THRESHOLD = config('YOUTUBE_QUOTA_SKIP_CHANNELS_AT', default=0.80, cast=float)
+SKIP_STATISTICS_THRESHOLD = config('YOUTUBE_QUOTA_SKIP_STATISTICS_AT', default=0.90, cast=float)
+CACHE_ONLY_THRESHOLD = config('YOUTUBE_QUOTA_CACHE_ONLY_AT', default=0.97, cast=float)
+
+# Degradation levels, in increasing order of severity.
+FULL_SERVICE = 0
+SKIP_CHANNELS = 1  # no channels.list calls: results lack channel thumbnails
+SKIP_STATISTICS = 2  # no videos.list calls either: results lack stats/duration
+CACHE_ONLY = 3  # no search.list calls: only cached searches are served
+
+DEGRADATION_LABELS = {
+    FULL_SERVICE: 'full',
+    SKIP_CHANNELS: 'skip_channels',
+    SKIP_STATISTICS: 'skip_statistics',
+    CACHE_ONLY: 'cache_only',
+}
+
+# YouTube quota resets at midnight Pacific Time.
+QUOTA_RESET_TZ = ZoneInfo('America/Los_Angeles')
+LEDGER_TIMEOUT = 2 * 86400  # Keep yesterday's ledger around for inspection
+
+
+def _quota_day():
+    return datetime.now(QUOTA_RESET_TZ).date()
+
+
+def _ledger_key(day=None):
+    return f"youtube_quota:{(day or _quota_day()).isoformat()}"
+
+
+def charge(endpoint):
+    """Charge one call to `endpoint` against today's ledger. Returns units used today."""
+    cost = QUOTA_COSTS.get(endpoint, DEFAULT_QUOTA_COST)
+    key = _ledger_key()
+    cache.add(key, 0, timeout=LEDGER_TIMEOUT)
+    try:
+        return cache.incr(key, cost)
+    except ValueError:
+        # The ledger was evicted between add() and incr(); start it again.
+        cache.set(key, cost, timeout=LEDGER_TIMEOUT)
+        return cost
+
+
+async def acharge(endpoint):
+    """Async variant of `charge()`, using the cache's async API."""
+    cost = QUOTA_COSTS.get(endpoint, DEFAULT_QUOTA_COST)
+    key = _ledger_key()
+    await cache.aadd(key, 0, timeout=LEDGER_TIMEOUT)
+    try:
+        return await cache.aincr(key, cost)
+    except ValueError:
+        await cache.aset(key, cost, timeout=LEDGER_TIMEOUT)
+        return cost
+
+
+def seconds_until_reset():
+    """Seconds until today's ledger is replaced by a fresh one (midnight Pacific)."""
+    now = datetime.now(QUOTA_RESET_TZ)
+    reset = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=QUOTA_RESET_TZ)
+    # Compare in UTC: arithmetic within one zone ignores DST changes.
+    return max(math.ceil((reset.astimezone(timezone.utc) - now).total_seconds()), 1)
+
+
+def units_used():
+    return cache.get(_ledger_key(), 0)
+
+
+async def aunits_used():
+    return await cache.aget(_ledger_key(), 0)
+
+
+def degradation_level(used=None):
+    """Return how much of the search pipeline to shed given today's usage."""
+    used = units_used() if used is None else used
+    ratio = used / DAILY_QUOTA_BUDGET if DAILY_QUOTA_BUDGET else 1.0
+    if ratio >= CACHE_ONLY_THRESHOLD:
+        return CACHE_ONLY
+    if ratio >= SKIP_STATISTICS_THRESHOLD:
+        return SKIP_STATISTICS
+    if ratio >= SKIP_CHANNELS_THRESHOLD:
+        return SKIP_CHANNELS
+    return FULL_SERVICE
+
+
+async def adegradation_level():
+    return degradation_level(await aunits_used())
+
+
+def usage():
+    """Snapshot of today's quota usage, for the usage endpoint and logging."""
+    used = units_used()
+    level = degradation_level(used)
+    return {
+        'day': _quota_day().isoformat(),
+        'units_used': used,
+        'daily_budget': DAILY_QUOTA_BUDGET,
+        'remaining': max(DAILY_QUOTA_BUDGET - used, 0),
+        'degradation': DEGRADATION_LABELS[level],
+    }
@@ -0,0 +1,199 @@
+"""
+Batch relevance scoring for YouTube search results.
+
+`rank_search_results` scores a whole page (or any number) of search items at
+once: a single pass extracts per-item features, then the score components,
+duration filters and engagement thresholds are computed as NumPy array
+operations and masks over all items together.
+
+The arithmetic deliberately mirrors the original per-item scorer term by term
+(same constants, same order of additions, `math.log10` rather than
+`np.log10`, which differs in the last ulp for ~1% of inputs), so scores and
+ranking are bit-for-bit identical to it.
+"""
+import logging
+import math
+import traceback
+
+import numpy as np
+
+from . import keywords
+from .video_records import format_duration
+
+logger = logging.getLogger(__name__)
+
+# Content score
+SHORTS_BASE_SCORE = -5.0
+SPAM_TITLE_PENALTY = 2.0  # Applied once per title
+EDU_KEYWORD_BONUS = 2.0  # Per distinct educational keyword
+QUERY_MATCH_BONUS = 2.5  # Per query term found in title/description
+
+# Adjusted MIN_RELEVANCE_THRESHOLD logic - make it more lenient
+MIN_BASE_RELEVANCE_TO_CONSIDER = -1.0  # Allow videos with slightly negative scores if engagement helps
+MODERATE_ENGAGEMENT_VIEWS = 1000
+MODERATE_ENGAGEMENT_LIKES = 100
+# Extreme engagement can still bypass, but the main path is more lenient
+EXTREME_ENGAGEMENT_VIEWS = 200000
+EXTREME_ENGAGEMENT_LIKES = 20000
+
+
+def _log10_column(counts):
+    # math.log10 (not np.log10) keeps scores identical to the per-item scorer.
+    # Non-positive counts never reach a log term; map them to log10(1) = 0.
+    return np.fromiter((math.log10(c) if c > 0 else 0.0 for c in counts), dtype=np.float64, count=len(counts))
+
+
+def _tiered_log_bonus(counts, logs, high, high_weight, low, low_weight, penalty_below=None, penalty=0.0):
+    """`log10(count) * weight` by tier, or a flat penalty for small non-zero counts."""
+    bonus = np.where(counts > high, logs * high_weight, np.where(counts > low, logs * low_weight, 0.0))
+    if penalty_below is not None:
+        bonus = np.where((counts <= low) & (counts < penalty_below) & (counts > 0), -penalty, bonus)
+    return bonus
+
+
+def extract_features(items, detailed_videos_map, original_query):
+    """
+    Single pass over the raw search items. Returns (rows, columns) where `rows`
+    holds what is needed to build an output entry and `columns` the numeric
+    features, with one entry per item that could be parsed.
+    """
+    query_terms = set(original_query.lower().split())
+    rows = []
+    columns = {
+        'eligible': [], 'base_score': [], 'views': [], 'likes': [], 'comments': [],
+        'has_duration': [], 'duration_seconds': [],
+    }
+
+    for item in items:
+        try:
+            video_id = item['id']['videoId']
+            snippet = item['snippet']
+            title = snippet.get('title', '')
+            description = snippet.get('description', '')
+            channel_title = snippet.get('channelTitle', '')
+        except (KeyError, TypeError) as e:
+            logger.error(f"Error processing search result item: {e}")
+            logger.error(traceback.format_exc())
+            continue
+
+        title_lower = title.lower()
+        description_lower = description.lower()
+        content_text = title_lower + " " + description_lower
+
+        # Splitting the joined text yields the title words followed by the description words.
+        query_match_count = len(query_terms.intersection(content_text.split()))
+        if query_match_count:
+            edu_keyword_hits = keywords.EDUCATIONAL.count(content_text)
+            has_edu_channel = keywords.EDUCATIONAL_CHANNEL.search(channel_title.lower())
+            is_spammy = keywords.SPAMMY_TITLE.search(title_lower)
+        else:
+            # Without a query term the item is dropped regardless of its keywords.
+            edu_keyword_hits, has_edu_channel, is_spammy = 0, False, False
+        is_short = 'shorts' in title_lower or 'shorts' in description_lower
+
+        # Require at least one educational signal AND at least one query term in title/description
+        eligible = (edu_keyword_hits > 0 or has_edu_channel) and query_match_count > 0
+
+        # Content score components are small multiples of 0.5, so their sum is exact.
+        base_score = (SHORTS_BASE_SCORE if is_short else 0.0) \
+            - (SPAM_TITLE_PENALTY if is_spammy else 0.0) \
+            + edu_keyword_hits * EDU_KEYWORD_BONUS \
+            + query_match_count * QUERY_MATCH_BONUS
+
+        record = detailed_videos_map.get(video_id)
+        has_duration = bool(record) and record.duration_seconds is not None
+
+        rows.append((video_id, snippet, title, description, channel_title))
+        columns['eligible'].append(eligible)
+        columns['base_score'].append(base_score)
+        columns['views'].append(record.view_count if record else 0)
+        columns['likes'].append(record.like_count if record else 0)
+        columns['comments'].append(record.comment_count if record else 0)
+        columns['has_duration'].append(has_duration)
+        columns['duration_seconds'].append(record.duration_seconds if has_duration else 0)
+
+    return rows, columns
+
+
+def score_features(columns):
+    """Vectorized relevance score for every extracted item (unfiltered)."""
+    views = np.asarray(columns['views'], dtype=np.uint64)
+    likes = np.asarray(columns['likes'], dtype=np.uint64)
+    comments = np.asarray(columns['comments'], dtype=np.uint64)
+
+    # Additions happen in the same order as the per-item scorer did.
+    score = np.asarray(columns['base_score'], dtype=np.float64)
+    score = score + _tiered_log_bonus(views, _log10_column(columns['views']), 10000, 1.0, 500, 0.6,
+                                      penalty_below=200, penalty=0.25)
+    score = score + _tiered_log_bonus(likes, _log10_column(columns['likes']), 2000, 0.8, 100, 0.4,
+                                      penalty_below=50, penalty=0.15)
+    score = score + np.where((views > 50000) & (likes > 5000), 1.5,
+                             np.where((views > 20000) & (likes > 2000), 0.75, 0.0))  # "Notable" boost
+    score = score + _tiered_log_bonus(comments, _log10_column(columns['comments']), 500, 0.4, 20, 0.2)
+    return score
+
+
+def keep_mask(columns, score, min_duration=None, max_duration=None):
+    """Apply the relevance, duration and engagement filters as boolean masks."""
+    views = np.asarray(columns['views'], dtype=np.uint64)
+    likes = np.asarray(columns['likes'], dtype=np.uint64)
+    has_duration = np.asarray(columns['has_duration'], dtype=bool)
+    duration_seconds = np.asarray(columns['duration_seconds'], dtype=np.int64)
+
+    keep = np.asarray(columns['eligible'], dtype=bool)
+    if min_duration:
+        keep &= ~(has_duration & (duration_seconds < min_duration))
+    if max_duration:
+        keep &= ~(has_duration & (duration_seconds > max_duration))
+
+    is_extremely_engaging = (views > EXTREME_ENGAGEMENT_VIEWS) & (likes > EXTREME_ENGAGEMENT_LIKES)
+    has_moderate_engagement = (views > MODERATE_ENGAGEMENT_VIEWS) & (likes > MODERATE_ENGAGEMENT_LIKES)
+    # A low score is only forgiven with at least moderate engagement.
+    too_weak = ~is_extremely_engaging & (score < MIN_BASE_RELEVANCE_TO_CONSIDER) & ~has_moderate_engagement
+    return keep & ~too_weak
+
+
+def rank_search_results(search_data, detailed_videos_map, channel_profile_pics_map,
+                        original_query, min_duration=None, max_duration=None):
+    """Score, filter and rank search items; see `process_search_results`."""
+    items = search_data.get('items') or []
+    if not items:
+        logger.info("No items in search_data to process")
+        return []
+
+    logger.info(f"Processing {len(items)} search results")
+    rows, columns = extract_features(items, detailed_videos_map, original_query)
+    if not rows:
+        return []
+
+    score = score_features(columns)
+    keep = keep_mask(columns, score, min_duration, max_duration)
+    logger.info(f"After filtering, {int(keep.sum())} videos remain")
+
+    kept = np.flatnonzero(keep)
+    rounded = [round(float(score[i]), 2) for i in kept]
+    # Stable sort on the negated score keeps the original order among ties,
+    # exactly like list.sort(reverse=True).
+    order = np.argsort(-np.asarray(rounded, dtype=np.float64), kind='stable')
+
+    processed_results = []
+    for position in order:
+        i = kept[position]
+        video_id, snippet, title, description, channel_title = rows[i]
+        has_duration = columns['has_duration'][i]
+        processed_results.append({
+            'id': video_id,
+            'title': title,
+            'description': description,
+            'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
+            'channelTitle': channel_title,
+            'channelProfileImageUrl': channel_profile_pics_map.get(snippet.get('channelId', '')),
+            'publishedAt': snippet.get('publishedAt', ''),
+            'relevance_score': rounded[position],
+            'likes': columns['likes'][i],
+            'comment_count': columns['comments'][i],
+            'view_count': columns['views'][i],
+            'duration': format_duration(columns['duration_seconds'][i]) if has_duration else "Unknown",
+            'duration_seconds': columns['duration_seconds'][i],
+        })
+    return processed_results
@@ -64,3 +64,14 @@ class VideoProgressSerializer(serializers.ModelSerializer):
         model = VideoProgress
         fields = ['video_id', 'current_time', 'duration', 'percentage_watched', 'last_watched']
         read_only_fields = ['last_watched']
+
+class VideoProgressSyncRecordSerializer(serializers.ModelSerializer):
+    # When the progress was made on the client; the most recent record wins.
+    client_timestamp = serializers.DateTimeField()
+
+    class Meta:
+        model = VideoProgress
+        fields = ['video_id', 'current_time', 'duration', 'percentage_watched', 'client_timestamp']
+
+class VideoProgressSyncSerializer(serializers.Serializer):
+    records = VideoProgressSyncRecordSerializer(many=True, allow_empty=False, max_length=500)
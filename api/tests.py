@@ -1,10 +1,42 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import httpx
+import requests
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 from django.urls import reverse
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from unittest.mock import patch
-from .models import WatchedVideo, VideoProgress, VideoFeedback
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from unittest.mock import patch, MagicMock, AsyncMock
+from . import catalog, progress_buffer, quota, youtube, youtube_client
+from .caching import (
+    single_flight, set_with_soft_expiry, get_with_soft_expiry, refresh_in_background, TwoTierCache
+)
+from .history_import import import_watch_history, iter_json_objects
+from .keywords import KeywordMatcher, EDUCATIONAL, keyword_sets, DEFAULT_KEYWORD_SETS
+from .models import WatchedVideo, VideoProgress, VideoFeedback, Video
+from .user_state import annotate, get_states, invalidate
+from .video_records import VideoRecord, record_from_api_item, encode_video_record, decode_video_record
+from .youtube import (
+    detail_cache, fetch_videos_by_keyword, generate_cache_key, get_video_details, invalidate_cache,
+    process_search_results
+)
+from .youtube_async import afetch_videos_by_keyword
+from .youtube_client import YouTubeClient, AsyncYouTubeClient
 
 class YouTubeSearchTests(APITestCase):
     def setUp(self):
@@ -115,3 +147,930 @@ class VideoFeedbackTests(APITestCase):
         }
         response = self.client.post(self.feedback_url, feedback_data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+class YouTubeClientTests(TestCase):
+    def setUp(self):
+        self.client_under_test = YouTubeClient(max_retries=2)
+
+    def _response(self, status_code, headers=None):
+        response = MagicMock()
+        response.status_code = status_code
+        response.headers = headers or {}
+        return response
+
+    @patch('api.youtube_client.time.sleep')
+    def test_retries_transient_errors_then_succeeds(self, mock_sleep):
+        with patch.object(self.client_under_test.session, 'get') as mock_get:
+            mock_get.side_effect = [self._response(503), self._response(429), self._response(200)]
+            response = self.client_under_test.get('videos', {'id': 'abc'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        stats = self.client_under_test.stats()['videos']
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(stats['failures'], 2)
+
+    @patch('api.youtube_client.time.sleep')
+    def test_does_not_retry_client_errors(self, mock_sleep):
+        with patch.object(self.client_under_test.session, 'get') as mock_get:
+            mock_get.return_value = self._response(400)
+            response = self.client_under_test.get('search', {'q': 'python'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(mock_get.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    @patch('api.youtube_client.time.sleep')
+    def test_uses_endpoint_timeouts_and_gives_up_after_max_retries(self, mock_sleep):
+        with patch.object(self.client_under_test.session, 'get') as mock_get:
+            mock_get.side_effect = requests.Timeout()
+            with self.assertRaises(requests.Timeout):
+                self.client_under_test.get('channels', {'id': 'UC1'})
+
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mock_get.call_args.kwargs['timeout'], self.client_under_test.timeouts['channels'])
+
+class EnrichmentTests(TestCase):
+    def test_slow_branch_is_reported_and_returns_partial_enrichment(self):
+        release = threading.Event()
+
+        def slow_video_details(video_ids, allow_fetch=True):
+            release.wait(2)
+            return {'vid1': {}}
+
+        with patch('api.youtube.get_video_details', side_effect=slow_video_details), \
+                patch('api.youtube.get_channel_details_map', return_value={'UC1': 'https://pic'}), \
+                self.assertLogs('api.youtube', level='WARNING') as logs:
+            videos, channels, incomplete = youtube.fetch_enrichment(['vid1'], ['UC1'], deadline=0.05)
+        release.set()
+
+        self.assertEqual(videos, {})
+        self.assertEqual(channels, {'UC1': 'https://pic'})
+        self.assertEqual(incomplete, ['video_details'])
+        # The branch timed out rather than failing.
+        self.assertEqual(logs.output, ["WARNING:api.youtube:Enrichment branch 'video_details' missed the 0.05s deadline"])
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'single-flight-tests'}})
+class SingleFlightTests(TestCase):
+    def test_search_timeouts_cover_a_worst_case_search(self):
+        client = YouTubeClient(timeouts={'search': (3, 10)}, max_retries=2)
+        # Three attempts timing out, plus two capped backoffs
+        self.assertEqual(client.worst_case_seconds('search'), 3 * 13 + 2 * 2.0)
+        worst_case = youtube.youtube_client.worst_case_seconds('search') + youtube.ENRICHMENT_DEADLINE
+        self.assertGreaterEqual(youtube.SEARCH_WAIT_TIMEOUT, worst_case)
+        self.assertGreater(youtube.SEARCH_LOCK_TIMEOUT, youtube.SEARCH_WAIT_TIMEOUT)
+
+        with patch('api.youtube.single_flight', return_value={'results': []}) as mock_single_flight:
+            fetch_videos_by_keyword('python')
+        self.assertEqual(mock_single_flight.call_args.kwargs['lock_timeout'], youtube.SEARCH_LOCK_TIMEOUT)
+        self.assertEqual(mock_single_flight.call_args.kwargs['wait_timeout'], youtube.SEARCH_WAIT_TIMEOUT)
+
+    def test_concurrent_callers_share_one_computation(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            cache.set('search-key', {'results': ['v1']}, timeout=60)
+            return {'results': ['v1']}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight('search-key', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'results': ['v1']}] * 5)
+
+    def test_waiter_computes_itself_after_timeout(self):
+        cache.add('stuck-key:lock', 'someone-else', timeout=60)
+
+        result = single_flight('stuck-key', lambda: 'fresh', wait_timeout=0.1, poll_interval=0.02)
+
+        self.assertEqual(result, 'fresh')
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'soft-expiry-tests'}})
+class SoftExpiryCacheTests(APITestCase):
+    def test_entry_is_stale_between_soft_and_hard_expiry(self):
+        set_with_soft_expiry('fresh', {'results': []}, soft_timeout=60, hard_timeout=120)
+        set_with_soft_expiry('stale', {'results': []}, soft_timeout=0, hard_timeout=120)
+
+        self.assertFalse(get_with_soft_expiry('fresh')[2])
+        self.assertTrue(get_with_soft_expiry('stale')[2])
+        self.assertIsNone(get_with_soft_expiry('missing'))
+
+    def test_refresh_runs_once_while_in_progress(self):
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+
+        self.assertTrue(refresh_in_background('search-key', compute))
+        self.assertFalse(refresh_in_background('search-key', compute))
+        release.set()
+
+    @patch('api.views.fetch_videos_by_keyword')
+    def test_search_response_reports_cache_age(self, mock_fetch):
+        mock_fetch.return_value = {
+            'results': [], 'next_page_token': 'NEXT', 'prev_page_token': None,
+            'cache_age_seconds': 4000, 'stale': True,
+        }
+        response = self.client.get(reverse('youtube_search'), {'q': 'python'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache-Age'], '4000')
+        self.assertTrue(response.data['stale'])
+        self.assertEqual(response.data['next_page_token'], 'NEXT')
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'quota-tests'}})
+class QuotaLedgerTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_calls_are_charged_by_endpoint_cost(self):
+        quota.charge('search')
+        quota.charge('videos')
+        quota.charge('channels')
+
+        self.assertEqual(quota.units_used(), 102)
+
+    @patch('api.quota.DAILY_QUOTA_BUDGET', 1000)
+    def test_degradation_steps_with_usage(self):
+        self.assertEqual(quota.degradation_level(100), quota.FULL_SERVICE)
+        self.assertEqual(quota.degradation_level(800), quota.SKIP_CHANNELS)
+        self.assertEqual(quota.degradation_level(900), quota.SKIP_STATISTICS)
+        self.assertEqual(quota.degradation_level(990), quota.CACHE_ONLY)
+
+    @patch('api.youtube.get_channel_details_map', return_value={})
+    @patch('api.youtube.get_video_details', return_value={})
+    def test_enrichment_sheds_channel_lookups_under_pressure(self, mock_videos, mock_channels):
+        _, _, incomplete = youtube.fetch_enrichment(['v1'], ['UC1'], degradation=quota.SKIP_CHANNELS)
+
+        mock_videos.assert_called_once_with(['v1'], True)
+        mock_channels.assert_called_once_with(['UC1'], False)
+        self.assertEqual(incomplete, ['channel_details'])
+
+    def test_usage_endpoint_is_staff_only(self):
+        User = get_user_model()
+        user = User.objects.create_user(email='staff@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(reverse('youtube-usage')).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('youtube-usage'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('units_used', response.data['quota'])
+
+    @patch('api.quota.degradation_level', return_value=quota.CACHE_ONLY)
+    def test_uncached_search_is_unavailable_in_cache_only_mode(self, mock_level):
+        for url_name in ('youtube_search', 'youtube_search_async'):
+            with patch('api.youtube.youtube_client.get') as mock_get, \
+                    patch('api.youtube_async.async_youtube_client.get', new_callable=AsyncMock) as mock_aget:
+                response = self.client.get(reverse(url_name), {'q': 'python'})
+
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE, url_name)
+            self.assertTrue(0 < int(response['Retry-After']) <= 25 * 3600)
+            self.assertEqual(response.json()['detail'], 'Search is temporarily limited to cached results')
+            mock_get.assert_not_called()
+            mock_aget.assert_not_called()
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'two-tier-tests'}})
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        self.tiered = TwoTierCache(max_entries=2, local_timeout=60)
+
+    def test_reads_prefer_local_tier_and_report_hit_ratios(self):
+        cache.set('shared-only', 'from-redis')
+        self.tiered.set_many({'both': 'value'}, timeout=60)
+
+        found = self.tiered.get_many(['both', 'shared-only', 'missing'])
+        self.assertEqual(found, {'both': 'value', 'shared-only': 'from-redis'})
+        # The shared hit was promoted to the local tier.
+        self.tiered.get_many(['shared-only'])
+
+        stats = self.tiered.stats()
+        self.assertEqual(stats['local']['hits'], 2)
+        self.assertEqual(stats['shared']['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_local_tier_is_bounded(self):
+        self.tiered.set_many({'a': 1, 'b': 2, 'c': 3}, timeout=60)
+        self.assertEqual(self.tiered.stats()['local']['size'], 2)
+
+    def test_invalidate_cache_evicts_both_tiers(self):
+        key = generate_cache_key("video_detail", 'vid1')
+        detail_cache.set_many({key: {'id': 'vid1'}}, timeout=60)
+
+        invalidate_cache(video_id='vid1')
+
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(detail_cache.get_many([key]), {})
+
+class VideoRecordTests(TestCase):
+    def test_round_trip_keeps_only_ranking_fields(self):
+        item = {
+            'id': 'vid1',
+            'snippet': {'description': 'long text' * 100, 'tags': ['python']},
+            'statistics': {'viewCount': '12345678901', 'likeCount': '2500', 'commentCount': '40'},
+            'contentDetails': {'duration': 'PT1H2M3S'},
+        }
+        encoded = encode_video_record(record_from_api_item(item))
+        record = decode_video_record(encoded)
+
+        self.assertEqual(len(encoded), 30)
+        self.assertEqual(record.view_count, 12345678901)
+        self.assertEqual(record.like_count, 2500)
+        self.assertEqual(record.comment_count, 40)
+        self.assertEqual(record.duration_seconds, 3723)
+
+    def test_unknown_duration_and_foreign_payloads(self):
+        record = decode_video_record(encode_video_record(record_from_api_item({'statistics': {}})))
+        self.assertIsNone(record.duration_seconds)
+        # Full API items cached before the compact format, or other versions, are misses.
+        self.assertIsNone(decode_video_record({'id': 'vid1'}))
+        self.assertIsNone(decode_video_record(b'\x02' + bytes(29)))
+
+class ScoringTests(TestCase):
+    def _item(self, video_id, title, description='', channel_title='Code Academy'):
+        return {'id': {'videoId': video_id}, 'snippet': {
+            'title': title, 'description': description, 'channelTitle': channel_title, 'channelId': 'UC1',
+        }}
+
+    def test_batch_ranking_scores_and_filters(self):
+        search_data = {'items': [
+            self._item('low', 'Python basics', channel_title='Random'),
+            self._item('top', 'Python Tutorial for Beginners', 'learn python'),
+            self._item('offtopic', 'Java tutorial'),
+            self._item('short', 'python shorts', channel_title='Random'),
+            self._item('tooshort', 'Python lesson'),
+            {'id': {'kind': 'youtube#channel'}, 'snippet': {}},
+        ]}
+        details = {
+            'top': VideoRecord(50000, 6000, 600, 900),
+            'short': VideoRecord(150, 10, 0, 30),
+            'tooshort': VideoRecord(100000, 9000, 50, 120),
+        }
+
+        results = process_search_results(search_data, details, {'UC1': 'pic'}, 'python', min_duration=240)
+
+        self.assertEqual([r['id'] for r in results], ['top', 'low'])
+        # 3 edu keywords + 1 query term + views, likes, "notable" and comment bonuses
+        self.assertEqual(results[0]['relevance_score'], 18.08)
+        self.assertEqual(results[0]['duration'], '15:00')
+        self.assertEqual(results[0]['channelProfileImageUrl'], 'pic')
+        self.assertEqual(results[1]['relevance_score'], 4.5)
+        self.assertEqual(results[1]['duration'], 'Unknown')
+
+    def test_keyword_matcher_finds_overlapping_keywords(self):
+        text = "masterclass: the syllabus and how topics work"
+        self.assertEqual(EDUCATIONAL.matches(text), {kw for kw in EDUCATIONAL.keywords if kw in text})
+        self.assertEqual(EDUCATIONAL.matches(text), {'masterclass', 'class', 'syllabus', 'lab', 'how to', 'topic'})
+        self.assertTrue(KeywordMatcher(['Free Money']).search('free money inside'))
+        self.assertFalse(KeywordMatcher([]).search('anything'))
+
+    @override_settings(SEARCH_KEYWORD_SETS={'spammy_title': ['clickbait']})
+    def test_keyword_sets_are_configurable(self):
+        sets = keyword_sets()
+        self.assertEqual(sets['spammy_title'], ['clickbait'])
+        self.assertEqual(sets['educational'], DEFAULT_KEYWORD_SETS['educational'])
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'async-search-tests'}})
+class AsyncSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        detail_cache.clear_local()
+
+    def _youtube_response(self, endpoint, params):
+        request = httpx.Request('GET', f'https://www.googleapis.com/youtube/v3/{endpoint}')
+        if endpoint == 'search':
+            body = {'items': [{'id': {'videoId': 'vid1'}, 'snippet': {
+                'title': 'Python tutorial', 'description': 'learn python', 'channelTitle': 'Code Academy',
+                'channelId': 'UC1',
+            }}], 'nextPageToken': 'NEXT'}
+        elif endpoint == 'videos':
+            body = {'items': [{'id': 'vid1', 'statistics': {'viewCount': '50000', 'likeCount': '6000'},
+                               'contentDetails': {'duration': 'PT10M'}}]}
+        else:
+            body = {'items': [{'id': 'UC1', 'snippet': {'thumbnails': {'medium': {'url': 'https://pic'}}}}]}
+        return httpx.Response(200, json=body, request=request)
+
+    def test_async_endpoint_matches_sync_payload_and_shares_cache(self):
+        with patch('api.youtube_async.async_youtube_client.get', new_callable=AsyncMock) as mock_get:
+            mock_get.side_effect = self._youtube_response
+            response = self.client.get(reverse('youtube_search_async'), {'q': 'python'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([r['id'] for r in data['results']], ['vid1'])
+        self.assertEqual(data['results'][0]['channelProfileImageUrl'], 'https://pic')
+        self.assertEqual(data['results'][0]['duration'], '10:00')
+        self.assertEqual(data['next_page_token'], 'NEXT')
+        self.assertEqual(response['X-Cache-Age'], '0')
+        self.assertEqual(sorted(call.args[0] for call in mock_get.call_args_list), ['channels', 'search', 'videos'])
+
+        # The sync path serves the entry written by the async one.
+        with patch('api.youtube.youtube_client.get') as mock_sync_get:
+            cached = fetch_videos_by_keyword('python')
+        mock_sync_get.assert_not_called()
+        self.assertEqual(cached['results'], data['results'])
+
+    def test_wsgi_requests_close_their_httpx_client(self):
+        clients = []
+
+        def make_client(**kwargs):
+            client = MagicMock()
+            client.get = AsyncMock(side_effect=lambda endpoint, **kw: self._youtube_response(endpoint, {}))
+            client.aclose = AsyncMock()
+            clients.append(client)
+            return client
+
+        with patch('api.youtube_client.httpx.AsyncClient', side_effect=make_client):
+            for query in ('python', 'django', 'rust'):
+                response = self.client.get(reverse('youtube_search_async'), {'q': query})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Each request ran in its own event loop under WSGI and closed the client it opened.
+        self.assertEqual(len(clients), 3)
+        self.assertTrue(all(client.aclose.await_count == 1 for client in clients))
+        self.assertEqual(len(youtube_client.async_youtube_client._clients), 0)
+
+    def test_concurrent_async_searches_share_one_upstream_call(self):
+        async def slow_get(endpoint, params):
+            await asyncio.sleep(0.1)
+            return self._youtube_response(endpoint, params)
+
+        async def run():
+            return await asyncio.gather(*(afetch_videos_by_keyword('python') for _ in range(20)))
+
+        with patch('api.youtube_async.async_youtube_client.get', side_effect=slow_get) as mock_get:
+            results = asyncio.run(run())
+
+        self.assertEqual([call.args[0] for call in mock_get.call_args_list].count('search'), 1)
+        self.assertTrue(all(r['results'][0]['id'] == 'vid1' for r in results))
+
+    def test_async_client_retries_transient_errors(self):
+        statuses = [503, 200]
+        client_under_test = AsyncYouTubeClient(max_retries=2)
+        transport = httpx.MockTransport(lambda request: httpx.Response(statuses.pop(0)))
+
+        async def run():
+            with patch.object(client_under_test, '_client',
+                              return_value=httpx.AsyncClient(base_url=client_under_test.base_url, transport=transport)), \
+                    patch.object(client_under_test, '_backoff', return_value=0):
+                return await client_under_test.get('videos', {'id': 'vid1'})
+
+        response = asyncio.run(run())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client_under_test.stats()['videos']['retries'], 1)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'prefetch-tests'}})
+@patch('api.prefetch.PREFETCH_ENABLED', True)
+class PrefetchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        detail_cache.clear_local()
+        # Run background work inline so the tests are deterministic.
+        executor = patch('api.caching._refresh_executor')
+        executor.start().submit.side_effect = lambda fn: fn()
+        self.addCleanup(executor.stop)
+
+    def _youtube_get(self, endpoint, params):
+        response = MagicMock(status_code=200, url='https://www.googleapis.com/youtube/v3/search', text='')
+        if endpoint == 'search':
+            page = params.get('pageToken', 'P1')
+            response.json.return_value = {'items': [{'id': {'videoId': f'{page}-vid'}, 'snippet': {
+                'title': 'Python tutorial', 'description': 'learn python', 'channelTitle': 'Academy',
+                'channelId': 'UC1',
+            }}], 'nextPageToken': f'{page}-next'}
+        else:
+            response.json.return_value = {'items': []}
+        return response
+
+    def test_paging_client_gets_next_page_from_cache(self):
+        with patch('api.youtube.youtube_client.get', side_effect=self._youtube_get) as mock_get:
+            fetch_videos_by_keyword('python', page_token='P2')
+            searched_pages = [c.args[1].get('pageToken') for c in mock_get.call_args_list if c.args[0] == 'search']
+            self.assertEqual(searched_pages, ['P2', 'P2-next'])
+
+            mock_get.reset_mock()
+            next_page = fetch_videos_by_keyword('python', page_token='P2-next')
+
+        self.assertEqual(next_page['results'][0]['id'], 'P2-next-vid')
+        searched_pages = [c.args[1].get('pageToken') for c in mock_get.call_args_list if c.args[0] == 'search']
+        # Only the page after it is prefetched; page P2-next itself came from the cache.
+        self.assertEqual(searched_pages, ['P2-next-next'])
+
+    def test_first_page_is_prefetched_only_once_popular(self):
+        with patch('api.youtube.youtube_client.get', side_effect=self._youtube_get) as mock_get, \
+                patch('api.prefetch.PREFETCH_MIN_HITS', 3):
+            for _ in range(3):
+                fetch_videos_by_keyword('python')
+
+        searched_pages = [c.args[1].get('pageToken') for c in mock_get.call_args_list if c.args[0] == 'search']
+        self.assertEqual(searched_pages, [None, 'P1-next'])
+
+    @patch('api.quota.DAILY_QUOTA_BUDGET', 1000)
+    def test_no_prefetch_when_quota_is_tight(self):
+        for _ in range(790):  # the user's own search takes usage past the skip-channels threshold
+            quota.charge('videos')
+        with patch('api.youtube.youtube_client.get', side_effect=self._youtube_get) as mock_get:
+            fetch_videos_by_keyword('python', page_token='P2')
+
+        searched_pages = [c.args[1].get('pageToken') for c in mock_get.call_args_list if c.args[0] == 'search']
+        self.assertEqual(searched_pages, ['P2'])
+
+    def test_next_page_request_is_not_built_when_prefetch_cannot_run(self):
+        result = {'results': [], 'next_page_token': 'P2'}
+        with patch('api.youtube.build_search_request') as mock_build:
+            with patch('api.prefetch.PREFETCH_ENABLED', False):
+                self.assertFalse(youtube.prefetch_next_page('python', result))
+            with patch('api.quota.degradation_level', return_value=quota.SKIP_CHANNELS):
+                self.assertFalse(youtube.prefetch_next_page('python', result))
+        mock_build.assert_not_called()
+
+class HistoryPaginationTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='learner@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        # Pairs of rows share a timestamp, so the id tie-breaker matters.
+        for i in range(45):
+            WatchedVideo.objects.create(
+                user=self.user, video_id=f'vid{i}', title=f'Video {i}',
+                published_at=now, watched_at=now - timedelta(minutes=i // 2),
+            )
+
+    def _walk(self, url, params):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data['results'])
+            url, params, pages = response.data['next'], None, pages + 1
+        return seen, pages
+
+    def test_watch_history_is_cursor_paginated(self):
+        seen, pages = self._walk(reverse('watched-videos-list'), {'page_size': 20})
+
+        self.assertEqual(pages, 3)
+        expected = list(WatchedVideo.objects.filter(user=self.user).order_by('-watched_at', '-id')
+                        .values_list('video_id', flat=True))
+        self.assertEqual([row['video_id'] for row in seen], expected)
+
+    def test_deep_pages_cost_one_query(self):
+        response = self.client.get(reverse('watched-videos-list'), {'page_size': 20})
+        response = self.client.get(response.data['next'])
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_progress_list_is_cursor_paginated(self):
+        for i in range(5):
+            VideoProgress.objects.create(user=self.user, video_id=f'vid{i}', duration=300.0)
+
+        seen, pages = self._walk(reverse('video-progress-list'), {'page_size': 2})
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len({row['video_id'] for row in seen}), 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'progress-buffer-tests'}})
+class ProgressWriteBehindTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.progress_buffer = progress_buffer
+        for target, value in (('PROGRESS_WRITE_BEHIND', True), ('_ensure_flusher', MagicMock())):
+            patcher = patch.object(progress_buffer, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(progress_buffer._dirty.clear)
+        User = get_user_model()
+        self.user = User.objects.create_user(email='viewer@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('video-progress', args=['vid1'])
+
+    def _progress_writes(self, queries):
+        return [q for q in queries if 'api_videoprogress' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def test_heartbeats_are_buffered_and_flushed_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'video_id': 'vid1', 'current_time': 5, 'duration': 100,
+                                                   'percentage_watched': 5}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            for second in (10, 15, 20):
+                response = self.client.patch(self.url, {'current_time': second, 'percentage_watched': second},
+                                             format='json')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._progress_writes(queries), [])
+        self.assertFalse(VideoProgress.objects.exists())
+
+        # Reads see the buffered state before it is flushed.
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['current_time'], 20)
+        self.assertEqual(response.data['duration'], 100)
+
+        self.assertEqual(self.progress_buffer.flush(), 1)
+        row = VideoProgress.objects.get(user=self.user, video_id='vid1')
+        self.assertEqual((row.current_time, row.percentage_watched), (20, 20))
+        self.assertEqual(self.progress_buffer.flush(), 0)
+
+    def test_flush_updates_existing_rows_and_list_merges_buffer(self):
+        VideoProgress.objects.create(user=self.user, video_id='vid1', current_time=1, duration=100,
+                                     percentage_watched=1)
+        self.client.patch(self.url, {'current_time': 50, 'percentage_watched': 50}, format='json')
+
+        response = self.client.get(reverse('video-progress-list'))
+        self.assertEqual(response.data['results'][0]['current_time'], 50)
+        self.assertEqual(VideoProgress.objects.get().current_time, 1)
+
+        self.progress_buffer.flush()
+        self.assertEqual(VideoProgress.objects.get().current_time, 50)
+        self.assertEqual(VideoProgress.objects.count(), 1)
+
+    def test_delete_drops_buffered_progress(self):
+        self.client.post(self.url, {'video_id': 'vid1', 'current_time': 5, 'duration': 100}, format='json')
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.progress_buffer.flush(), 0)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_pages_by_stored_rows_while_progress_is_buffered(self):
+        for i in range(5):
+            VideoProgress.objects.create(user=self.user, video_id=f'vid{i}', duration=300.0)
+        # vid3 is the last row of the first page; its buffered heartbeat is newer than every row.
+        self.client.patch(reverse('video-progress', args=['vid3']), {'current_time': 90}, format='json')
+
+        seen, url, params = [], reverse('video-progress-list'), {'page_size': 2}
+        while url and len(seen) <= 5:
+            response = self.client.get(url, params)
+            seen.extend(response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(sorted(row['video_id'] for row in seen), [f'vid{i}' for i in range(5)])
+        self.assertEqual(next(row for row in seen if row['video_id'] == 'vid3')['current_time'], 90)
+
+    def test_sync_supersedes_older_buffered_progress(self):
+        self.client.post(self.url, {'video_id': 'vid1', 'current_time': 5, 'duration': 100}, format='json')
+        record = {'video_id': 'vid1', 'current_time': 70, 'duration': 100, 'percentage_watched': 70,
+                  'client_timestamp': timezone.now().isoformat()}
+        response = self.client.post(reverse('video-progress-sync'), {'records': [record]}, format='json')
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(self.client.get(self.url).data['current_time'], 70)
+        # Flushing the older heartbeat afterwards doesn't roll the row back.
+        self.progress_buffer._dirty.add((self.user.pk, 'vid1'))
+        self.progress_buffer.flush()
+        self.assertEqual(VideoProgress.objects.get().current_time, 70)
+
+    def test_redis_dirty_index_is_flushed_by_any_process(self):
+        class FakeRedisSets:
+            """The set commands of a Redis client, for one shared server."""
+            def __init__(self):
+                self.sets = {}
+
+            def sadd(self, key, *members):
+                self.sets.setdefault(key, set()).update(m.encode() for m in members)
+
+            def srem(self, key, *members):
+                self.sets.get(key, set()).difference_update(m.encode() for m in members)
+
+            def spop(self, key, count):
+                members = self.sets.get(key, set())
+                return [members.pop() for _ in range(min(count, len(members)))]
+
+        redis = FakeRedisSets()
+        with patch.object(self.progress_buffer, '_redis_client', return_value=redis):
+            for video_id in ('vid1', 'vid2'):
+                self.client.post(reverse('video-progress', args=[video_id]),
+                                 {'video_id': video_id, 'current_time': 5, 'duration': 100}, format='json')
+            self.assertEqual(self.progress_buffer._dirty, set())
+            # Another process (here, the management command) flushes what this one buffered.
+            call_command('flush_progress_buffer', stdout=open(os.devnull, 'w'))
+            self.assertEqual(VideoProgress.objects.filter(user=self.user).count(), 2)
+            self.assertEqual(self.progress_buffer.flush(), 0)
+
+class ProgressSyncTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='offline@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('video-progress-sync')
+
+    def _record(self, video_id, current_time, timestamp):
+        return {'video_id': video_id, 'current_time': current_time, 'duration': 100,
+                'percentage_watched': current_time, 'client_timestamp': timestamp.isoformat()}
+
+    def test_sync_writes_batch_in_one_statement(self):
+        earlier = timezone.now() - timedelta(hours=1)
+        records = [self._record(f'vid{i}', i, earlier) for i in range(30)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'records': records}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['applied'], 30)
+        self.assertEqual(len([q for q in queries if 'api_videoprogress' in q['sql']]), 1)
+        self.assertEqual(VideoProgress.objects.filter(user=self.user).count(), 30)
+        self.assertEqual(VideoProgress.objects.get(video_id='vid7').last_watched, earlier)
+
+    def test_latest_client_timestamp_wins(self):
+        now = timezone.now()
+        VideoProgress.objects.create(user=self.user, video_id='vid1', current_time=40, duration=100,
+                                     percentage_watched=40)
+        records = [
+            self._record('vid1', 10, now - timedelta(days=1)),  # older than the stored row
+            self._record('vid2', 20, now - timedelta(minutes=5)),
+            self._record('vid2', 30, now - timedelta(minutes=1)),  # newer duplicate in the same batch
+        ]
+        response = self.client.post(self.url, {'records': records}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({r['video_id']: r['status'] for r in response.data['results']},
+                         {'vid1': 'stale', 'vid2': 'applied'})
+        self.assertEqual(VideoProgress.objects.get(video_id='vid1').current_time, 40)
+        self.assertEqual(VideoProgress.objects.get(video_id='vid2').current_time, 30)
+
+        response = self.client.post(self.url, {'records': [self._record('vid1', 90, timezone.now())]},
+                                    format='json')
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(VideoProgress.objects.get(video_id='vid1').current_time, 90)
+
+    def test_partial_record_takes_model_defaults(self):
+        record = self._record('vid1', 10, timezone.now())
+        del record['current_time'], record['percentage_watched']
+        response = self.client.post(self.url, {'records': [record]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['applied'], 1)
+        progress = VideoProgress.objects.get(user=self.user, video_id='vid1')
+        self.assertEqual((progress.current_time, progress.duration, progress.percentage_watched), (0, 100, 0))
+
+    def test_invalid_records_are_rejected(self):
+        record = self._record('vid1', 10, timezone.now())
+        record['percentage_watched'] = 150
+        response = self.client.post(self.url, {'records': [record]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(VideoProgress.objects.exists())
+
+
+class WatchHistoryImportTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='importer@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=self.user)
+
+    def _takeout(self, count, start_day=1):
+        return [{
+            'header': 'YouTube',
+            'title': f'Watched Video {i}',
+            'titleUrl': f'https://www.youtube.com/watch?v=vid{i % 40}',
+            'subtitles': [{'name': 'Channel', 'url': 'https://www.youtube.com/channel/UC1'}],
+            'time': f'2024-01-{start_day + i // 40:02d}T10:00:{i % 60:02d}.000Z',
+        } for i in range(count)] + [{'header': 'YouTube', 'title': 'Visited an ad', 'time': '2024-01-01T00:00:00Z'}]
+
+    def test_streaming_parser_handles_arrays_and_json_lines(self):
+        entries = [{'n': i, 'text': 'a, [b] {c}'} for i in range(50)]
+        self.assertEqual(list(iter_json_objects(io.StringIO(json.dumps(entries)), read_size=7)), entries)
+        lines = '\n'.join(json.dumps(entry) for entry in entries)
+        self.assertEqual(list(iter_json_objects(io.StringIO(lines), read_size=7)), entries)
+
+    def test_import_upserts_in_chunks(self):
+        WatchedVideo.objects.create(user=self.user, video_id='vid0', title='Old', published_at='2020-01-01T00:00:00Z',
+                                    watched_at=datetime(2023, 1, 1, tzinfo=dt_timezone.utc))
+        WatchedVideo.objects.create(user=self.user, video_id='vid1', title='Newer', published_at='2020-01-01T00:00:00Z',
+                                    watched_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+
+        stats = import_watch_history(self.user, io.StringIO(json.dumps(self._takeout(120))), chunk_size=50)
+        self.assertEqual(stats['read'], 121)
+        self.assertEqual(WatchedVideo.objects.filter(user=self.user).count(), 40)
+        # The existing entry moved forward, the newer one was left alone.
+        vid0 = WatchedVideo.objects.get(video_id='vid0')
+        self.assertEqual((vid0.title, vid0.watched_at), ('Old', datetime(2024, 1, 3, 10, 0, 20, tzinfo=dt_timezone.utc)))
+        self.assertEqual(WatchedVideo.objects.get(video_id='vid1').watched_at.year, 2025)
+        self.assertEqual(WatchedVideo.objects.get(video_id='vid5').title, 'Video 45')  # only watched_at is updated
+        self.assertIn('rows_per_second', stats)
+
+    def test_import_endpoint_and_command(self):
+        upload = SimpleUploadedFile('watch-history.json', json.dumps(self._takeout(10)).encode())
+        response = self.client.post(reverse('watch-history-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['written'], 10)
+
+        response = self.client.post(reverse('watch-history-import'),
+                                    {'file': SimpleUploadedFile('bad.json', b'[{"title": ')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as history_file:
+            json.dump(self._takeout(20, start_day=5), history_file)
+        self.addCleanup(os.remove, history_file.name)
+        call_command('import_watch_history', history_file.name, user=self.user.email, stdout=open(os.devnull, 'w'))
+        self.assertEqual(WatchedVideo.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(WatchedVideo.objects.get(video_id='vid0').watched_at.day, 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'user-state-tests'}})
+class UserStateOverlayTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='overlay@example.com', password='testpass123', is_active=True)
+        self.other = User.objects.create_user(email='other@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=self.user)
+
+    def test_states_are_loaded_once_and_cached(self):
+        VideoProgress.objects.create(user=self.user, video_id='vid2', duration=100, percentage_watched=40)
+        VideoFeedback.objects.create(user=self.other, video_id='vid1', rating=2)
+        with self.assertNumQueries(3):
+            states = get_states(self.user, ['vid1', 'vid2', 'vid1'])
+        self.assertEqual(states['vid1'], {'watched': False, 'progress': None, 'rating': None})
+        self.assertEqual(states['vid2'], {'watched': False, 'progress': 40, 'rating': None})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_states(self.user, ['vid1', 'vid2']), states)
+
+    def test_personal_actions_refresh_only_the_overlay(self):
+        detail_key = generate_cache_key('video_detail', 'vid1')
+        detail_cache.set_many({detail_key: b'shared'}, timeout=60)
+        get_states(self.user, ['vid1'])
+
+        self.client.post(reverse('mark_video_watched'), {
+            'video_id': 'vid1', 'title': 'Video', 'published_at': '2024-01-01T00:00:00Z'
+        }, format='json')
+        self.client.post(reverse('video-feedback-create'), {'video_id': 'vid1', 'rating': 4}, format='json')
+        self.client.post(reverse('video-progress', args=['vid1']), {
+            'video_id': 'vid1', 'current_time': 30, 'duration': 60, 'percentage_watched': 50
+        }, format='json')
+
+        shared = [{'id': 'vid1', 'title': 'Video'}]
+        self.assertEqual(annotate(self.user, shared), [{
+            'id': 'vid1', 'title': 'Video', 'user_state': {'watched': True, 'progress': 50, 'rating': 4}
+        }])
+        self.assertNotIn('user_state', shared[0])
+        self.assertEqual(detail_cache.get_many([detail_key]), {detail_key: b'shared'})
+
+    def test_invalidating_all_of_a_users_videos(self):
+        get_states(self.user, ['vid1'])
+        WatchedVideo.objects.create(user=self.user, video_id='vid1', title='Video', published_at='2024-01-01T00:00:00Z')
+        invalidate(self.user)
+        self.assertTrue(get_states(self.user, ['vid1'])['vid1']['watched'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'search-annotation-tests'}})
+class SearchAnnotationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.payload = {'results': [{'id': f'vid{i}', 'title': f'Video {i}'} for i in range(25)]}
+        patcher = patch('api.views.fetch_videos_by_keyword', return_value=self.payload)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        User = get_user_model()
+        self.user = User.objects.create_user(email='searcher@example.com', password='testpass123', is_active=True)
+
+    def test_authenticated_results_carry_user_state(self):
+        WatchedVideo.objects.create(user=self.user, video_id='vid1', title='Video 1', published_at='2024-01-01T00:00:00Z')
+        VideoProgress.objects.create(user=self.user, video_id='vid2', duration=100, percentage_watched=75)
+        VideoFeedback.objects.create(user=self.user, video_id='vid1', rating=5)
+        self.client.force_authenticate(user=self.user)
+
+        # One query per state table for all 25 results
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('youtube_search'), {'q': 'python'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        states = {result['id']: result['user_state'] for result in response.data['results']}
+        self.assertEqual(states['vid1'], {'watched': True, 'progress': None, 'rating': 5})
+        self.assertEqual(states['vid2'], {'watched': False, 'progress': 75, 'rating': None})
+        self.assertEqual(states['vid3'], {'watched': False, 'progress': None, 'rating': None})
+        # The shared payload is not personalized.
+        self.assertNotIn('user_state', self.payload['results'][0])
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('youtube_search'), {'q': 'python'})
+
+    def test_async_endpoint_annotates_bearer_token_users(self):
+        VideoFeedback.objects.create(user=self.user, video_id='vid1', rating=4)
+        url = reverse('youtube_search_async')
+        with patch('api.views.afetch_videos_by_keyword', new_callable=AsyncMock, return_value=self.payload):
+            response = self.client.get(url, {'q': 'python'},
+                                       HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+            anonymous = self.client.get(url, {'q': 'python'})
+            rejected = self.client.get(url, {'q': 'python'}, HTTP_AUTHORIZATION='Bearer not-a-token')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        states = {result['id']: result['user_state'] for result in response.json()['results']}
+        self.assertEqual(states['vid1'], {'watched': False, 'progress': None, 'rating': 4})
+        self.assertNotIn('user_state', anonymous.json()['results'][0])
+        self.assertEqual(rejected.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_anonymous_results_are_not_annotated(self):
+        response = self.client.get(reverse('youtube_search'), {'q': 'python'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('user_state', response.data['results'][0])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'video-catalog-tests'}})
+class VideoCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        detail_cache.clear_local()
+        # Run background catalog writes inline, inside the test's transaction.
+        patcher = patch.object(catalog, '_write_executor', MagicMock(submit=lambda fn, *args: fn(*args)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _videos_response(self, endpoint, params):
+        response = MagicMock(status_code=200, text='')
+        response.json.return_value = {'items': [{
+            'id': video_id,
+            'snippet': {'title': f'Title {video_id}', 'channelId': 'UC1', 'channelTitle': 'Academy',
+                        'thumbnails': {'high': {'url': f'https://img/{video_id}.jpg'}},
+                        'publishedAt': '2024-01-01T00:00:00Z'},
+            'contentDetails': {'duration': 'PT10M'},
+            'statistics': {'viewCount': '1000', 'likeCount': '10', 'commentCount': '1'},
+        } for video_id in params['id'].split(',')]}
+        return response
+
+    def _catalog_row(self, video_id, age_days):
+        return Video.objects.create(id=video_id, title=video_id, duration_seconds=60, view_count=5,
+                                    fetched_at=timezone.now() - timedelta(days=age_days))
+
+    def test_fetched_videos_are_written_through_to_the_catalog(self):
+        with patch('api.youtube.youtube_client.get', side_effect=self._videos_response), \
+                patch.object(catalog, '_write_executor') as writer:
+            details = get_video_details(['vid1', 'vid2'])
+        self.assertEqual(details['vid1'].duration_seconds, 600)
+        # The write is handed to the writer thread, off the enrichment path.
+        self.assertFalse(Video.objects.exists())
+        write, *args = writer.submit.call_args.args
+        write(*args)
+        video = Video.objects.get(id='vid1')
+        self.assertEqual((video.title, video.channel_title, video.view_count), ('Title vid1', 'Academy', 1000))
+        self.assertEqual(video.thumbnails['high']['url'], 'https://img/vid1.jpg')
+
+    def test_catalog_serves_cache_misses_before_the_api(self):
+        self._catalog_row('fresh', age_days=1)
+        self._catalog_row('stale', age_days=30)
+        with patch('api.youtube.youtube_client.get', side_effect=self._videos_response) as mock_get:
+            details = get_video_details(['fresh', 'stale', 'new'])
+        self.assertEqual(mock_get.call_args.args[1]['id'], 'new,stale')
+        self.assertEqual(details['fresh'].view_count, 5)
+        self.assertEqual(details['stale'].view_count, 1000)
+
+        # Catalog hits were written back to the cache tiers.
+        detail_cache.clear_local()
+        with patch('api.youtube.youtube_client.get') as mock_get, self.assertNumQueries(0):
+            self.assertEqual(get_video_details(['fresh'])['fresh'].duration_seconds, 60)
+        mock_get.assert_not_called()
+
+    def test_stale_rows_are_served_when_fetching_is_off(self):
+        self._catalog_row('stale', age_days=30)
+        with patch('api.youtube.youtube_client.get') as mock_get:
+            details = get_video_details(['stale'], allow_fetch=False)
+        mock_get.assert_not_called()
+        self.assertEqual(details['stale'].view_count, 5)
+
+    def test_refresh_command_refetches_stale_rows(self):
+        self._catalog_row('fresh', age_days=1)
+        self._catalog_row('stale', age_days=30)
+        with patch('api.youtube.youtube_client.get', side_effect=self._videos_response) as mock_get:
+            call_command('refresh_video_catalog', stdout=open(os.devnull, 'w'))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args.args[1]['id'], 'stale')
+        self.assertEqual(Video.objects.get(id='stale').view_count, 1000)
+        self.assertEqual(Video.objects.get(id='fresh').view_count, 5)
+
+    def test_refresh_drops_videos_youtube_no_longer_returns(self):
+        def videos_response(endpoint, params):
+            params = {**params, 'id': ','.join(v for v in params['id'].split(',') if v != 'deleted')}
+            return self._videos_response(endpoint, params)
+
+        self._catalog_row('deleted', age_days=40)
+        self._catalog_row('stale', age_days=30)
+        with patch('api.youtube.youtube_client.get', side_effect=videos_response) as mock_get:
+            call_command('refresh_video_catalog', limit=1, stdout=open(os.devnull, 'w'))
+            self.assertFalse(Video.objects.filter(id='deleted').exists())
+            # The next run moves on to the live stale row.
+            call_command('refresh_video_catalog', limit=1, stdout=open(os.devnull, 'w'))
+        self.assertEqual([call.args[1]['id'] for call in mock_get.call_args_list], ['deleted', 'stale'])
+        self.assertEqual(Video.objects.get(id='stale').view_count, 1000)
+
+    def test_failed_refresh_keeps_rows(self):
+        self._catalog_row('stale', age_days=30)
+        with patch('api.youtube.youtube_client.get', return_value=MagicMock(status_code=503, text='')):
+            call_command('refresh_video_catalog', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Video.objects.get(id='stale').view_count, 5)
@@ -1,15 +1,22 @@
 from django.urls import path
 from .views import (
     YouTubeSearchAPIView, MarkVideoWatchedAPIView, WatchedVideoListView,
-    VideoFeedbackCreateView, VideoFeedbackDetailView, VideoProgressUpdateView
+    VideoFeedbackCreateView, VideoFeedbackDetailView, VideoProgressUpdateView,
+    YouTubeUsageAPIView, AsyncYouTubeSearchView, VideoProgressListView, VideoProgressSyncView,
+    WatchHistoryImportView
 )
 
 urlpatterns = [
     path('search/', YouTubeSearchAPIView.as_view(), name='youtube_search'),
+    path('search/async/', AsyncYouTubeSearchView.as_view(), name='youtube_search_async'),
+    path('youtube/usage/', YouTubeUsageAPIView.as_view(), name='youtube-usage'),
     path('progress/mark/', MarkVideoWatchedAPIView.as_view(), name='mark_video_watched'),
     path('progress/list/', WatchedVideoListView.as_view(), name='watched-videos-list'),
+    path('progress/import/', WatchHistoryImportView.as_view(), name='watch-history-import'),
     path('feedback/', VideoFeedbackCreateView.as_view(), name='video-feedback-create'),
     path('feedback/<str:video_id>/', VideoFeedbackDetailView.as_view(), name='video-feedback-detail'),
+    path('videos/progress/', VideoProgressListView.as_view(), name='video-progress-list'),
+    path('videos/progress/sync/', VideoProgressSyncView.as_view(), name='video-progress-sync'),
     path('videos/<str:video_id>/progress/', VideoProgressUpdateView.as_view(), name='video-progress'),
 ]
 
@@ -0,0 +1,107 @@
+"""
+Per-user overlay of personal video state: watched, progress and rating.
+
+Shared caches (search results, `video_detail` entries) hold the same data for
+everyone and must only be invalidated when that shared data changes. What one
+user did with a video lives here instead, cached per (user, video), and is
+merged onto shared results at read time with `annotate()`.
+
+Missing entries are loaded with one `video_id__in` query per table and cached,
+including "nothing yet" states. Views that change a user's watched, progress
+or feedback rows call `invalidate()` for the affected videos (or for all of the
+user's videos, which bumps a per-user version number).
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from . import progress_buffer
+from .models import VideoFeedback, VideoProgress, WatchedVideo
+
+USER_STATE_CACHE_TIMEOUT = 3600  # seconds
+
+
+def _version_key(user_id):
+    return f"user_state:{user_id}:version"
+
+
+def _version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Start from the clock so entries under an evicted version are never reused.
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(user_id), 0)
+    return version
+
+
+def _state_key(user_id, version, video_id):
+    digest = hashlib.md5(video_id.encode()).hexdigest()
+    return f"user_state:{user_id}:v{version}:{digest}"
+
+
+def load_states(user, video_ids):
+    """
+    Read `user`'s state for `video_ids` from the database, one query per
+    table. Returns a map of video ID to {'watched', 'progress', 'rating'}.
+    """
+    video_ids = list(video_ids)
+    watched = set(WatchedVideo.objects.filter(user=user, video_id__in=video_ids).values_list('video_id', flat=True))
+    progress_rows = list(VideoProgress.objects.filter(user=user, video_id__in=video_ids).only(
+        'video_id', 'percentage_watched', 'last_watched'
+    ))
+    if progress_buffer.PROGRESS_WRITE_BEHIND:
+        progress_rows = progress_buffer.merge(user, progress_rows)
+        stored = {row.video_id for row in progress_rows}
+        progress_rows += progress_buffer.get_many(user, [v for v in video_ids if v not in stored])
+    progress = {row.video_id: row.percentage_watched for row in progress_rows}
+    ratings = dict(VideoFeedback.objects.filter(user=user, video_id__in=video_ids).values_list('video_id', 'rating'))
+    return {
+        video_id: {
+            'watched': video_id in watched,
+            'progress': progress.get(video_id),
+            'rating': ratings.get(video_id),
+        }
+        for video_id in video_ids
+    }
+
+
+def get_states(user, video_ids):
+    """`user`'s state for `video_ids`: cached entries, with the misses loaded and cached."""
+    unique_ids = list(dict.fromkeys(video_ids))
+    if not unique_ids:
+        return {}
+    version = _version(user.pk)
+    keys = {_state_key(user.pk, version, video_id): video_id for video_id in unique_ids}
+    states = {keys[key]: state for key, state in cache.get_many(keys.keys()).items()}
+
+    missing = [video_id for video_id in unique_ids if video_id not in states]
+    if missing:
+        loaded = load_states(user, missing)
+        cache.set_many(
+            {_state_key(user.pk, version, video_id): state for video_id, state in loaded.items()},
+            timeout=USER_STATE_CACHE_TIMEOUT,
+        )
+        states.update(loaded)
+    return states
+
+
+def annotate(user, results, id_field='id'):
+    """
+    Return copies of the shared `results` (dicts keyed by `id_field`) with a
+    `user_state` entry added. The shared dicts themselves are left untouched.
+    """
+    states = get_states(user, [result[id_field] for result in results if result.get(id_field)])
+    return [{**result, 'user_state': states.get(result.get(id_field))} for result in results]
+
+
+def invalidate(user, video_ids=None):
+    """Drop `user`'s cached state for `video_ids`, or for every video if None."""
+    if video_ids is None:
+        try:
+            cache.incr(_version_key(user.pk))
+        except ValueError:
+            cache.add(_version_key(user.pk), time.time_ns(), timeout=None)
+        return
+    version = _version(user.pk)
+    cache.delete_many([_state_key(user.pk, version, video_id) for video_id in video_ids if video_id])
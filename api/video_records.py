@@ -0,0 +1,93 @@
+"""
+Compact cached representation of `videos.list` items.
+
+Search ranking only needs a video's view/like/comment counts and duration, so
+instead of caching the whole API item (snippet, description, tags, localized
+data...) we cache a fixed-size binary record:
+
+    version (B) | flags (B) | views (Q) | likes (Q) | comments (Q) | duration seconds (I)
+
+That is 30 bytes per video, with the ISO-8601 duration already parsed. Records
+with an unknown version decode to None and are treated as a cache miss.
+"""
+import re
+import struct
+from collections import namedtuple
+
+VIDEO_RECORD_VERSION = 1
+_RECORD_V1 = struct.Struct('>BBQQQI')
+
+# Flag bits
+HAS_DURATION = 0x01
+
+_ISO8601_DURATION = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+_MAX_UINT64 = 2 ** 64 - 1
+_MAX_UINT32 = 2 ** 32 - 1
+
+VideoRecord = namedtuple('VideoRecord', ['view_count', 'like_count', 'comment_count', 'duration_seconds'])
+VideoRecord.__doc__ = "Fields of a video used for ranking. `duration_seconds` is None when unknown."
+
+
+def parse_iso8601_duration(duration_str):
+    """Parse a YouTube 'PT#H#M#S' duration into seconds, or None if it doesn't match."""
+    match = _ISO8601_DURATION.match(duration_str or '')
+    if not match:
+        return None
+    hours = int(match.group(1) or 0)
+    minutes = int(match.group(2) or 0)
+    seconds = int(match.group(3) or 0)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_duration(duration_seconds):
+    """Format seconds as HH:MM:SS, or MM:SS for videos under an hour."""
+    hours, remainder = divmod(duration_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def _count(stats, field):
+    try:
+        return min(max(int(stats.get(field, 0)), 0), _MAX_UINT64)
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_from_api_item(item):
+    """Build a VideoRecord from a `videos.list` item."""
+    stats = item.get('statistics', {})
+    duration_seconds = None
+    if 'contentDetails' in item:
+        duration_seconds = parse_iso8601_duration(item['contentDetails'].get('duration', ''))
+    return VideoRecord(
+        view_count=_count(stats, 'viewCount'),
+        like_count=_count(stats, 'likeCount'),
+        comment_count=_count(stats, 'commentCount'),
+        duration_seconds=duration_seconds,
+    )
+
+
+def encode_video_record(record):
+    flags = 0
+    duration_seconds = 0
+    if record.duration_seconds is not None:
+        flags |= HAS_DURATION
+        duration_seconds = min(record.duration_seconds, _MAX_UINT32)
+    return _RECORD_V1.pack(
+        VIDEO_RECORD_VERSION, flags,
+        record.view_count, record.like_count, record.comment_count, duration_seconds,
+    )
+
+
+def decode_video_record(data):
+    """Decode bytes from `encode_video_record`; returns None for anything else."""
+    if not isinstance(data, (bytes, bytearray)) or len(data) != _RECORD_V1.size \
+            or data[0] != VIDEO_RECORD_VERSION:
+        return None
+    _, flags, views, likes, comments, duration_seconds = _RECORD_V1.unpack(data)
+    return VideoRecord(
+        view_count=views,
+        like_count=likes,
+        comment_count=comments,
+        duration_seconds=duration_seconds if flags & HAS_DURATION else None,
+    )
@@ -2,15 +2,41 @@ from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.exceptions import APIException, AuthenticationFailed
 from rest_framework.mixins import CreateModelMixin
-from .youtube import fetch_videos_by_keyword, invalidate_cache
+from rest_framework.parsers import MultiPartParser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import sync_to_async
+import codecs
+import copy
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+from .youtube import fetch_videos_by_keyword, detail_cache
+from .youtube_async import afetch_videos_by_keyword
+from .youtube_client import youtube_client, async_youtube_client
+from . import progress_buffer, quota, user_state
+from .progress_sync import upsert_progress
+from .history_import import import_watch_history
 from .serializers import (
     YouTubeSearchSerializer, WatchedVideoSerializer, 
-    VideoFeedbackSerializer, VideoProgressSerializer
+    VideoFeedbackSerializer, VideoProgressSerializer, VideoProgressSyncSerializer
 )
 from .models import WatchedVideo, VideoFeedback, VideoProgress
+from .pagination import WatchHistoryCursorPagination, VideoProgressCursorPagination
+
+
+class SearchUnavailable(APIException):
+    """Search for an uncached query while the YouTube quota is nearly exhausted."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Search is temporarily unavailable.'
+    default_code = 'search_unavailable'
+
+    def __init__(self, detail=None, wait=None):
+        super().__init__(detail)
+        self.wait = wait  # sent as Retry-After by DRF's exception handler
 
 
 class YouTubeSearchAPIView(ListAPIView):
@@ -26,34 +52,115 @@ class YouTubeSearchAPIView(ListAPIView):
         
         results = fetch_videos_by_keyword(query, **validated_data) # Pass query positionally
         
+        if "retry_after" in results:
+            raise SearchUnavailable(results["error"], wait=results["retry_after"])
         if "error" in results:
             raise APIException(detail=results["error"], code=status.HTTP_502_BAD_GATEWAY)
         
+        # Keep the full payload around for pagination tokens and cache metadata.
+        self.search_payload = results
         return results.get('results', [])
     
     def list(self, request, *args, **kwargs):
         results = self.get_queryset()
+        if request.user.is_authenticated:
+            # Personal state is merged per request; the cached search entry stays shared.
+            results = user_state.annotate(request.user, results)
         params_serializer = self.get_serializer(data=self.request.query_params)
         params_serializer.is_valid(raise_exception=True)
         
-        # Caution - direct attribute access will raise AttributeError if attributes don't exist
-        # Only use this approach if you're sure pagination_token and prev_token are always set
-        try:
-            next_page = self.pagination_token
-            prev_page = self.prev_token
-        except AttributeError:
-            # Fallback to None if attributes don't exist
-            next_page = None
-            prev_page = None
-        
-        return Response({
+        payload = self.search_payload
+        cache_age = payload.get('cache_age_seconds', 0)
+        response = Response({
             'results': results,
             'query': params_serializer.validated_data['q'],
             'total_results': len(results),
-            'next_page_token': next_page,
-            'prev_page_token': prev_page
+            'next_page_token': payload.get('next_page_token'),
+            'prev_page_token': payload.get('prev_page_token'),
+            'cache_age_seconds': cache_age,
+            'stale': payload.get('stale', False),
         }, status=status.HTTP_200_OK)
-        
+        # Age of the served search data; > SEARCH_CACHE_TIMEOUT means a refresh is underway.
+        response['X-Cache-Age'] = str(cache_age)
+        return response
+
+
+def _jwt_user(request):
+    """The user of the request's bearer token, as DRF would authenticate it, or None."""
+    authenticated = JWTAuthentication().authenticate(request)
+    return authenticated[0] if authenticated else None
+
+
+class AsyncYouTubeSearchView(View):
+    """
+    Async twin of YouTubeSearchAPIView: same parameters, authentication and
+    response body. DRF views are sync-only, hence a plain Django view.
+
+    The YouTube calls of a search run concurrently on the event loop. The view
+    does not free its worker thread while it waits, though: WhiteNoiseMiddleware
+    is sync-only, so Django runs the middleware chain, and with it each request,
+    in a thread of its own.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await sync_to_async(_jwt_user)(request)
+        except AuthenticationFailed as e:
+            response = JsonResponse({'detail': e.detail}, status=e.status_code)
+            response['WWW-Authenticate'] = JWTAuthentication().authenticate_header(request)
+            return response
+
+        serializer = YouTubeSearchSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = dict(serializer.validated_data)
+        query = validated_data.pop('q')
+        if isinstance(request, ASGIRequest):
+            payload = await afetch_videos_by_keyword(query, **validated_data)
+        else:
+            # Under WSGI each async view runs in a new event loop; don't leave its client open.
+            async with async_youtube_client.loop_scope():
+                payload = await afetch_videos_by_keyword(query, **validated_data)
+        if "retry_after" in payload:
+            # Same as SearchUnavailable raised by the sync view
+            response = JsonResponse({'detail': payload["error"]}, status=SearchUnavailable.status_code)
+            response['Retry-After'] = str(payload["retry_after"])
+            return response
+        if "error" in payload:
+            # Same status and body as the APIException raised by the sync view
+            return JsonResponse({'detail': payload["error"]}, status=APIException.status_code)
+
+        results = payload.get('results', [])
+        if user is not None:
+            results = await sync_to_async(user_state.annotate)(user, results)
+        cache_age = payload.get('cache_age_seconds', 0)
+        response = JsonResponse({
+            'results': results,
+            'query': query,
+            'total_results': len(results),
+            'next_page_token': payload.get('next_page_token'),
+            'prev_page_token': payload.get('prev_page_token'),
+            'cache_age_seconds': cache_age,
+            'stale': payload.get('stale', False),
+        }, status=status.HTTP_200_OK)
+        response['X-Cache-Age'] = str(cache_age)
+        return response
+
+
+
+class YouTubeUsageAPIView(APIView):
+    """Today's YouTube quota usage, upstream latency and detail cache hit ratios (staff only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'quota': quota.usage(),
+            'latency': youtube_client.stats(),
+            'latency_async': async_youtube_client.stats(),
+            'detail_cache': detail_cache.stats(),
+        }, status=status.HTTP_200_OK)
+
 
 class MarkVideoWatchedAPIView(CreateAPIView):
     permission_classes = [IsAuthenticated]
@@ -64,16 +171,59 @@ class MarkVideoWatchedAPIView(CreateAPIView):
         if WatchedVideo.objects.filter(user=self.request.user, video_id=video_id).exists():
             raise serializers.ValidationError({"video_id": "Video already marked as watched."})
         serializer.save(user=self.request.user)
-        # Invalidate video details cache
-        invalidate_cache(video_id=video_id)
+        # Personal state only: the shared video caches are unaffected.
+        user_state.invalidate(self.request.user, [video_id])
+
+
+class WatchHistoryImportView(APIView):
+    """
+    Import a watch history file (Google Takeout `watch-history.json`, or a
+    JSON array / JSON Lines of watched-video records) uploaded as `file`.
+    The file is streamed and upserted in chunks (see `api.history_import`).
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": "A history file is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            stats = import_watch_history(request.user, codecs.getreader('utf-8-sig')(upload))
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"file": f"Could not read the history file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            # Chunks may have been written even if a later one failed.
+            user_state.invalidate(request.user)
+        return Response(stats, status=status.HTTP_200_OK)
 
 
 class WatchedVideoListView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = WatchedVideoSerializer
+    pagination_class = WatchHistoryCursorPagination
     
     def get_queryset(self):
-        return WatchedVideo.objects.filter(user=self.request.user).order_by('-watched_at')
+        # Ordering comes from the pagination class
+        return WatchedVideo.objects.filter(user=self.request.user)
+
+
+class VideoProgressListView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = VideoProgressSerializer
+    pagination_class = VideoProgressCursorPagination
+
+    def get_queryset(self):
+        return VideoProgress.objects.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        if progress_buffer.PROGRESS_WRITE_BEHIND and page:
+            # Rows may lag behind progress that is still buffered. Overlay it on
+            # copies: the cursor links are built from the rows as stored.
+            page = progress_buffer.merge(request.user, [copy.copy(row) for row in page])
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class VideoFeedbackCreateView(CreateAPIView):
@@ -82,8 +232,7 @@ class VideoFeedbackCreateView(CreateAPIView):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
-        # Invalidate video details cache
-        invalidate_cache(video_id=self.request.data.get('video_id'))
+        user_state.invalidate(self.request.user, [serializer.instance.video_id])
 
 
 class VideoFeedbackDetailView(RetrieveUpdateDestroyAPIView):
@@ -96,7 +245,11 @@ class VideoFeedbackDetailView(RetrieveUpdateDestroyAPIView):
 
     def perform_update(self, serializer):
         serializer.save(user=self.request.user)
-        invalidate_cache(video_id=self.kwargs.get('video_id'))
+        user_state.invalidate(self.request.user, [self.kwargs['video_id']])
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        user_state.invalidate(self.request.user, [self.kwargs['video_id']])
 
 
 class VideoProgressUpdateView(CreateModelMixin, RetrieveUpdateDestroyAPIView):
@@ -108,12 +261,78 @@ class VideoProgressUpdateView(CreateModelMixin, RetrieveUpdateDestroyAPIView):
         return self.create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        if progress_buffer.PROGRESS_WRITE_BEHIND:
+            serializer.instance = progress_buffer.record(
+                self.request.user, serializer.validated_data['video_id'], serializer.validated_data
+            )
+        else:
+            serializer.save(user=self.request.user)
+        user_state.invalidate(self.request.user, [serializer.instance.video_id])
 
     def get_queryset(self):
         return VideoProgress.objects.filter(user=self.request.user)
 
+    def get_object(self):
+        if progress_buffer.PROGRESS_WRITE_BEHIND:
+            buffered = progress_buffer.get(self.request.user, self.kwargs['video_id'])
+            if buffered is not None:
+                return buffered
+        return super().get_object()
+
     def perform_update(self, serializer):
-        serializer.save(user=self.request.user)
-        invalidate_cache(video_id=self.kwargs.get('video_id'))
-        invalidate_cache(video_id=self.kwargs.get('video_id'))
+        if progress_buffer.PROGRESS_WRITE_BEHIND:
+            # Heartbeats only touch the buffer; the row is written by the next flush.
+            values = {field: getattr(serializer.instance, field) for field in progress_buffer.BUFFERED_FIELDS}
+            values.update(serializer.validated_data)
+            serializer.instance = progress_buffer.record(self.request.user, self.kwargs['video_id'], values)
+        else:
+            serializer.save(user=self.request.user)
+        user_state.invalidate(self.request.user, [self.kwargs['video_id']])
+
+    def perform_destroy(self, instance):
+        if progress_buffer.PROGRESS_WRITE_BEHIND:
+            progress_buffer.discard(self.request.user, self.kwargs['video_id'])
+            # The instance may be a buffered, never-saved record.
+            self.get_queryset().filter(video_id=self.kwargs['video_id']).delete()
+        else:
+            super().perform_destroy(instance)
+        user_state.invalidate(self.request.user, [self.kwargs['video_id']])
+
+
+class VideoProgressSyncView(APIView):
+    """
+    Upload a batch of progress records (e.g. from a client coming back
+    online) in one request. All records are written with a single bulk
+    upsert; for each video the record with the latest `client_timestamp`
+    wins, whether it is the uploaded one or the one already stored.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = VideoProgressSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        now = timezone.now()
+        latest = {}
+        for record in serializer.validated_data['records']:
+            # Clocks ahead of the server must not pin a record as the newest forever.
+            record['last_watched'] = min(record.pop('client_timestamp'), now)
+            current = latest.get(record['video_id'])
+            if current is None or record['last_watched'] >= current['last_watched']:
+                latest[record['video_id']] = record
+
+        applied = upsert_progress([{'user_id': request.user.pk, **record} for record in latest.values()])
+        applied_video_ids = {video_id for _, video_id in applied}
+        user_state.invalidate(request.user, applied_video_ids)
+        if progress_buffer.PROGRESS_WRITE_BEHIND:
+            progress_buffer.drop_superseded(request.user, {
+                video_id: latest[video_id]['last_watched'] for video_id in applied_video_ids
+            })
+
+        return Response({
+            'applied': len(applied_video_ids),
+            'results': [
+                {'video_id': video_id, 'status': 'applied' if video_id in applied_video_ids else 'stale'}
+                for video_id in latest
+            ]
+        }, status=status.HTTP_200_OK)
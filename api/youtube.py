@@ -1,24 +1,55 @@
-import requests
 from decouple import config
-import re
 import json
-from django.core.cache import cache
 import hashlib
-import math
 import traceback # For more detailed error logging
 import logging
+import math
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait
+from . import catalog, prefetch, quota
+from .youtube_client import youtube_client
+from .video_records import record_from_api_item, encode_video_record, decode_video_record
+from .scoring import rank_search_results
+from .caching import (
+    single_flight, set_with_soft_expiry, get_with_soft_expiry, get_value_with_soft_expiry,
+    refresh_in_background, TwoTierCache
+)
 
 logger = logging.getLogger(__name__)
 
 API_KEY = config("YOUTUBE_API_KEY")
-SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
-VIDEO_URL = "https://www.googleapis.com/youtube/v3/videos"
-CHANNEL_URL = "https://www.googleapis.com/youtube/v3/channels"
 
 # Cache timeouts
+# Search results are served fresh up to SEARCH_CACHE_TIMEOUT, then served stale
+# while being refreshed in the background until SEARCH_CACHE_HARD_TIMEOUT.
 SEARCH_CACHE_TIMEOUT = 3600  # 1 hour
+SEARCH_CACHE_HARD_TIMEOUT = 6 * 3600  # 6 hours
 VIDEO_DETAILS_CACHE_TIMEOUT = 86400  # 24 hours
 CHANNEL_DETAILS_CACHE_TIMEOUT = 86400  # 24 hours
+PARTIAL_SEARCH_CACHE_TIMEOUT = 60  # Results missing enrichment are retried soon
+
+# video_detail / channel_detail entries are read through a per-process LRU in
+# front of the shared cache. The short local TTL bounds how long another
+# worker can serve an entry after invalidate_cache() ran elsewhere.
+DETAIL_LOCAL_CACHE_MAX_ENTRIES = 4096
+DETAIL_LOCAL_CACHE_TIMEOUT = 300  # 5 minutes
+detail_cache = TwoTierCache(max_entries=DETAIL_LOCAL_CACHE_MAX_ENTRIES, local_timeout=DETAIL_LOCAL_CACHE_TIMEOUT)
+
+# Enrichment (videos.list / channels.list) runs concurrently under one deadline.
+ENRICHMENT_DEADLINE = config('YOUTUBE_ENRICHMENT_DEADLINE', default=8.0, cast=float)
+ID_CHUNK_SIZE = 50  # Max IDs per videos.list / channels.list call
+# Single-flight timeouts for a search: search.list with all its retries timing
+# out, then enrichment up to its deadline. Followers wait that long for the
+# leader; the lock lasts a little longer, for ranking and cache writes.
+SEARCH_WORST_CASE_SECONDS = youtube_client.worst_case_seconds('search') + ENRICHMENT_DEADLINE
+SEARCH_WAIT_TIMEOUT = math.ceil(SEARCH_WORST_CASE_SECONDS)
+SEARCH_LOCK_TIMEOUT = SEARCH_WAIT_TIMEOUT + 5
+
+# Both pools read and write the video catalog (see `api.catalog`).
+_enrichment_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='yt-enrich',
+                                          initializer=catalog.mark_worker_thread)
+_chunk_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='yt-chunk',
+                                     initializer=catalog.mark_worker_thread)
 
 
 def generate_cache_key(prefix, identifier_string):
@@ -27,10 +58,12 @@ def generate_cache_key(prefix, identifier_string):
     return hashlib.md5(key_string.encode()).hexdigest()
 
 
-def get_channel_details_map(channel_ids):
+def get_channel_details_map(channel_ids, allow_fetch=True):
     """
     Get details (especially thumbnails) for a list of channel IDs.
-    Items are cached individually.
+    Items are cached individually but read and written with multi-key cache
+    operations, so a lookup costs a constant number of cache round trips.
+    With `allow_fetch=False` only cached entries are returned (no quota spent).
     Returns a map of channelId to its medium profile picture URL.
     """
     if not channel_ids:
@@ -40,67 +73,152 @@ def get_channel_details_map(channel_ids):
     channel_details_map = {}
     ids_to_fetch = []
 
-    for channel_id in unique_channel_ids:
-        cache_key = generate_cache_key("channel_detail", channel_id)
-        cached_channel_data = cache.get(cache_key)
+    cache_keys = {generate_cache_key("channel_detail", channel_id): channel_id for channel_id in unique_channel_ids}
+    cached_channels = detail_cache.get_many(cache_keys.keys())
+    for cache_key, channel_id in cache_keys.items():
+        cached_channel_data = cached_channels.get(cache_key)
         if cached_channel_data:
             channel_details_map[channel_id] = cached_channel_data
-            logger.info(f"Cache hit for channel_detail: {channel_id}")
         else:
             ids_to_fetch.append(channel_id)
+    if channel_details_map:
+        logger.info(f"Cache hit for channel_detail: {list(channel_details_map)}")
 
-    if ids_to_fetch:
+    if ids_to_fetch and allow_fetch:
         logger.info(f"Cache miss for channel_details: {ids_to_fetch}. Fetching from API.")
-        chunk_size = 50
-        for i in range(0, len(ids_to_fetch), chunk_size):
-            chunk = ids_to_fetch[i:i + chunk_size]
-            params = {
-                'part': 'snippet',
-                'id': ','.join(chunk),
-                'key': API_KEY
-            }
-            try:
-                response = requests.get(CHANNEL_URL, params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    for item in data.get('items', []):
-                        fetched_channel_id = item['id']
-                        thumbnails = item.get('snippet', {}).get('thumbnails', {})
-                        profile_pic_url = thumbnails.get('medium', {}).get('url') or \
-                                          thumbnails.get('default', {}).get('url')
-                        if profile_pic_url:
-                            channel_details_map[fetched_channel_id] = profile_pic_url
-                            # Cache individually
-                            individual_cache_key = generate_cache_key("channel_detail", fetched_channel_id)
-                            cache.set(individual_cache_key, profile_pic_url, timeout=CHANNEL_DETAILS_CACHE_TIMEOUT)
-                            logger.info(f"Cached channel_detail: {fetched_channel_id}")
-                else:
-                    logger.error(f"Error fetching channel details: {response.status_code} for IDs {','.join(chunk)}")
-                    logger.error(f"Response: {response.text}")
-            except Exception as e:
-                logger.error(f"Exception fetching channel details for IDs {','.join(chunk)}: {str(e)}")
+        for fetched_map in _map_chunks(_fetch_channel_chunk, ids_to_fetch):
+            channel_details_map.update(fetched_map)
     return channel_details_map
 
 
-def fetch_videos_by_keyword(query, max_results=25, educational_focus=True, content_filter='moderate',
-                          min_duration=None, max_duration=None, sort_by='viewCount', page_token=None):
+def _map_chunks(fetch_chunk, ids, chunk_size=ID_CHUNK_SIZE):
     """
-    Enhanced search function with caching, pagination, and advanced filtering.
+    Apply `fetch_chunk` to `ids` split into API-sized chunks.
+    Chunks are fetched in parallel when there is more than one.
+    """
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    if len(chunks) == 1:
+        return [fetch_chunk(chunks[0])]
+    return list(_chunk_executor.map(fetch_chunk, chunks))
 
-    Args:
-        query (str): The search term.
-        max_results (int): Maximum number of results to return.
-        educational_focus (bool): Whether to apply educational content filtering.
-        content_filter (str): Content filtering level ('none', 'moderate', 'strict').
-        min_duration (int): Minimum video duration in seconds.
-        max_duration (int): Maximum video duration in seconds.
-        sort_by (str): Sorting criteria ('relevance', 'date', 'viewCount', 'rating').
-        page_token (str): Token for pagination.
+
+def _fetch_channel_chunk(chunk):
+    """Fetch and cache profile picture URLs for up to 50 channel IDs."""
+    fetched = {}
+    params = {
+        'part': 'snippet',
+        'id': ','.join(chunk),
+        'key': API_KEY
+    }
+    try:
+        response = youtube_client.get('channels', params)
+        if response.status_code == 200:
+            data = response.json()
+            for item in data.get('items', []):
+                fetched_channel_id = item['id']
+                thumbnails = item.get('snippet', {}).get('thumbnails', {})
+                profile_pic_url = thumbnails.get('medium', {}).get('url') or \
+                                  thumbnails.get('default', {}).get('url')
+                if profile_pic_url:
+                    fetched[fetched_channel_id] = profile_pic_url
+            # Cache individually, in one round trip
+            detail_cache.set_many(
+                {generate_cache_key("channel_detail", cid): url for cid, url in fetched.items()},
+                timeout=CHANNEL_DETAILS_CACHE_TIMEOUT
+            )
+            logger.info(f"Cached channel_detail: {list(fetched)}")
+        else:
+            logger.error(f"Error fetching channel details: {response.status_code} for IDs {','.join(chunk)}")
+            logger.error(f"Response: {response.text}")
+    except Exception as e:
+        logger.error(f"Exception fetching channel details for IDs {','.join(chunk)}: {str(e)}")
+    return fetched
+
+
+def _fetch_video_chunk(chunk, save=catalog.save_api_items_later):
+    """
+    Fetch up to 50 videos, cache them as compact VideoRecords and write them
+    through to the video catalog with `save`; by default in the background, so
+    the write doesn't count against ENRICHMENT_DEADLINE. (Extra parts don't
+    cost extra quota.)
+    """
+    fetched = {}
+    params = {
+        'part': 'snippet,contentDetails,statistics',
+        'id': ','.join(chunk),
+        'key': API_KEY
+    }
+    try:
+        response = youtube_client.get('videos', params)
+        if response.status_code == 200:
+            data = response.json()
+            for item in data.get('items', []):
+                fetched[item['id']] = record_from_api_item(item)
+            # Cache individually, in one round trip
+            detail_cache.set_many(
+                {generate_cache_key("video_detail", vid): encode_video_record(record)
+                 for vid, record in fetched.items()},
+                timeout=VIDEO_DETAILS_CACHE_TIMEOUT
+            )
+            save(data.get('items', []), requested_ids=chunk)
+            logger.info(f"Cached video_detail: {list(fetched)}")
+        else:
+            logger.error(f"Error fetching video details: {response.status_code} for IDs {','.join(chunk)}")
+    except Exception as e:
+        logger.error(f"Exception fetching video details for IDs {','.join(chunk)}: {str(e)}")
+    return fetched
+
+
+def fetch_enrichment(video_ids, channel_ids, deadline=ENRICHMENT_DEADLINE, degradation=quota.FULL_SERVICE):
+    """
+    Fetch video details and channel thumbnails concurrently.
+
+    Both lookups share a single total `deadline` (seconds). A branch that has
+    not finished in time is reported in `incomplete` and contributes an empty
+    map; it keeps running in the background and still warms the per-item cache.
+
+    `degradation` (see `api.quota`) turns branches into cache-only lookups to
+    save quota; such branches are reported in `incomplete` too.
 
     Returns:
-        dict: Processed search results with educational relevance and pagination info.
+        tuple: (detailed_videos_map, channel_profile_pics_map, incomplete)
+    """
+    fetch_videos = degradation < quota.SKIP_STATISTICS
+    fetch_channels = degradation < quota.SKIP_CHANNELS
+    futures = {
+        'video_details': _enrichment_executor.submit(get_video_details, video_ids, fetch_videos),
+        'channel_details': _enrichment_executor.submit(get_channel_details_map, channel_ids, fetch_channels),
+    }
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    maps = {}
+    incomplete = []
+    if not fetch_videos:
+        incomplete.append('video_details')
+    if not fetch_channels:
+        incomplete.append('channel_details')
+    for branch, future in futures.items():
+        if future in done and future.exception() is None:
+            maps[branch] = future.result()
+        else:
+            if future in done:
+                logger.error(f"Enrichment branch '{branch}' failed: {future.exception()}")
+            else:
+                logger.warning(f"Enrichment branch '{branch}' missed the {deadline}s deadline")
+            if branch not in incomplete:
+                incomplete.append(branch)
+            maps[branch] = {}
+    return maps['video_details'], maps['channel_details'], incomplete
+
+
+def build_search_request(query, max_results=25, educational_focus=True, content_filter='moderate',
+                         sort_by='viewCount', page_token=None):
+    """
+    Build the search.list parameters and the search cache key.
+
+    Returns:
+        tuple: (effective_query, api_params_for_call, search_cache_key)
     """
-    # Generate cache key
     api_params = {
         'part': 'snippet',
         'q': query, # This will be updated to effective_query before API call
@@ -133,107 +251,115 @@ def fetch_videos_by_keyword(query, max_results=25, educational_focus=True, conte
     api_params_hash = hashlib.md5(json.dumps(api_params_for_call, sort_keys=True).encode()).hexdigest()
     # Using original_query in prefix for human readability if desired, but hash ensures uniqueness
     search_cache_key = generate_cache_key(f"search:{query}", api_params_hash) 
-    
-    cached_result = cache.get(search_cache_key)
-    if cached_result:
-        logger.info(f"Cache hit for search query '{query}' (effective: '{effective_query}') with params hash: {api_params_hash}")
-        return cached_result
+    return effective_query, api_params_for_call, search_cache_key
+
+
+def fetch_videos_by_keyword(query, max_results=25, educational_focus=True, content_filter='moderate',
+                          min_duration=None, max_duration=None, sort_by='viewCount', page_token=None):
+    """
+    Enhanced search function with caching, pagination, and advanced filtering.
+
+    Args:
+        query (str): The search term.
+        max_results (int): Maximum number of results to return.
+        educational_focus (bool): Whether to apply educational content filtering.
+        content_filter (str): Content filtering level ('none', 'moderate', 'strict').
+        min_duration (int): Minimum video duration in seconds.
+        max_duration (int): Maximum video duration in seconds.
+        sort_by (str): Sorting criteria ('relevance', 'date', 'viewCount', 'rating').
+        page_token (str): Token for pagination.
 
+    Returns:
+        dict: Processed search results with educational relevance and pagination info.
+    """
+    effective_query, api_params_for_call, search_cache_key = build_search_request(
+        query, max_results, educational_focus, content_filter, sort_by, page_token
+    )
+
+    def compute():
+        return _search_youtube(query, effective_query, api_params_for_call, search_cache_key,
+                               min_duration, max_duration)
+
+    cached = get_with_soft_expiry(search_cache_key)
+    if cached is not None:
+        cached_result, age, is_stale = cached
+        logger.info(f"Cache hit for search query '{query}' (effective: '{effective_query}'), key {search_cache_key}")
+        if is_stale and quota.degradation_level() < quota.CACHE_ONLY:
+            # Serve the stale payload now; one worker refreshes it in the background.
+            refresh_in_background(search_cache_key, compute, lock_timeout=SEARCH_LOCK_TIMEOUT)
+        result = _with_cache_age(cached_result, age, is_stale)
+    elif quota.degradation_level() >= quota.CACHE_ONLY:
+        logger.warning(f"YouTube quota nearly exhausted, not searching for '{effective_query}'")
+        return {"error": "Search is temporarily limited to cached results", "status": 503,
+                "retry_after": quota.seconds_until_reset()}
+    else:
+        result = _with_cache_age(single_flight(
+            search_cache_key, compute, lock_timeout=SEARCH_LOCK_TIMEOUT, wait_timeout=SEARCH_WAIT_TIMEOUT,
+            read=get_value_with_soft_expiry
+        ), 0, False)
+
+    prefetch_next_page(query, result, max_results, educational_focus, content_filter,
+                       min_duration, max_duration, sort_by, page_token)
+    return result
+
+
+def prefetch_next_page(query, result, max_results=25, educational_focus=True, content_filter='moderate',
+                       min_duration=None, max_duration=None, sort_by='viewCount', page_token=None):
+    """
+    Hand the page after `result` to the speculative prefetcher (`api.prefetch`).
+    Takes the arguments of the search that produced `result`.
+    """
+    next_page_token = result.get('next_page_token')
+    if "error" in result or not next_page_token or not prefetch.prefetch_allowed():
+        return False
+
+    # The first page's key identifies the search for popularity counting.
+    _, _, first_page_key = build_search_request(query, max_results, educational_focus, content_filter, sort_by)
+    effective_query, api_params_for_call, next_page_key = build_search_request(
+        query, max_results, educational_focus, content_filter, sort_by, next_page_token
+    )
+    return prefetch.maybe_prefetch(
+        next_page_key,
+        lambda: _search_youtube(query, effective_query, api_params_for_call, next_page_key,
+                                min_duration, max_duration),
+        first_page_key,
+        paging=bool(page_token),
+        lock_timeout=SEARCH_LOCK_TIMEOUT,
+    )
+
+
+def _with_cache_age(result, age, is_stale):
+    """Annotate a search payload with how old the served data is."""
+    if "error" in result:
+        return result
+    return {**result, "cache_age_seconds": int(age), "stale": is_stale}
+
+
+def _search_youtube(query, effective_query, api_params_for_call, search_cache_key,
+                    min_duration=None, max_duration=None):
+    """
+    Run search.list plus enrichment for a search that missed the cache and store
+    the outcome under `search_cache_key`. Called through `single_flight`, so only
+    one worker at a time does this for a given key.
+    """
     logger.info(f"Searching YouTube for: '{effective_query}'")
     try:
-        response = requests.get(SEARCH_URL, params=api_params_for_call)
+        response = youtube_client.get('search', api_params_for_call)
         logger.info(f"YouTube API request URL: {response.url.replace(API_KEY, 'API_KEY_HIDDEN')}")
         logger.info(f"Status Code: {response.status_code}")
 
         if response.status_code == 200:
             search_data = response.json()
-            item_count = len(search_data.get('items', []))
-            logger.info(f"YouTube API returned {item_count} items")
-
-            if item_count == 0:
-                result = { # Define result before caching
-                    "results": [],
-                    "message": "No videos found for your search",
-                    "next_page_token": search_data.get('nextPageToken'),
-                    "prev_page_token": search_data.get('prevPageToken')
-                }
-                cache.set(search_cache_key, result, timeout=SEARCH_CACHE_TIMEOUT)
-                return result
-
-            video_ids = []
-            source_channel_ids = []
-            for item in search_data.get('items', []):
-                try:
-                    if 'id' in item and 'videoId' in item['id']:
-                        video_ids.append(item['id']['videoId'])
-                        if 'channelId' in item['snippet']:
-                             source_channel_ids.append(item['snippet']['channelId'])
-                except (KeyError, TypeError) as e:
-                    logger.error(f"Error extracting video ID or source channel ID: {e}")
-            
-            if not video_ids:
-                result = { # Define result before caching
-                    "results": [],
-                    "message": "No valid videos found",
-                    "debug_info": {
-                        "response_structure": str(search_data.keys()),
-                        "item_count": item_count
-                    },
-                    "next_page_token": search_data.get('nextPageToken'),
-                    "prev_page_token": search_data.get('prevPageToken')
-                }
-                cache.set(search_cache_key, result, timeout=SEARCH_CACHE_TIMEOUT)
-                return result
-
-            detailed_videos_map = get_video_details(video_ids)
-            channel_profile_pics_map = get_channel_details_map(source_channel_ids)
-
-            processed_results = process_search_results(
-                search_data, detailed_videos_map, channel_profile_pics_map, 
-                query, min_duration, max_duration
-            )
+            video_ids, source_channel_ids = extract_search_ids(search_data)
+            enrichment = ({}, {}, [])
+            if video_ids:
+                enrichment = fetch_enrichment(video_ids, source_channel_ids, degradation=quota.degradation_level())
 
-            final_result_data = {} # Define before conditional assignment
-            if not processed_results and item_count > 0:
-                logger.info("All videos were filtered out, using basic results")
-                basic_results = []
-                for item_basic in search_data.get('items', []): # Renamed item to item_basic
-                    try:
-                        video_id_basic = item_basic['id']['videoId'] # Renamed
-                        snippet_basic = item_basic['snippet'] # Renamed
-                        basic_results.append({
-                            'id': video_id_basic,
-                            'title': snippet_basic.get('title', ''),
-                            'description': snippet_basic.get('description', ''),
-                            'thumbnail': snippet_basic.get('thumbnails', {}).get('high', {}).get('url', ''),
-                            'channelTitle': snippet_basic.get('channelTitle', ''),
-                            'publishedAt': snippet_basic.get('publishedAt', ''),
-                            # Add channelProfileImageUrl if available, even for basic
-                            'channelProfileImageUrl': channel_profile_pics_map.get(snippet_basic.get('channelId')),
-                        })
-                    except (KeyError, TypeError) as e:
-                        logger.error(f"Error extracting basic video data: {e}")
-
-
-                final_result_data = {
-                    "results": basic_results,
-                    "query": query,
-                    "total_results": len(basic_results),
-                    "note": "Using unfiltered results due to filter removing all items",
-                    "next_page_token": search_data.get('nextPageToken'),
-                    "prev_page_token": search_data.get('prevPageToken')
-                }
-            else:
-                final_result_data = {
-                    "results": processed_results,
-                    "query": query,
-                    "total_results": len(processed_results),
-                    "next_page_token": search_data.get('nextPageToken'),
-                    "prev_page_token": search_data.get('prevPageToken')
-                }
-            
-            cache.set(search_cache_key, final_result_data, timeout=SEARCH_CACHE_TIMEOUT)
-            return final_result_data
+            result, result_cache_timeout = build_search_payload(
+                query, search_data, video_ids, *enrichment, min_duration=min_duration, max_duration=max_duration
+            )
+            set_with_soft_expiry(search_cache_key, result, result_cache_timeout, SEARCH_CACHE_HARD_TIMEOUT)
+            return result
         else:
             logger.error(f"YouTube API Error: Status {response.status_code}")
             logger.error(f"Response: {response.text}")
@@ -245,8 +371,114 @@ def fetch_videos_by_keyword(query, max_results=25, educational_focus=True, conte
         return {"error": "An unexpected error occurred", "details": str(e)}
 
 
-def get_video_details(video_ids):
-    """Get additional details about videos. Items are cached individually. Returns a map."""
+def extract_search_ids(search_data):
+    """Return the video IDs and source channel IDs of a search.list response."""
+    video_ids = []
+    source_channel_ids = []
+    for item in search_data.get('items', []):
+        try:
+            if 'id' in item and 'videoId' in item['id']:
+                video_ids.append(item['id']['videoId'])
+                if 'channelId' in item['snippet']:
+                     source_channel_ids.append(item['snippet']['channelId'])
+        except (KeyError, TypeError) as e:
+            logger.error(f"Error extracting video ID or source channel ID: {e}")
+    return video_ids, source_channel_ids
+
+
+def build_search_payload(query, search_data, video_ids, detailed_videos_map, channel_profile_pics_map,
+                         incomplete_enrichment, min_duration=None, max_duration=None):
+    """
+    Rank an enriched search.list response into the search payload.
+
+    Returns:
+        tuple: (payload, soft cache timeout for it)
+    """
+    item_count = len(search_data.get('items', []))
+    logger.info(f"YouTube API returned {item_count} items")
+
+    if item_count == 0:
+        return {
+            "results": [],
+            "message": "No videos found for your search",
+            "next_page_token": search_data.get('nextPageToken'),
+            "prev_page_token": search_data.get('prevPageToken')
+        }, SEARCH_CACHE_TIMEOUT
+
+    if not video_ids:
+        return {
+            "results": [],
+            "message": "No valid videos found",
+            "debug_info": {
+                "response_structure": str(search_data.keys()),
+                "item_count": item_count
+            },
+            "next_page_token": search_data.get('nextPageToken'),
+            "prev_page_token": search_data.get('prevPageToken')
+        }, SEARCH_CACHE_TIMEOUT
+
+    processed_results = process_search_results(
+        search_data, detailed_videos_map, channel_profile_pics_map, 
+        query, min_duration, max_duration
+    )
+
+    final_result_data = {} # Define before conditional assignment
+    if not processed_results and item_count > 0:
+        logger.info("All videos were filtered out, using basic results")
+        basic_results = []
+        for item_basic in search_data.get('items', []): # Renamed item to item_basic
+            try:
+                video_id_basic = item_basic['id']['videoId'] # Renamed
+                snippet_basic = item_basic['snippet'] # Renamed
+                basic_results.append({
+                    'id': video_id_basic,
+                    'title': snippet_basic.get('title', ''),
+                    'description': snippet_basic.get('description', ''),
+                    'thumbnail': snippet_basic.get('thumbnails', {}).get('high', {}).get('url', ''),
+                    'channelTitle': snippet_basic.get('channelTitle', ''),
+                    'publishedAt': snippet_basic.get('publishedAt', ''),
+                    # Add channelProfileImageUrl if available, even for basic
+                    'channelProfileImageUrl': channel_profile_pics_map.get(snippet_basic.get('channelId')),
+                })
+            except (KeyError, TypeError) as e:
+                logger.error(f"Error extracting basic video data: {e}")
+
+
+        final_result_data = {
+            "results": basic_results,
+            "query": query,
+            "total_results": len(basic_results),
+            "note": "Using unfiltered results due to filter removing all items",
+            "next_page_token": search_data.get('nextPageToken'),
+            "prev_page_token": search_data.get('prevPageToken')
+        }
+    else:
+        final_result_data = {
+            "results": processed_results,
+            "query": query,
+            "total_results": len(processed_results),
+            "next_page_token": search_data.get('nextPageToken'),
+            "prev_page_token": search_data.get('prevPageToken')
+        }
+
+    result_cache_timeout = SEARCH_CACHE_TIMEOUT
+    if incomplete_enrichment:
+        # Serve what we have (deadline missed or quota shedding), but
+        # don't pin a degraded result for the full TTL.
+        final_result_data["partial_enrichment"] = incomplete_enrichment
+        result_cache_timeout = PARTIAL_SEARCH_CACHE_TIMEOUT
+    return final_result_data, result_cache_timeout
+
+
+def get_video_details(video_ids, allow_fetch=True):
+    """
+    Get additional details about videos. Items are cached individually, read with
+    one `get_many` and written with one `set_many` per API chunk. Cache misses
+    are looked up in the video catalog before calling the API (see
+    `api.catalog`). With `allow_fetch=False` only cached and catalog entries,
+    stale ones included, are returned.
+    Returns a map of video ID to `VideoRecord` (see `api.video_records`).
+    """
     if not video_ids:
         return {}
 
@@ -254,259 +486,82 @@ def get_video_details(video_ids):
     video_details_map = {}
     ids_to_fetch = []
 
-    for video_id in unique_video_ids:
-        cache_key = generate_cache_key("video_detail", video_id)
-        cached_video_data = cache.get(cache_key)
-        if cached_video_data:
-            video_details_map[video_id] = cached_video_data
-            logger.info(f"Cache hit for video_detail: {video_id}")
+    cache_keys = {generate_cache_key("video_detail", video_id): video_id for video_id in unique_video_ids}
+    cached_videos = detail_cache.get_many(cache_keys.keys())
+    for cache_key, video_id in cache_keys.items():
+        # Entries in an older format decode to None and are simply refetched.
+        cached_video_record = decode_video_record(cached_videos.get(cache_key))
+        if cached_video_record:
+            video_details_map[video_id] = cached_video_record
         else:
             ids_to_fetch.append(video_id)
+    if video_details_map:
+        logger.info(f"Cache hit for video_detail: {list(video_details_map)}")
 
     if ids_to_fetch:
+        ids_to_fetch = _read_catalog(ids_to_fetch, video_details_map, include_stale=not allow_fetch)
+
+    if ids_to_fetch and allow_fetch:
         logger.info(f"Cache miss for video_details: {ids_to_fetch}. Fetching from API.")
-        chunk_size = 50
-        for i in range(0, len(ids_to_fetch), chunk_size):
-            chunk = ids_to_fetch[i:i + chunk_size]
-            params = {
-                'part': 'snippet,contentDetails,statistics',
-                'id': ','.join(chunk),
-                'key': API_KEY
-            }
-            try:
-                response = requests.get(VIDEO_URL, params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    for item in data.get('items', []):
-                        fetched_video_id = item['id']
-                        video_details_map[fetched_video_id] = item
-                        # Cache individually
-                        individual_cache_key = generate_cache_key("video_detail", fetched_video_id)
-                        cache.set(individual_cache_key, item, timeout=VIDEO_DETAILS_CACHE_TIMEOUT)
-                        logger.info(f"Cached video_detail: {fetched_video_id}")
-                else:
-                    logger.error(f"Error fetching video details: {response.status_code} for IDs {','.join(chunk)}")
-            except Exception as e:
-                logger.error(f"Exception fetching video details for IDs {','.join(chunk)}: {str(e)}")
+        for fetched_map in _map_chunks(_fetch_video_chunk, ids_to_fetch):
+            video_details_map.update(fetched_map)
     return video_details_map
 
 
+def _read_catalog(video_ids, video_details_map, include_stale=False):
+    """
+    Add catalog records for `video_ids` to `video_details_map`, writing them
+    back to the detail cache. Returns the IDs still missing.
+    """
+    catalog_records = catalog.get_records(video_ids, include_stale=include_stale)
+    if catalog_records:
+        logger.info(f"Catalog hit for video_detail: {list(catalog_records)}")
+        detail_cache.set_many(
+            {generate_cache_key("video_detail", vid): encode_video_record(record)
+             for vid, record in catalog_records.items()},
+            timeout=VIDEO_DETAILS_CACHE_TIMEOUT
+        )
+        video_details_map.update(catalog_records)
+    return [video_id for video_id in video_ids if video_id not in catalog_records]
+
+
+def refresh_video_details(video_ids):
+    """Refetch `video_ids` from the API, updating the detail cache and catalog. Returns the number fetched."""
+    video_ids = list(video_ids)
+    if not video_ids:
+        return 0
+    fetch_chunk = functools.partial(_fetch_video_chunk, save=catalog.save_api_items)
+    return sum(len(fetched_map) for fetched_map in _map_chunks(fetch_chunk, video_ids))
+
+
 def process_search_results(search_data, detailed_videos_map, channel_profile_pics_map, 
                            original_query, min_duration=None, max_duration=None):
     """
     Process and rank search results with enhanced relevance scoring.
 
-    NOTE: Thresholds and penalties/bonuses below may need tuning.
+    Scoring is done for the whole batch at once by `api.scoring`, where the
+    bonuses and thresholds live; the keyword sets are in `api.keywords`.
+
+    NOTE: Thresholds and penalties/bonuses may need tuning.
     - If too few results are returned, consider lowering MIN_BASE_RELEVANCE_TO_CONSIDER or penalties.
     - If too many irrelevant results, consider increasing penalties or requiring stricter keyword matches.
     - Watch for edge cases where educational channels/keywords are present but the query is not relevant.
     - Consider logging or returning debug info if all results are filtered out.
     """
-    processed_results = []
-    edu_keywords = {
-        'tutorial', 'learn', 'lesson', 'course', 'education', 'training',
-        'guide', 'explanation', 'explained', 'introduction', 'basics',
-        'how to', 'beginner', 'instructor', 'teaching', 'class', 'lecture',
-        'masterclass', 'workshop', 'insights', 'analysis', 'cbse', 'jee',
-        'a-level', 'exam', 'chapter', 'syllabus', 'problem', 'solution',
-        'practice', 'demonstration', 'experiment', 'lab', 'teacher', 'professor',
-        'university', 'school', 'study', 'revision', 'concept', 'topic',
-        'exercises', 'questions', 'answers'
-    }
-    edu_channel_keywords = {
-        'academy', 'school', 'university', 'education', 'tutorial', 'teacher',
-        'professor', 'cbse', 'jee', 'neet', 'class', 'study', 'learn', 'science',
-        'physics', 'chemistry', 'math', 'biology'
-    }
-    # Keywords/patterns that might indicate lower quality or clickbait for educational content
-    spammy_title_keywords = {
-        'must watch!!!', 'shocking', 'secret revealed', 'ultimate guide', 'easy way',
-        'guaranteed', 'free money', 'hack your', 'top 10 secrets' # Be cautious with these
-    }
-    query_terms = set(original_query.lower().split())
-    is_single_word_query = len(query_terms) == 1
-
-    if not search_data.get('items'):
-        logger.info("No items in search_data to process")
-        return processed_results
-
-    logger.info(f"Processing {len(search_data.get('items', []))} search results")
-
-    for item in search_data.get('items', []):
-        try:
-            video_id = item['id']['videoId']
-            snippet = item['snippet']
-            title = snippet.get('title', '')
-            description = snippet.get('description', '')
-            channel_title = snippet.get('channelTitle', '')
-            source_channel_id = snippet.get('channelId', '')
-
-            title_lower = title.lower()
-            description_lower = description.lower()
-            channel_title_lower = channel_title.lower()
-            content_text = title_lower + " " + description_lower
-
-            # Calculate query_match_count before using it
-            query_terms = set(original_query.lower().split())
-            title_words = set(title_lower.split())
-            description_words = set(description_lower.split())
-            query_match_count = len(query_terms.intersection(title_words | description_words))
-
-            # Require at least one educational keyword AND at least one query term in title/description
-            has_edu_keyword = any(kw in content_text for kw in edu_keywords)
-            has_edu_channel = any(kw in channel_title_lower for kw in edu_channel_keywords)
-            if not (has_edu_keyword or has_edu_channel) or query_match_count == 0:
-                logger.info(f"Skipping '{title}' as it lacks educational signals or query relevance.")
-                continue
-
-            # Penalize or skip if not educational
-            if not has_edu_keyword and not has_edu_channel:
-                logger.info(f"Skipping '{title}' as it lacks educational signals.")
-                continue
-
-            # Penalize shorts and viral-only content
-            duration_seconds = 0
-            if 'shorts' in title_lower or 'shorts' in description_lower:
-                relevance_score = -5
-            else:
-                relevance_score = 0.0
-
-            # Penalize spammy/clickbait titles
-            for spam_keyword in spammy_title_keywords:
-                if spam_keyword in title_lower:
-                    relevance_score -= 2.0
-                    logger.info(f"Penalizing title for spammy keyword '{spam_keyword}': {title}")
-                    break # Apply penalty once per video for title
-
-            # Boost score for educational keywords
-            for keyword in edu_keywords:
-                if keyword in content_text:
-                    relevance_score += 2.0 # Increased base score from edu keywords
-
-            # Calculate query_match_count before using it
-            query_terms = set(original_query.lower().split())
-            title_words = set(title_lower.split())
-            description_words = set(description_lower.split())
-            query_match_count = len(query_terms.intersection(title_words | description_words))
-
-            # Boost score for query term matches
-            relevance_score += query_match_count * 2.5 # Keep query match strong
-
-            likes = 0
-            comment_count = 0
-            view_count = 0
-            duration = "Unknown"
-            duration_seconds = 0
-            # Get profile pic from the map passed into this function
-            channel_profile_image_url = channel_profile_pics_map.get(source_channel_id) 
-
-            # Get detailed video statistics from the map passed into this function
-            video_specific_details = detailed_videos_map.get(video_id) 
-            if video_specific_details:
-                if 'statistics' in video_specific_details:
-                    stats = video_specific_details['statistics']
-                    likes = int(stats.get('likeCount', 0))
-                    comment_count = int(stats.get('commentCount', 0))
-                    view_count = int(stats.get('viewCount', 0))
-
-                    # Adjust engagement scoring
-                    if view_count > 10000:  # Good view count
-                        relevance_score += math.log10(view_count) * 1.0 
-                    elif view_count > 500: # Moderate view count
-                        relevance_score += math.log10(view_count) * 0.6
-                    elif view_count < 200 and view_count > 0: # Penalty for very low views
-                        relevance_score -= 0.25 # Softened penalty
-
-                    if likes > 2000:  # Good like count
-                        relevance_score += math.log10(likes) * 0.8
-                    elif likes > 100: # Moderate like count
-                        relevance_score += math.log10(likes) * 0.4
-                    elif likes < 50 and likes > 0: # Penalty for very low likes
-                        relevance_score -= 0.15 # Softened penalty
-                    
-                    if view_count > 50000 and likes > 5000: # "Notable" boost
-                        relevance_score += 1.5
-                    elif view_count > 20000 and likes > 2000:
-                        relevance_score += 0.75
-
-
-                    if comment_count > 500: 
-                        relevance_score += math.log10(comment_count) * 0.4
-                    elif comment_count > 20:
-                        relevance_score += math.log10(comment_count) * 0.2
-                
-                if 'contentDetails' in video_specific_details:
-                    duration_str = video_specific_details['contentDetails'].get('duration', '')
-                    duration_match = re.match(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', duration_str)
-                    if duration_match:
-                        hours = int(duration_match.group(1) or 0)
-                        minutes = int(duration_match.group(2) or 0)
-                        seconds = int(duration_match.group(3) or 0)
-                        duration_seconds = hours * 3600 + minutes * 60 + seconds
-                        duration = f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
-                        
-                        if min_duration and duration_seconds < min_duration:
-                            logger.info(f"Video '{title}' too short ({duration_seconds}s), skipping.")
-                            continue
-                        if max_duration and duration_seconds > max_duration:
-                            logger.info(f"Video '{title}' too long ({duration_seconds}s), skipping.")
-                            continue
-            
-            # Adjusted MIN_RELEVANCE_THRESHOLD logic - make it more lenient
-            MIN_BASE_RELEVANCE_TO_CONSIDER = -1.0 # Allow videos with slightly negative scores if engagement helps
-            MODERATE_ENGAGEMENT_VIEWS = 1000 
-            MODERATE_ENGAGEMENT_LIKES = 100  
-
-            # Extreme engagement can still bypass, but the main path is more lenient
-            EXTREME_ENGAGEMENT_VIEWS = 200000 
-            EXTREME_ENGAGEMENT_LIKES = 20000   
-
-            is_extremely_engaging = view_count > EXTREME_ENGAGEMENT_VIEWS and likes > EXTREME_ENGAGEMENT_LIKES
-            has_moderate_engagement = view_count > MODERATE_ENGAGEMENT_VIEWS and likes > MODERATE_ENGAGEMENT_LIKES
-
-            # If not extremely engaging, and score is too low, then check if it has at least some moderate engagement
-            if not is_extremely_engaging and relevance_score < MIN_BASE_RELEVANCE_TO_CONSIDER:
-                if not has_moderate_engagement: # If score is very low AND it lacks even moderate engagement, skip
-                    logger.info(f"Video '{title}' (score: {relevance_score}, views: {view_count}, likes: {likes}) below threshold and lacks moderate engagement, skipping.")
-                    continue
-                # If score is low but has moderate engagement, it might still pass (relying on final sort)
-                logger.info(f"Video '{title}' (score: {relevance_score}) is low but has moderate engagement (views: {view_count}, likes: {likes}), considering.")
-
-
-            processed_results.append({
-                'id': video_id,
-                'title': title,
-                'description': description,
-                'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
-                'channelTitle': channel_title,
-                'channelProfileImageUrl': channel_profile_image_url,
-                'publishedAt': snippet.get('publishedAt', ''),
-                'relevance_score': round(relevance_score, 2),
-                'likes': likes,
-                'comment_count': comment_count,
-                'view_count': view_count,
-                'duration': duration,
-                'duration_seconds': duration_seconds
-            })
-        except (KeyError, TypeError) as e:
-            logger.error(f"Error processing search result item: {e}")
-            logger.error(traceback.format_exc())
-
-    logger.info(f"After filtering, {len(processed_results)} videos remain")
-    processed_results.sort(key=lambda x: x['relevance_score'], reverse=True)
-    return processed_results
+    return rank_search_results(search_data, detailed_videos_map, channel_profile_pics_map,
+                               original_query, min_duration, max_duration)
 
 
 def invalidate_cache(video_id=None, channel_id=None):
-    """Invalidate cache for specific video or channel ID."""
+    """Invalidate cache for specific video or channel ID, in both detail cache tiers."""
     if video_id:
         video_cache_key = generate_cache_key("video_detail", video_id)
-        cache.delete(video_cache_key)
+        detail_cache.delete(video_cache_key)
         logger.info(f"Invalidated cache for video_detail: {video_id}")
 
     if channel_id:
         channel_cache_key = generate_cache_key("channel_detail", channel_id)
-        cache.delete(channel_cache_key)
+        detail_cache.delete(channel_cache_key)
         logger.info(f"Invalidated cache for channel_detail: {channel_id}")
 
     # Note: Invalidating search results that might contain this video/channel
@@ -0,0 +1,259 @@
+"""
+Async variants of the search functions in `api.youtube`, for the async search view.
+
+The request flow, cache keys and payloads are the same as the sync path; only
+the I/O differs: YouTube is called through `AsyncYouTubeClient` (httpx) and
+the cache through Django's async cache API, so the calls of one search are
+awaited on the event loop instead of occupying enrichment pool threads.
+Whether the request itself holds a thread depends on the middleware stack
+(see `AsyncYouTubeSearchView`). Parameter building and ranking are shared with
+`api.youtube`, and cache entries written by one path are served by the other.
+"""
+import asyncio
+import logging
+import traceback
+
+from asgiref.sync import sync_to_async
+
+from . import catalog, quota
+from .caching import (
+    asingle_flight, aset_with_soft_expiry, aget_with_soft_expiry, aget_value_with_soft_expiry,
+    refresh_in_background
+)
+from .video_records import record_from_api_item, encode_video_record, decode_video_record
+from .youtube import (
+    API_KEY, CHANNEL_DETAILS_CACHE_TIMEOUT, VIDEO_DETAILS_CACHE_TIMEOUT, SEARCH_CACHE_HARD_TIMEOUT,
+    ENRICHMENT_DEADLINE, ID_CHUNK_SIZE, SEARCH_LOCK_TIMEOUT, SEARCH_WAIT_TIMEOUT, detail_cache, generate_cache_key, build_search_request,
+    extract_search_ids, build_search_payload, prefetch_next_page, _search_youtube, _with_cache_age,
+    _read_catalog
+)
+from .youtube_client import async_youtube_client
+
+logger = logging.getLogger(__name__)
+
+# Enrichment tasks that outlived their deadline. They keep running to warm the
+# detail cache; holding a reference stops them being garbage collected.
+_background_tasks = set()
+
+
+async def aget_channel_details_map(channel_ids, allow_fetch=True):
+    """Async variant of `api.youtube.get_channel_details_map`."""
+    if not channel_ids:
+        return {}
+
+    unique_channel_ids = sorted(set(channel_ids))
+    channel_details_map = {}
+    ids_to_fetch = []
+
+    cache_keys = {generate_cache_key("channel_detail", channel_id): channel_id for channel_id in unique_channel_ids}
+    cached_channels = await detail_cache.aget_many(cache_keys.keys())
+    for cache_key, channel_id in cache_keys.items():
+        cached_channel_data = cached_channels.get(cache_key)
+        if cached_channel_data:
+            channel_details_map[channel_id] = cached_channel_data
+        else:
+            ids_to_fetch.append(channel_id)
+
+    if ids_to_fetch and allow_fetch:
+        logger.info(f"Cache miss for channel_details: {ids_to_fetch}. Fetching from API.")
+        for fetched_map in await _amap_chunks(_afetch_channel_chunk, ids_to_fetch):
+            channel_details_map.update(fetched_map)
+    return channel_details_map
+
+
+async def aget_video_details(video_ids, allow_fetch=True):
+    """Async variant of `api.youtube.get_video_details`."""
+    if not video_ids:
+        return {}
+
+    unique_video_ids = sorted(set(video_ids))
+    video_details_map = {}
+    ids_to_fetch = []
+
+    cache_keys = {generate_cache_key("video_detail", video_id): video_id for video_id in unique_video_ids}
+    cached_videos = await detail_cache.aget_many(cache_keys.keys())
+    for cache_key, video_id in cache_keys.items():
+        cached_video_record = decode_video_record(cached_videos.get(cache_key))
+        if cached_video_record:
+            video_details_map[video_id] = cached_video_record
+        else:
+            ids_to_fetch.append(video_id)
+
+    if ids_to_fetch:
+        ids_to_fetch = await sync_to_async(_read_catalog)(
+            ids_to_fetch, video_details_map, include_stale=not allow_fetch
+        )
+
+    if ids_to_fetch and allow_fetch:
+        logger.info(f"Cache miss for video_details: {ids_to_fetch}. Fetching from API.")
+        for fetched_map in await _amap_chunks(_afetch_video_chunk, ids_to_fetch):
+            video_details_map.update(fetched_map)
+    return video_details_map
+
+
+async def _amap_chunks(fetch_chunk, ids, chunk_size=ID_CHUNK_SIZE):
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    return await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+
+
+async def _afetch_channel_chunk(chunk):
+    fetched = {}
+    params = {
+        'part': 'snippet',
+        'id': ','.join(chunk),
+        'key': API_KEY
+    }
+    try:
+        response = await async_youtube_client.get('channels', params)
+        if response.status_code == 200:
+            for item in response.json().get('items', []):
+                thumbnails = item.get('snippet', {}).get('thumbnails', {})
+                profile_pic_url = thumbnails.get('medium', {}).get('url') or \
+                                  thumbnails.get('default', {}).get('url')
+                if profile_pic_url:
+                    fetched[item['id']] = profile_pic_url
+            await detail_cache.aset_many(
+                {generate_cache_key("channel_detail", cid): url for cid, url in fetched.items()},
+                timeout=CHANNEL_DETAILS_CACHE_TIMEOUT
+            )
+        else:
+            logger.error(f"Error fetching channel details: {response.status_code} for IDs {','.join(chunk)}")
+    except Exception as e:
+        logger.error(f"Exception fetching channel details for IDs {','.join(chunk)}: {str(e)}")
+    return fetched
+
+
+async def _afetch_video_chunk(chunk):
+    fetched = {}
+    params = {
+        'part': 'snippet,contentDetails,statistics',
+        'id': ','.join(chunk),
+        'key': API_KEY
+    }
+    try:
+        response = await async_youtube_client.get('videos', params)
+        if response.status_code == 200:
+            items = response.json().get('items', [])
+            for item in items:
+                fetched[item['id']] = record_from_api_item(item)
+            await detail_cache.aset_many(
+                {generate_cache_key("video_detail", vid): encode_video_record(record)
+                 for vid, record in fetched.items()},
+                timeout=VIDEO_DETAILS_CACHE_TIMEOUT
+            )
+            catalog.save_api_items_later(items, requested_ids=chunk)
+        else:
+            logger.error(f"Error fetching video details: {response.status_code} for IDs {','.join(chunk)}")
+    except Exception as e:
+        logger.error(f"Exception fetching video details for IDs {','.join(chunk)}: {str(e)}")
+    return fetched
+
+
+async def afetch_enrichment(video_ids, channel_ids, deadline=ENRICHMENT_DEADLINE, degradation=quota.FULL_SERVICE):
+    """
+    Async variant of `api.youtube.fetch_enrichment`: both lookups run as tasks
+    under one total `deadline`. Same return value.
+    """
+    fetch_videos = degradation < quota.SKIP_STATISTICS
+    fetch_channels = degradation < quota.SKIP_CHANNELS
+    tasks = {
+        'video_details': asyncio.ensure_future(aget_video_details(video_ids, fetch_videos)),
+        'channel_details': asyncio.ensure_future(aget_channel_details_map(channel_ids, fetch_channels)),
+    }
+    done, _ = await asyncio.wait(tasks.values(), timeout=deadline)
+
+    maps = {}
+    incomplete = []
+    if not fetch_videos:
+        incomplete.append('video_details')
+    if not fetch_channels:
+        incomplete.append('channel_details')
+    for branch, task in tasks.items():
+        if task in done and task.exception() is None:
+            maps[branch] = task.result()
+        else:
+            if task in done:
+                logger.error(f"Enrichment branch '{branch}' failed: {task.exception()}")
+            else:
+                logger.warning(f"Enrichment branch '{branch}' missed the {deadline}s deadline")
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            if branch not in incomplete:
+                incomplete.append(branch)
+            maps[branch] = {}
+    return maps['video_details'], maps['channel_details'], incomplete
+
+
+async def afetch_videos_by_keyword(query, max_results=25, educational_focus=True, content_filter='moderate',
+                                   min_duration=None, max_duration=None, sort_by='viewCount', page_token=None):
+    """Async variant of `api.youtube.fetch_videos_by_keyword`; same arguments and payload."""
+    effective_query, api_params_for_call, search_cache_key = build_search_request(
+        query, max_results, educational_focus, content_filter, sort_by, page_token
+    )
+
+    async def compute():
+        return await _asearch_youtube(query, effective_query, api_params_for_call, search_cache_key,
+                                      min_duration, max_duration)
+
+    cached = await aget_with_soft_expiry(search_cache_key)
+    if cached is not None:
+        cached_result, age, is_stale = cached
+        logger.info(f"Cache hit for search query '{query}' (effective: '{effective_query}'), key {search_cache_key}")
+        if is_stale and await quota.adegradation_level() < quota.CACHE_ONLY:
+            # The refresh runs on the sync path's background pool.
+            await sync_to_async(refresh_in_background, thread_sensitive=False)(
+                search_cache_key,
+                lambda: _search_youtube(query, effective_query, api_params_for_call, search_cache_key,
+                                        min_duration, max_duration),
+                lock_timeout=SEARCH_LOCK_TIMEOUT,
+            )
+        result = _with_cache_age(cached_result, age, is_stale)
+    elif await quota.adegradation_level() >= quota.CACHE_ONLY:
+        logger.warning(f"YouTube quota nearly exhausted, not searching for '{effective_query}'")
+        return {"error": "Search is temporarily limited to cached results", "status": 503,
+                "retry_after": quota.seconds_until_reset()}
+    else:
+        result = _with_cache_age(
+            await asingle_flight(search_cache_key, compute, lock_timeout=SEARCH_LOCK_TIMEOUT,
+                                 wait_timeout=SEARCH_WAIT_TIMEOUT, read=aget_value_with_soft_expiry), 0, False
+        )
+
+    # Prefetches run on the sync path's background pool as well.
+    await sync_to_async(prefetch_next_page, thread_sensitive=False)(
+        query, result, max_results, educational_focus, content_filter,
+        min_duration, max_duration, sort_by, page_token
+    )
+    return result
+
+
+async def _asearch_youtube(query, effective_query, api_params_for_call, search_cache_key,
+                           min_duration=None, max_duration=None):
+    """Async variant of `api.youtube._search_youtube`."""
+    logger.info(f"Searching YouTube (async) for: '{effective_query}'")
+    try:
+        response = await async_youtube_client.get('search', api_params_for_call)
+        logger.info(f"Status Code: {response.status_code}")
+
+        if response.status_code == 200:
+            search_data = response.json()
+            video_ids, source_channel_ids = extract_search_ids(search_data)
+            enrichment = ({}, {}, [])
+            if video_ids:
+                enrichment = await afetch_enrichment(
+                    video_ids, source_channel_ids, degradation=await quota.adegradation_level()
+                )
+
+            result, result_cache_timeout = build_search_payload(
+                query, search_data, video_ids, *enrichment, min_duration=min_duration, max_duration=max_duration
+            )
+            await aset_with_soft_expiry(search_cache_key, result, result_cache_timeout, SEARCH_CACHE_HARD_TIMEOUT)
+            return result
+        else:
+            logger.error(f"YouTube API Error: Status {response.status_code}")
+            logger.error(f"Response: {response.text}")
+            return {"error": "Failed to fetch videos from YouTube", "status": response.status_code}
+
+    except Exception as e:
+        logger.error(f"Exception in afetch_videos_by_keyword: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {"error": "An unexpected error occurred", "details": str(e)}
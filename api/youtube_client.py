@@ -0,0 +1,224 @@
+import asyncio
+import contextlib
+import logging
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+
+from . import quota
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://www.googleapis.com/youtube/v3/"
+
+# (connect, read) timeouts in seconds. search.list is the slowest endpoint on
+# Google's side, the id lookups are cheap and should fail fast.
+ENDPOINT_TIMEOUTS = {
+    'search': (3.05, 10),
+    'videos': (3.05, 6),
+    'channels': (3.05, 6),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Retry policy: only transient upstream failures are retried, with full-jitter
+# exponential backoff so that workers don't hammer Google in lockstep.
+MAX_RETRIES = config('YOUTUBE_MAX_RETRIES', default=2, cast=int)
+BACKOFF_BASE = 0.25  # seconds
+BACKOFF_CAP = 2.0  # seconds
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Keep-alive connections held per process. Sized to cover concurrent
+# enrichment lookups without opening a new TLS session each time.
+POOL_MAXSIZE = config('YOUTUBE_POOL_MAXSIZE', default=20, cast=int)
+# The async client multiplexes every in-flight search of the process.
+ASYNC_POOL_MAXSIZE = config('YOUTUBE_ASYNC_POOL_MAXSIZE', default=100, cast=int)
+
+
+class _LatencyStatsMixin:
+    """Per-endpoint call/latency counters and the retry backoff policy shared by both clients."""
+
+    def _init_stats(self):
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def stats(self):
+        """Return a snapshot of per-endpoint call/latency counters."""
+        with self._stats_lock:
+            snapshot = {}
+            for endpoint, counters in self._stats.items():
+                calls = counters['calls']
+                snapshot[endpoint] = {
+                    **counters,
+                    'avg_ms': round(counters['total_ms'] / calls, 2) if calls else 0.0,
+                }
+            return snapshot
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    @staticmethod
+    def _backoff(attempt):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return min(float(response.headers.get('Retry-After')), BACKOFF_CAP)
+        except (TypeError, ValueError):
+            return None
+
+    def worst_case_seconds(self, endpoint):
+        """Longest `get()` can take for `endpoint`: every attempt timing out, plus the capped backoffs."""
+        connect_timeout, read_timeout = self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+        return (self.max_retries + 1) * (connect_timeout + read_timeout) + self.max_retries * BACKOFF_CAP
+
+    def _counters(self, endpoint):
+        return self._stats.setdefault(endpoint, {
+            'calls': 0, 'failures': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+        })
+
+    def _record(self, endpoint, elapsed, failed=False):
+        elapsed_ms = elapsed * 1000
+        with self._stats_lock:
+            counters = self._counters(endpoint)
+            counters['calls'] += 1
+            counters['total_ms'] += elapsed_ms
+            counters['max_ms'] = max(counters['max_ms'], elapsed_ms)
+            if failed:
+                counters['failures'] += 1
+
+    def _record_retry(self, endpoint):
+        with self._stats_lock:
+            self._counters(endpoint)['retries'] += 1
+
+
+class YouTubeClient(_LatencyStatsMixin):
+    """
+    Reusable HTTP client for the YouTube Data API v3.
+
+    Wraps a single pooled keep-alive `requests.Session` and adds per-endpoint
+    connect/read timeouts, bounded jittered retries on 5xx/429 and latency
+    counters. Every attempt is charged to the daily quota ledger, since Google
+    bills failed calls too. `get()` returns the final `requests.Response`;
+    connection errors and timeouts are re-raised once the retries are exhausted.
+    """
+
+    def __init__(self, base_url=BASE_URL, timeouts=None, max_retries=MAX_RETRIES,
+                 pool_maxsize=POOL_MAXSIZE):
+        self.base_url = base_url
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._init_stats()
+
+    def get(self, endpoint, params):
+        """Perform a GET against `endpoint` (e.g. 'search', 'videos', 'channels')."""
+        url = f"{self.base_url}{endpoint}"
+        timeout = self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+        attempt = 0
+        while True:
+            quota.charge(endpoint)
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, time.monotonic() - started, failed=True)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"YouTube {endpoint} request failed ({e.__class__.__name__}), retrying")
+                delay = self._backoff(attempt)
+            else:
+                failed = response.status_code >= 500 or response.status_code == 429
+                self._record(endpoint, time.monotonic() - started, failed=failed)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                logger.warning(f"YouTube {endpoint} returned {response.status_code}, retrying")
+                delay = self._retry_after(response) or self._backoff(attempt)
+
+            attempt += 1
+            self._record_retry(endpoint)
+            time.sleep(delay)
+
+
+class AsyncYouTubeClient(_LatencyStatsMixin):
+    """
+    Non-blocking counterpart of `YouTubeClient` for async views, built on
+    `httpx.AsyncClient`. Same timeouts, retry policy, quota charging and
+    counters; `get()` is a coroutine returning an `httpx.Response`.
+
+    httpx connection pools are bound to the event loop that opened them, so
+    one `httpx.AsyncClient` is kept per running loop (normally exactly one
+    under an ASGI server). Loops that only live for one request, as async
+    views get under WSGI, must run inside `loop_scope()` so that their client
+    is closed with them.
+    """
+
+    def __init__(self, base_url=BASE_URL, timeouts=None, max_retries=MAX_RETRIES,
+                 pool_maxsize=ASYNC_POOL_MAXSIZE):
+        self.base_url = base_url
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+        self._init_stats()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits)
+            self._clients[loop] = client
+        return client
+
+    @contextlib.asynccontextmanager
+    async def loop_scope(self):
+        """Close the running loop's client (and its connections) on exit."""
+        try:
+            yield self
+        finally:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+            if client is not None:
+                await client.aclose()
+
+    async def get(self, endpoint, params):
+        """Perform a GET against `endpoint` (e.g. 'search', 'videos', 'channels')."""
+        connect_timeout, read_timeout = self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        attempt = 0
+        while True:
+            await quota.acharge(endpoint)
+            started = time.monotonic()
+            try:
+                response = await self._client().get(endpoint, params=params, timeout=timeout)
+            except httpx.TransportError as e:  # connect/read errors and timeouts
+                self._record(endpoint, time.monotonic() - started, failed=True)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"YouTube {endpoint} request failed ({e.__class__.__name__}), retrying")
+                delay = self._backoff(attempt)
+            else:
+                failed = response.status_code >= 500 or response.status_code == 429
+                self._record(endpoint, time.monotonic() - started, failed=failed)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                logger.warning(f"YouTube {endpoint} returned {response.status_code}, retrying")
+                delay = self._retry_after(response) or self._backoff(attempt)
+
+            attempt += 1
+            self._record_retry(endpoint)
+            await asyncio.sleep(delay)
+
+
+# Shared per-process clients so that connections are reused across requests.
+youtube_client = YouTubeClient()
+async_youtube_client = AsyncYouTubeClient()
@@ -194,6 +194,10 @@ CACHES = {
 CACHE_TIMEOUT = 3600  # 1 hour for search results
 VIDEO_DETAILS_CACHE_TIMEOUT = 86400  # 24 hours for video details
 
+# Search relevance keyword sets ('educational', 'educational_channel',
+# 'spammy_title'). A set listed here replaces the default from api/keywords.py.
+SEARCH_KEYWORD_SETS = {}
+
 # Password validation settings.
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
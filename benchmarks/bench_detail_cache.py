@@ -0,0 +1,154 @@
+"""
+Benchmark: cache round trips per search for video/channel detail lookups.
+
+Compares the previous per-key `cache.get`/`cache.set` access pattern with the
+batched `get_many`/`set_many` path in `api.youtube`, for a cold cache, a warm
+shared cache, and a warm per-process tier ('local'). Every shared-cache operation is counted as one round trip and charged a
+simulated network latency (default 0.5 ms, roughly a same-region Redis RTT).
+
+Usage:
+    python benchmarks/bench_detail_cache.py [--results 25] [--rtt-ms 0.5]
+"""
+import argparse
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from api import caching, catalog, youtube
+from api.video_records import encode_video_record, record_from_api_item
+
+
+class RoundTripCountingCache:
+    """Proxy around a LocMemCache that counts and delays each operation."""
+
+    def __init__(self, rtt_seconds):
+        self.backend = LocMemCache('bench-detail-cache', {})
+        self.rtt_seconds = rtt_seconds
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.rtt_seconds:
+            time.sleep(self.rtt_seconds)
+
+    def get(self, *args, **kwargs):
+        self._round_trip()
+        return self.backend.get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        self._round_trip()
+        return self.backend.set(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        self._round_trip()
+        return self.backend.get_many(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        self._round_trip()
+        return self.backend.set_many(*args, **kwargs)
+
+    def clear(self):
+        self.backend.clear()
+        youtube.detail_cache.clear_local()
+        self.round_trips = 0
+
+
+def legacy_lookup(cache, prefix, ids, fetch):
+    """The pre-batching access pattern: one get per id, one set per fetched item."""
+    found, missing = {}, []
+    for item_id in sorted(set(ids)):
+        cached = cache.get(youtube.generate_cache_key(prefix, item_id))
+        if cached:
+            found[item_id] = cached
+        else:
+            missing.append(item_id)
+    for item_id, value in fetch(missing).items():
+        found[item_id] = value
+        cache.set(youtube.generate_cache_key(prefix, item_id), value, timeout=60)
+    return found
+
+
+def fake_videos(ids):
+    return {video_id: {'id': video_id, 'statistics': {'viewCount': '1000'}} for video_id in ids}
+
+
+def fake_channels(ids):
+    return {channel_id: f"https://yt3.example/{channel_id}.jpg" for channel_id in ids}
+
+
+def run_legacy(cache, video_ids, channel_ids):
+    legacy_lookup(cache, "video_detail", video_ids, fake_videos)
+    legacy_lookup(cache, "channel_detail", channel_ids, fake_channels)
+
+
+def run_batched(cache, video_ids, channel_ids):
+    # Only cache round trips are measured; the video catalog behind them starts empty.
+    with patch.object(catalog, 'get_records', return_value={}), \
+            patch.object(youtube, '_fetch_video_chunk', side_effect=lambda chunk: _cache_fetched(
+            "video_detail", fake_video_records(chunk), encode=encode_video_record)), \
+            patch.object(youtube, '_fetch_channel_chunk', side_effect=lambda chunk: _cache_fetched(
+                "channel_detail", fake_channels(chunk))):
+        youtube.get_video_details(video_ids)
+        youtube.get_channel_details_map(channel_ids)
+
+
+def fake_video_records(ids):
+    return {video_id: record_from_api_item(item) for video_id, item in fake_videos(ids).items()}
+
+
+def _cache_fetched(prefix, fetched, encode=lambda value: value):
+    # Mirrors the set_many done by the real chunk fetchers after an API call.
+    youtube.detail_cache.set_many(
+        {youtube.generate_cache_key(prefix, k): encode(v) for k, v in fetched.items()}, timeout=60
+    )
+    return fetched
+
+
+def measure(runner, cache, video_ids, channel_ids, state):
+    cache.clear()
+    if state != 'cold':
+        runner(cache, video_ids, channel_ids)
+        if state == 'warm':
+            # Shared cache warm, per-process tier empty (e.g. a fresh worker).
+            youtube.detail_cache.clear_local()
+        cache.round_trips = 0
+    started = time.perf_counter()
+    runner(cache, video_ids, channel_ids)
+    return cache.round_trips, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, default=25, help="videos per search page")
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help="simulated cache round-trip latency")
+    args = parser.parse_args()
+
+    video_ids = [f"video{i:03d}" for i in range(args.results)]
+    channel_ids = [f"channel{i:03d}" for i in range(args.results)]
+    cache = RoundTripCountingCache(args.rtt_ms / 1000)
+
+    print(f"{args.results} results per search, simulated cache RTT {args.rtt_ms} ms\n")
+    print(f"{'pattern':<22}{'cache':<8}{'round trips':>12}{'ms/search':>12}")
+    scenarios = (
+        ("per-key get/set", run_legacy, ('cold', 'warm')),
+        ("get_many/set_many", run_batched, ('cold', 'warm', 'local')),
+    )
+    with patch.object(caching, 'cache', cache):
+        for label, runner, states in scenarios:
+            for state in states:
+                trips, elapsed_ms = measure(runner, cache, video_ids, channel_ids, state)
+                print(f"{label:<22}{state:<8}{trips:>12}{elapsed_ms:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: full playlist reorder, per-item saves vs. the batched CASE update.
+
+Creates playlists of increasing size in a throwaway test database, reverses
+their order once with the previous per-item `save(update_fields=['order'])`
+loop and once with `PlaylistItemQuerySet.set_order`, and reports the number of
+SQL statements and the wall time of each.
+
+Usage:
+    python benchmarks/bench_playlist_reorder.py [--sizes 10 100 500 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from playlists.models import Playlist, PlaylistItem
+
+
+def make_playlist(user, size):
+    playlist = Playlist.objects.create(user=user, name=f"bench-{size}")
+    PlaylistItem.objects.bulk_create(
+        PlaylistItem(playlist=playlist, video_id=f"video{i:05d}", title=f"Video {i}", order=i + 1)
+        for i in range(size)
+    )
+    return playlist
+
+
+def legacy_reorder(playlist, item_ids):
+    """The previous implementation: one UPDATE per item."""
+    with transaction.atomic():
+        items_map = {item.pk: item for item in playlist.items.all()}
+        for index, item_id in enumerate(item_ids):
+            item = items_map[item_id]
+            item.order = index + 1
+            item.save(update_fields=['order'])
+
+
+def batched_reorder(playlist, item_ids):
+    with transaction.atomic():
+        playlist.items.set_order(item_ids)
+
+
+def measure(reorder, playlist):
+    item_ids = list(playlist.items.order_by('-order').values_list('pk', flat=True))
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        reorder(playlist, item_ids)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    actual = list(playlist.items.order_by('order').values_list('pk', flat=True))
+    assert actual == item_ids, "reorder produced the wrong order"
+    return len(queries), elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500, 2000], help="items per playlist")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = get_user_model().objects.create_user(email='bench@example.com', password='bench')
+        print(f"database: {connection.vendor}\n")
+        print(f"{'items':>7}{'per-item stmts':>16}{'per-item ms':>13}{'batched stmts':>15}{'batched ms':>12}")
+        for size in args.sizes:
+            playlist = make_playlist(user, size)
+            legacy = measure(legacy_reorder, playlist)
+            batched = measure(batched_reorder, playlist)
+            print(f"{size:>7}{legacy[0]:>16}{legacy[1]:>13.1f}{batched[0]:>15}{batched[1]:>12.1f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
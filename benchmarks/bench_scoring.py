@@ -0,0 +1,302 @@
+"""
+Benchmark: batch relevance scoring vs. the original per-item scorer.
+
+Generates large synthetic search result sets (titles/descriptions mixing
+educational keywords, query terms, spam phrases and filler, plus random
+view/like/comment counts and durations), checks that `api.scoring` produces
+exactly the same ranked output as the previous per-item implementation, and
+times both.
+
+Usage:
+    python benchmarks/bench_scoring.py [--items 50 1000 10000] [--repeat 5] [--seed 0]
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+from api import keywords
+from api.scoring import rank_search_results
+from api.video_records import VideoRecord, format_duration
+
+logger = logging.getLogger('bench_scoring')
+logging.disable(logging.CRITICAL)
+
+QUERY = "python data structures"
+FILLER = ("the", "and", "with", "today", "video", "part", "full", "new", "best", "shorts", "vlog", "data",
+          "python", "structures", "java", "react", "funny", "music", "episode", "subscribe", "channel",
+          "about", "this", "your", "what", "why", "code", "project", "build", "app", "web", "2024")
+KEYWORD_RATE = 0.15  # share of words drawn from the keyword sets
+
+
+def legacy_process_search_results(search_data, detailed_videos_map, channel_profile_pics_map, 
+                           original_query, min_duration=None, max_duration=None):
+    """Per-item scorer as it was before api.scoring; kept verbatim as the reference."""
+    processed_results = []
+    edu_keywords = {
+        'tutorial', 'learn', 'lesson', 'course', 'education', 'training',
+        'guide', 'explanation', 'explained', 'introduction', 'basics',
+        'how to', 'beginner', 'instructor', 'teaching', 'class', 'lecture',
+        'masterclass', 'workshop', 'insights', 'analysis', 'cbse', 'jee',
+        'a-level', 'exam', 'chapter', 'syllabus', 'problem', 'solution',
+        'practice', 'demonstration', 'experiment', 'lab', 'teacher', 'professor',
+        'university', 'school', 'study', 'revision', 'concept', 'topic',
+        'exercises', 'questions', 'answers'
+    }
+    edu_channel_keywords = {
+        'academy', 'school', 'university', 'education', 'tutorial', 'teacher',
+        'professor', 'cbse', 'jee', 'neet', 'class', 'study', 'learn', 'science',
+        'physics', 'chemistry', 'math', 'biology'
+    }
+    # Keywords/patterns that might indicate lower quality or clickbait for educational content
+    spammy_title_keywords = {
+        'must watch!!!', 'shocking', 'secret revealed', 'ultimate guide', 'easy way',
+        'guaranteed', 'free money', 'hack your', 'top 10 secrets' # Be cautious with these
+    }
+    query_terms = set(original_query.lower().split())
+
+    if not search_data.get('items'):
+        logger.info("No items in search_data to process")
+        return processed_results
+
+    logger.info(f"Processing {len(search_data.get('items', []))} search results")
+
+    for item in search_data.get('items', []):
+        try:
+            video_id = item['id']['videoId']
+            snippet = item['snippet']
+            title = snippet.get('title', '')
+            description = snippet.get('description', '')
+            channel_title = snippet.get('channelTitle', '')
+            source_channel_id = snippet.get('channelId', '')
+
+            title_lower = title.lower()
+            description_lower = description.lower()
+            channel_title_lower = channel_title.lower()
+            content_text = title_lower + " " + description_lower
+
+            # Calculate query_match_count before using it
+            query_terms = set(original_query.lower().split())
+            title_words = set(title_lower.split())
+            description_words = set(description_lower.split())
+            query_match_count = len(query_terms.intersection(title_words | description_words))
+
+            # Require at least one educational keyword AND at least one query term in title/description
+            has_edu_keyword = any(kw in content_text for kw in edu_keywords)
+            has_edu_channel = any(kw in channel_title_lower for kw in edu_channel_keywords)
+            if not (has_edu_keyword or has_edu_channel) or query_match_count == 0:
+                logger.info(f"Skipping '{title}' as it lacks educational signals or query relevance.")
+                continue
+
+            # Penalize or skip if not educational
+            if not has_edu_keyword and not has_edu_channel:
+                logger.info(f"Skipping '{title}' as it lacks educational signals.")
+                continue
+
+            # Penalize shorts and viral-only content
+            duration_seconds = 0
+            if 'shorts' in title_lower or 'shorts' in description_lower:
+                relevance_score = -5
+            else:
+                relevance_score = 0.0
+
+            # Penalize spammy/clickbait titles
+            for spam_keyword in spammy_title_keywords:
+                if spam_keyword in title_lower:
+                    relevance_score -= 2.0
+                    logger.info(f"Penalizing title for spammy keyword '{spam_keyword}': {title}")
+                    break # Apply penalty once per video for title
+
+            # Boost score for educational keywords
+            for keyword in edu_keywords:
+                if keyword in content_text:
+                    relevance_score += 2.0 # Increased base score from edu keywords
+
+            # Calculate query_match_count before using it
+            query_terms = set(original_query.lower().split())
+            title_words = set(title_lower.split())
+            description_words = set(description_lower.split())
+            query_match_count = len(query_terms.intersection(title_words | description_words))
+
+            # Boost score for query term matches
+            relevance_score += query_match_count * 2.5 # Keep query match strong
+
+            likes = 0
+            comment_count = 0
+            view_count = 0
+            duration = "Unknown"
+            duration_seconds = 0
+            # Get profile pic from the map passed into this function
+            channel_profile_image_url = channel_profile_pics_map.get(source_channel_id) 
+
+            # Get detailed video statistics from the map passed into this function
+            video_record = detailed_videos_map.get(video_id)
+            if video_record:
+                likes = video_record.like_count
+                comment_count = video_record.comment_count
+                view_count = video_record.view_count
+
+                # Adjust engagement scoring
+                if view_count > 10000:  # Good view count
+                    relevance_score += math.log10(view_count) * 1.0 
+                elif view_count > 500: # Moderate view count
+                    relevance_score += math.log10(view_count) * 0.6
+                elif view_count < 200 and view_count > 0: # Penalty for very low views
+                    relevance_score -= 0.25 # Softened penalty
+
+                if likes > 2000:  # Good like count
+                    relevance_score += math.log10(likes) * 0.8
+                elif likes > 100: # Moderate like count
+                    relevance_score += math.log10(likes) * 0.4
+                elif likes < 50 and likes > 0: # Penalty for very low likes
+                    relevance_score -= 0.15 # Softened penalty
+                
+                if view_count > 50000 and likes > 5000: # "Notable" boost
+                    relevance_score += 1.5
+                elif view_count > 20000 and likes > 2000:
+                    relevance_score += 0.75
+
+
+                if comment_count > 500: 
+                    relevance_score += math.log10(comment_count) * 0.4
+                elif comment_count > 20:
+                    relevance_score += math.log10(comment_count) * 0.2
+                
+                if video_record.duration_seconds is not None:
+                    duration_seconds = video_record.duration_seconds
+                    duration = format_duration(duration_seconds)
+                    
+                    if min_duration and duration_seconds < min_duration:
+                        logger.info(f"Video '{title}' too short ({duration_seconds}s), skipping.")
+                        continue
+                    if max_duration and duration_seconds > max_duration:
+                        logger.info(f"Video '{title}' too long ({duration_seconds}s), skipping.")
+                        continue
+            
+            # Adjusted MIN_RELEVANCE_THRESHOLD logic - make it more lenient
+            MIN_BASE_RELEVANCE_TO_CONSIDER = -1.0 # Allow videos with slightly negative scores if engagement helps
+            MODERATE_ENGAGEMENT_VIEWS = 1000 
+            MODERATE_ENGAGEMENT_LIKES = 100  
+
+            # Extreme engagement can still bypass, but the main path is more lenient
+            EXTREME_ENGAGEMENT_VIEWS = 200000 
+            EXTREME_ENGAGEMENT_LIKES = 20000   
+
+            is_extremely_engaging = view_count > EXTREME_ENGAGEMENT_VIEWS and likes > EXTREME_ENGAGEMENT_LIKES
+            has_moderate_engagement = view_count > MODERATE_ENGAGEMENT_VIEWS and likes > MODERATE_ENGAGEMENT_LIKES
+
+            # If not extremely engaging, and score is too low, then check if it has at least some moderate engagement
+            if not is_extremely_engaging and relevance_score < MIN_BASE_RELEVANCE_TO_CONSIDER:
+                if not has_moderate_engagement: # If score is very low AND it lacks even moderate engagement, skip
+                    logger.info(f"Video '{title}' (score: {relevance_score}, views: {view_count}, likes: {likes}) below threshold and lacks moderate engagement, skipping.")
+                    continue
+                # If score is low but has moderate engagement, it might still pass (relying on final sort)
+                logger.info(f"Video '{title}' (score: {relevance_score}) is low but has moderate engagement (views: {view_count}, likes: {likes}), considering.")
+
+
+            processed_results.append({
+                'id': video_id,
+                'title': title,
+                'description': description,
+                'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url', ''),
+                'channelTitle': channel_title,
+                'channelProfileImageUrl': channel_profile_image_url,
+                'publishedAt': snippet.get('publishedAt', ''),
+                'relevance_score': round(relevance_score, 2),
+                'likes': likes,
+                'comment_count': comment_count,
+                'view_count': view_count,
+                'duration': duration,
+                'duration_seconds': duration_seconds
+            })
+        except (KeyError, TypeError) as e:
+            logger.error(f"Error processing search result item: {e}")
+            logger.error(traceback.format_exc())
+
+    logger.info(f"After filtering, {len(processed_results)} videos remain")
+    processed_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+    return processed_results
+
+
+def pick_word(rng, words):
+    return rng.choice(words) if rng.random() < KEYWORD_RATE else rng.choice(FILLER)
+
+
+def synthetic_results(n, rng):
+    words = sorted(keywords.EDUCATIONAL.keywords) + sorted(keywords.SPAMMY_TITLE.keywords)
+    channel_words = sorted(keywords.EDUCATIONAL_CHANNEL.keywords) + ["vlogs", "gaming", "daily", "official"]
+    items, details, pics = [], {}, {}
+    for i in range(n):
+        video_id = f"vid{i:07d}"
+        channel_id = f"UC{i % 997:05d}"
+        title = " ".join(pick_word(rng, words) for _ in range(rng.randint(2, 10)))
+        description = " ".join(pick_word(rng, words) for _ in range(rng.randint(0, 30)))
+        items.append({
+            'id': {'videoId': video_id},
+            'snippet': {
+                'title': title.title(),
+                'description': description,
+                'channelTitle': " ".join(rng.choice(channel_words) for _ in range(2)).title(),
+                'channelId': channel_id,
+                'publishedAt': '2024-01-01T00:00:00Z',
+                'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hq.jpg"}},
+            },
+        })
+        if rng.random() < 0.9:
+            views = int(10 ** rng.uniform(0, 7.5)) if rng.random() < 0.95 else 0
+            details[video_id] = VideoRecord(
+                view_count=views,
+                like_count=int(views * rng.uniform(0, 0.12)),
+                comment_count=int(views * rng.uniform(0, 0.01)),
+                duration_seconds=rng.randint(5, 4 * 3600) if rng.random() < 0.95 else None,
+            )
+        pics[channel_id] = f"https://yt3.example/{channel_id}.jpg"
+    # A few malformed items, which both scorers skip.
+    items.append({'id': {'kind': 'youtube#channel'}, 'snippet': {}})
+    return {'items': items}, details, pics
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[50, 1000, 10000], help="result set sizes")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement (best is reported)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"query {QUERY!r}, best of {args.repeat}\n")
+    print(f"{'items':>8}{'kept':>8}{'per-item ms':>14}{'batch ms':>12}{'speedup':>10}")
+    for n in args.items:
+        search_data, details, pics = synthetic_results(n, rng)
+        for min_duration, max_duration in ((240, 1200), (None, None)):
+            expected = legacy_process_search_results(search_data, details, pics, QUERY, min_duration, max_duration)
+            actual = rank_search_results(search_data, details, pics, QUERY, min_duration, max_duration)
+            if actual != expected:
+                raise SystemExit(f"ranking mismatch for {n} items (duration filter {min_duration}-{max_duration})")
+        legacy_ms = best_of(args.repeat, legacy_process_search_results, search_data, details, pics, QUERY)
+        batch_ms = best_of(args.repeat, rank_search_results, search_data, details, pics, QUERY)
+        print(f"{n:>8}{len(expected):>8}{legacy_ms:>14.2f}{batch_ms:>12.2f}{legacy_ms / batch_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
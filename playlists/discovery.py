@@ -0,0 +1,50 @@
+"""
+Cache for the public playlist discovery listing.
+
+Every page of the listing is the same for all users, so its serialized
+results (and the cursors of its neighbours; links are built per request) are
+cached under a key made of the decoded cursor, the page size and a version
+number. Unknown query parameters don't reach the key. Anything that changes what
+the listing shows (a playlist made public, a public playlist edited, deleted
+or having items added/removed) calls `invalidate_public_playlists()`, which
+bumps the version so that all cached pages are dropped at once.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+PUBLIC_PLAYLISTS_CACHE_TIMEOUT = 300  # seconds
+_VERSION_KEY = "playlists:public:version"
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        # Start from the clock rather than 1, so that pages cached under an
+        # evicted version number are never served again.
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(_VERSION_KEY, 0)
+    return version
+
+
+def page_cache_key(cursor, page_size):
+    """Cache key for the listing page at the decoded `cursor` (None for the first page)."""
+    digest = hashlib.md5(repr((tuple(cursor) if cursor else None, page_size)).encode()).hexdigest()
+    return f"playlists:public:v{_version()}:{digest}"
+
+
+def get_page(cursor, page_size):
+    return cache.get(page_cache_key(cursor, page_size))
+
+
+def set_page(cursor, page_size, data):
+    cache.set(page_cache_key(cursor, page_size), data, timeout=PUBLIC_PLAYLISTS_CACHE_TIMEOUT)
+
+
+def invalidate_public_playlists():
+    """Drop every cached discovery page."""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.add(_VERSION_KEY, time.time_ns(), timeout=None)
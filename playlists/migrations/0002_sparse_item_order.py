@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 04:44
+
+from django.db import migrations
+
+# Copied from playlists.models so the migration doesn't change if the constant does.
+ORDER_GAP = 1024
+BATCH_SIZE = 500
+
+
+def _renumber(apps, schema_editor, step):
+    PlaylistItem = apps.get_model('playlists', 'PlaylistItem')
+    db_alias = schema_editor.connection.alias
+    items = PlaylistItem.objects.using(db_alias).order_by('playlist_id', 'order', 'added_at').only(
+        'id', 'playlist_id', 'order'
+    )
+    batch, current_playlist, position = [], None, 0
+    for item in items.iterator(chunk_size=BATCH_SIZE):
+        if item.playlist_id != current_playlist:
+            current_playlist, position = item.playlist_id, 0
+        position += 1
+        item.order = position * step
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            PlaylistItem.objects.using(db_alias).bulk_update(batch, ['order'])
+            batch = []
+    if batch:
+        PlaylistItem.objects.using(db_alias).bulk_update(batch, ['order'])
+
+
+def spread_item_order(apps, schema_editor):
+    """Renumber every playlist's items ORDER_GAP apart, keeping their current order."""
+    _renumber(apps, schema_editor, ORDER_GAP)
+
+
+def compact_item_order(apps, schema_editor):
+    """Back to consecutive numbering from 1."""
+    _renumber(apps, schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_item_order, compact_item_order),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 04:46
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def initialise_item_seq(apps, schema_editor):
+    """Start each playlist's sequence at its current highest item order."""
+    Playlist = apps.get_model('playlists', 'Playlist')
+    PlaylistItem = apps.get_model('playlists', 'PlaylistItem')
+    last_order = PlaylistItem.objects.filter(playlist=models.OuterRef('pk')).order_by('-order').values('order')[:1]
+    Playlist.objects.using(schema_editor.connection.alias).update(
+        item_seq=Coalesce(models.Subquery(last_order), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0002_sparse_item_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='item_seq',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(initialise_item_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 04:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0003_playlist_item_seq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-created_at', '-id'], name='playlist_public_recent_idx'),
+        ),
+    ]
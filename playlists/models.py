@@ -1,9 +1,118 @@
-from django.db import models
+from django.db import connections, models, router
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
 import uuid
 
 User = get_user_model()
 
+# Number of item thumbnails included in a playlist summary.
+SUMMARY_THUMBNAIL_COUNT = 4
+
+# Items are numbered ORDER_GAP apart so that moving one item can give it the
+# midpoint of its new neighbours without renumbering the rest of the playlist.
+ORDER_GAP = 1024
+
+class PlaylistQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Playlists `user` owns, has been shared or are public.
+
+        Written as `pk IN (owned UNION shared UNION public)`: each branch is a
+        plain index lookup (user_id, the shared_with table, the partial index on
+        public playlists), and UNION removes duplicates without the DISTINCT
+        over a join that the equivalent OR filter needs.
+        """
+        through = Playlist.shared_with.through
+        owned = Playlist.objects.filter(user=user).order_by().values('pk')
+        shared = through.objects.filter(
+            **{Playlist.shared_with.field.m2m_reverse_field_name(): user}
+        ).order_by().values('playlist_id')
+        public = Playlist.objects.filter(is_public=True).order_by().values('pk')
+        return self.filter(pk__in=owned.union(shared, public))
+
+    def with_summary(self, thumbnail_count=SUMMARY_THUMBNAIL_COUNT):
+        """
+        Annotate each playlist with `item_count`, `last_updated` and
+        `thumbnail_0` .. `thumbnail_{n-1}` (the thumbnails of its first items,
+        in playlist order), all computed in the playlist query itself so the
+        items are never loaded.
+        """
+        thumbnails = PlaylistItem.objects.filter(
+            playlist=models.OuterRef('pk')
+        ).exclude(thumbnail_url__isnull=True).exclude(thumbnail_url='').order_by('order', 'added_at')
+        annotations = {
+            f'thumbnail_{index}': models.Subquery(thumbnails.values('thumbnail_url')[index:index + 1])
+            for index in range(thumbnail_count)
+        }
+        return self.annotate(
+            # distinct: the queryset may already be joined to other multi-valued relations.
+            item_count=models.Count('items', distinct=True),
+            last_updated=Greatest('updated_at', Coalesce(models.Max('items__added_at'), 'updated_at')),
+            **annotations
+        )
+
+class PlaylistItemQuerySet(models.QuerySet):
+    # Keeps each UPDATE's parameter count well under SQLite's host-parameter limit.
+    ORDER_UPDATE_BATCH_SIZE = 500
+
+    def set_order(self, item_ids, start=ORDER_GAP, step=ORDER_GAP):
+        """
+        Give the items in `item_ids` the `order` values start, start + step,
+        ... in list order, with one `UPDATE ... SET order = CASE id WHEN ...`
+        statement per batch instead of one UPDATE per item. Returns the number
+        of rows updated.
+        """
+        connection = connections[self.db]
+        pk_field = self.model._meta.pk
+        case_sql = "CASE %s %%s END" % connection.ops.quote_name(pk_field.column)
+        updated = 0
+        for offset in range(0, len(item_ids), self.ORDER_UPDATE_BATCH_SIZE):
+            batch = item_ids[offset:offset + self.ORDER_UPDATE_BATCH_SIZE]
+            # Written as raw SQL because building one When() per item costs more
+            # than the UPDATE itself on large playlists.
+            params = []
+            for index, item_id in enumerate(batch):
+                params += [pk_field.get_db_prep_value(item_id, connection), start + (offset + index) * step]
+            new_order = RawSQL(case_sql % " ".join(["WHEN %s THEN %s"] * len(batch)), params,
+                               output_field=models.PositiveIntegerField())
+            updated += self.filter(pk__in=batch).update(order=new_order)
+        return updated
+
+    def move_item(self, item, before=None, after=None):
+        """
+        Move `item` directly before or after another item of the same playlist
+        (pass exactly one of `before`/`after`). Normally only `item` is
+        written, with the midpoint of its new neighbours' orders; when there is
+        no integer left between them the playlist is renumbered ORDER_GAP apart
+        first. Returns the item's new order.
+        """
+        anchor = before or after
+        others = self.exclude(pk=item.pk)
+        if before is not None:
+            previous_order = others.filter(order__lt=anchor.order).aggregate(value=models.Max('order'))['value'] or 0
+            low, high = previous_order, anchor.order
+        else:
+            next_order = others.filter(order__gt=anchor.order).aggregate(value=models.Min('order'))['value']
+            if next_order is None:
+                # Moving to the end is an append: take the next position from the sequence.
+                new_order = item.playlist.reserve_item_orders()[0]
+                self.filter(pk=item.pk).update(order=new_order)
+                return new_order
+            low, high = anchor.order, next_order
+
+        if high - low < 2:
+            # The gap is used up: renumber once, then every gap is ORDER_GAP again.
+            item_ids = list(others.order_by('order', 'added_at').values_list('pk', flat=True))
+            position = item_ids.index(anchor.pk) + (0 if before is not None else 1)
+            item_ids.insert(position, item.pk)
+            self.set_order(item_ids)
+            return (position + 1) * ORDER_GAP
+
+        new_order = (low + high) // 2
+        self.filter(pk=item.pk).update(order=new_order)
+        return new_order
+
 class Playlist(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='playlists')
@@ -17,6 +126,45 @@ class Playlist(models.Model):
         related_name='shared_playlists',
         blank=True
     )
+    # Highest `order` handed out to an item of this playlist so far; advanced
+    # only through reserve_item_orders().
+    item_seq = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PlaylistQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Never write item_seq back from a possibly stale instance.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'item_seq'
+            ]
+        super().save(*args, **kwargs)
+
+    def reserve_item_orders(self, count=1):
+        """
+        Reserve `count` consecutive append positions and return their `order`
+        values (ORDER_GAP apart, after every order handed out before).
+
+        The counter is advanced and read back in a single
+        `UPDATE ... RETURNING` statement, so concurrent appends to the same
+        playlist never get the same order and need no max(order) lookup.
+        """
+        connection = connections[router.db_for_write(Playlist, instance=self)]
+        table = connection.ops.quote_name(self._meta.db_table)
+        column = connection.ops.quote_name(self._meta.get_field('item_seq').column)
+        pk_column = connection.ops.quote_name(self._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {column} = {column} + %s WHERE {pk_column} = %s RETURNING {column}",
+                [count * ORDER_GAP, self._meta.pk.get_db_prep_value(self.pk, connection)]
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Playlist.DoesNotExist(f"Playlist {self.pk} does not exist.")
+        self.item_seq = row[0]
+        first = self.item_seq - (count - 1) * ORDER_GAP
+        return list(range(first, self.item_seq + 1, ORDER_GAP))
 
     def share_with_user(self, user_email):
         try:
@@ -29,6 +177,11 @@ class Playlist(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ('user', 'name') # A user cannot have two playlists with the same name
+        indexes = [
+            # Public discovery listing and the public branch of visible_to().
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_public=True),
+                         name='playlist_public_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} by {self.user.email}"
@@ -43,6 +196,8 @@ class PlaylistItem(models.Model):
     order = models.PositiveIntegerField() # To maintain order of videos in playlist
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PlaylistItemQuerySet.as_manager()
+
     class Meta:
         ordering = ['playlist', 'order']
         unique_together = ('playlist', 'video_id') # A video can only appear once in a playlist
@@ -54,7 +209,6 @@ class PlaylistItem(models.Model):
         return f"{self.order}. {self.title} in {self.playlist.name}"
 
     def save(self, *args, **kwargs):
-        if self.order is None:  # Auto-increment order if not set
-            last_item = PlaylistItem.objects.filter(playlist=self.playlist).order_by('-order').first()
-            self.order = (last_item.order + 1) if last_item else 1
+        if self.order is None:  # Append to the end of the playlist if not set
+            self.order = self.playlist.reserve_item_orders()[0]
         super().save(*args, **kwargs)
@@ -0,0 +1,31 @@
+from urllib.parse import parse_qs, urlsplit
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class PublicPlaylistCursorPagination(CursorPagination):
+    """
+    Keyset pagination over public playlists, newest first, served from the
+    partial index on (-created_at, -id) WHERE is_public.
+
+    Pages are cached for everyone (see `playlists.discovery`), so the links
+    can't be: `get_page_cursors()` returns the encoded cursors of the page just
+    paginated, and `get_link()` turns one into a link for the current request.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_cursors(self):
+        """The encoded (next, previous) cursors of the page just paginated; None where there is no such page."""
+        return tuple(
+            parse_qs(urlsplit(link).query)[self.cursor_query_param][0] if link else None
+            for link in (self.get_next_link(), self.get_previous_link())
+        )
+
+    def get_link(self, request, encoded_cursor):
+        if encoded_cursor is None:
+            return None
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, encoded_cursor)
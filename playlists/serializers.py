@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Playlist, PlaylistItem
+from .models import Playlist, PlaylistItem, SUMMARY_THUMBNAIL_COUNT
+
+# Upper bound on the videos or item IDs accepted by one bulk request.
+MAX_BULK_ITEMS = 200
 
 class PlaylistItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,6 +19,27 @@ class PlaylistSerializer(serializers.ModelSerializer):
         fields = ['id', 'user_id', 'name', 'description', 'created_at', 'updated_at', 'items']
         read_only_fields = ['id', 'user_id', 'created_at', 'updated_at', 'items']
 
+class PlaylistSummarySerializer(serializers.ModelSerializer):
+    """
+    Playlist without its items, for listings. Expects a queryset annotated
+    with `Playlist.objects.with_summary()`.
+    """
+    # source='user' reads the user_id column without loading the user.
+    user_id = serializers.PrimaryKeyRelatedField(read_only=True, source='user')
+    item_count = serializers.IntegerField(read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+    last_updated = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Playlist
+        fields = ['id', 'user_id', 'name', 'description', 'is_public', 'created_at', 'updated_at',
+                  'item_count', 'thumbnails', 'last_updated']
+        read_only_fields = fields
+
+    def get_thumbnails(self, obj):
+        thumbnails = (getattr(obj, f'thumbnail_{index}', None) for index in range(SUMMARY_THUMBNAIL_COUNT))
+        return [url for url in thumbnails if url]
+
 class PlaylistCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Playlist
@@ -35,22 +59,47 @@ class PlaylistItemCreateSerializer(serializers.ModelSerializer):
         fields = ['video_id', 'title', 'thumbnail_url', 'channel_title']
         # 'playlist' and 'order' will be set in the view or by model's save method
 
+class PlaylistItemBulkCreateSerializer(serializers.Serializer):
+    # Each entry is validated separately with PlaylistItemCreateSerializer so
+    # that one bad video is reported instead of failing the whole request.
+    videos = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_BULK_ITEMS,
+        help_text="Videos to append, each with video_id, title, thumbnail_url and channel_title."
+    )
+
+class PlaylistItemBulkRemoveSerializer(serializers.Serializer):
+    item_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=MAX_BULK_ITEMS,
+        help_text="A list of PlaylistItem IDs to remove."
+    )
+
 class PlaylistItemReorderSerializer(serializers.Serializer):
     item_ids = serializers.ListField(
-        child=serializers.IntegerField(),
+        child=serializers.UUIDField(),
         allow_empty=False,
         help_text="A list of PlaylistItem IDs in the desired new order."
     )
 
     def validate_item_ids(self, value):
         # This serializer-level validation ensures the basic structure and type of 'item_ids'.
-        # It confirms 'item_ids' is a list and contains integers.
+        # It confirms 'item_ids' is a list and contains UUIDs (PlaylistItem primary keys).
         # Business logic validation, such as ensuring these IDs belong to the specific playlist,
         # that all items from the playlist are present, and that there are no duplicate IDs within the list,
         # is handled in the API view where database context is available.
         if not value:
             raise serializers.ValidationError("item_ids list cannot be empty.")
-        # Basic check for type consistency if child=serializers.IntegerField() wasn't enough (it usually is)
-        # For example, ensuring all elements are indeed integers if mixed types were possible.
-        # However, ListField with child=IntegerField already handles this.
+        # ListField with child=UUIDField already rejects malformed IDs.
         return value
+
+class PlaylistItemMoveSerializer(serializers.Serializer):
+    before = serializers.UUIDField(required=False, help_text="Move the item directly before this item.")
+    after = serializers.UUIDField(required=False, help_text="Move the item directly after this item.")
+
+    def validate(self, attrs):
+        if ('before' in attrs) == ('after' in attrs):
+            raise serializers.ValidationError("Provide exactly one of 'before' or 'after'.")
+        return attrs
@@ -2,7 +2,12 @@ from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from django.urls import reverse
-from .models import Playlist
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from .models import Playlist, PlaylistItem, ORDER_GAP
 
 class PlaylistTests(APITestCase):
     def setUp(self):
@@ -44,3 +49,342 @@ class PlaylistTests(APITestCase):
         )
 
     # ...more test methods...
+
+class PlaylistSummaryTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            email='summary@example.com',
+            password='testpass123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _make_playlist(self, name, item_count):
+        playlist = Playlist.objects.create(user=self.user, name=name)
+        for index in range(item_count):
+            PlaylistItem.objects.create(
+                playlist=playlist,
+                video_id=f'{name}-{index}',
+                title=f'Video {index}',
+                thumbnail_url=f'https://img.example.com/{name}/{index}.jpg' if index != 1 else '',
+                order=index + 1
+            )
+        return playlist
+
+    def test_list_returns_summaries(self):
+        self._make_playlist('full', 6)
+        self._make_playlist('empty', 0)
+
+        response = self.client.get(reverse('playlist-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summaries = {playlist['name']: playlist for playlist in response.data}
+        self.assertNotIn('items', summaries['full'])
+        self.assertEqual(summaries['full']['item_count'], 6)
+        # Items without a thumbnail are skipped.
+        self.assertEqual(summaries['full']['thumbnails'], [
+            f'https://img.example.com/full/{index}.jpg' for index in (0, 2, 3, 4)
+        ])
+        self.assertEqual(summaries['empty']['item_count'], 0)
+        self.assertEqual(summaries['empty']['thumbnails'], [])
+        self.assertIsNotNone(summaries['empty']['last_updated'])
+
+    def test_list_query_count_does_not_grow_with_playlists(self):
+        for index in range(5):
+            self._make_playlist(f'playlist-{index}', 3)
+        url = reverse('playlist-list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(queries), 1)
+
+    def test_detail_includes_items(self):
+        playlist = self._make_playlist('detail', 2)
+        response = self.client.get(reverse('playlist-detail', args=[playlist.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['video_id'] for item in response.data['items']], ['detail-0', 'detail-1'])
+
+class PlaylistReorderTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            email='reorder@example.com',
+            password='testpass123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.playlist = Playlist.objects.create(user=self.user, name='Reorder')
+        self.items = [
+            PlaylistItem.objects.create(playlist=self.playlist, video_id=f'video-{index}', title=f'Video {index}',
+                                        order=index + 1)
+            for index in range(30)
+        ]
+        self.url = reverse('playlist-reorder-items', args=[self.playlist.pk])
+
+    def test_reorder_writes_new_order(self):
+        new_order = [str(item.pk) for item in reversed(self.items)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'item_ids': new_order}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['items']], new_order)
+        self.assertEqual(
+            list(self.playlist.items.order_by('order').values_list('video_id', flat=True)),
+            [f'video-{index}' for index in reversed(range(30))]
+        )
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    def test_reorder_rejects_incomplete_list(self):
+        response = self.client.patch(self.url, {'item_ids': [str(self.items[0].pk)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.items[1].pk), response.data['error'])
+        response = self.client.patch(self.url, {'item_ids': [1, 2]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PlaylistMoveItemTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            email='move@example.com',
+            password='testpass123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.playlist = Playlist.objects.create(user=self.user, name='Move')
+        self.items = [
+            PlaylistItem.objects.create(playlist=self.playlist, video_id=f'video-{index}', title=f'Video {index}')
+            for index in range(5)
+        ]
+
+    def _move(self, item, **target):
+        url = reverse('playlist-move-item', args=[self.playlist.pk, item.pk])
+        return self.client.patch(url, {key: str(value.pk) for key, value in target.items()}, format='json')
+
+    def _video_ids(self):
+        return list(self.playlist.items.order_by('order').values_list('video_id', flat=True))
+
+    def test_new_items_are_spaced_out(self):
+        self.assertEqual([item.order for item in self.items], [ORDER_GAP * (index + 1) for index in range(5)])
+
+    def test_move_rewrites_only_the_moved_item(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._move(self.items[4], before=self.items[1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._video_ids(), ['video-0', 'video-4', 'video-1', 'video-2', 'video-3'])
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        response = self._move(self.items[0], after=self.items[3])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._video_ids(), ['video-4', 'video-1', 'video-2', 'video-3', 'video-0'])
+
+    def test_exhausted_gap_rebalances(self):
+        # Moving the last item to second place halves the first gap every time.
+        expected = [item.video_id for item in self.items]
+        for _ in range(12):
+            items = list(self.playlist.items.order_by('order'))
+            response = self._move(items[-1], before=items[1])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected.insert(1, expected.pop())
+            self.assertEqual(self._video_ids(), expected)
+        orders = list(self.playlist.items.order_by('order').values_list('order', flat=True))
+        self.assertGreaterEqual(orders[1] - orders[0], ORDER_GAP // 4)
+
+    def test_move_validation(self):
+        response = self._move(self.items[0], before=self.items[1], after=self.items[2])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._move(self.items[0], before=self.items[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other = Playlist.objects.create(user=self.user, name='Other')
+        foreign = PlaylistItem.objects.create(playlist=other, video_id='foreign', title='Foreign')
+        response = self._move(self.items[0], before=foreign)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PlaylistBulkItemTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            email='bulk@example.com',
+            password='testpass123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.playlist = Playlist.objects.create(user=self.user, name='Bulk')
+        PlaylistItem.objects.create(playlist=self.playlist, video_id='existing', title='Existing')
+
+    def _videos(self, count):
+        return [{'video_id': f'video-{index}', 'title': f'Video {index}'} for index in range(count)]
+
+    def test_bulk_add_uses_constant_queries(self):
+        url = reverse('playlist-bulk-add-items', args=[self.playlist.pk])
+        query_counts = []
+        for count in (2, 40):
+            self.playlist.items.exclude(video_id='existing').delete()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {'videos': self._videos(count)}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['added'], count)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(
+            list(self.playlist.items.order_by('order').values_list('video_id', flat=True)),
+            ['existing'] + [f'video-{index}' for index in range(40)]
+        )
+
+    def test_bulk_add_reports_per_item_outcomes(self):
+        url = reverse('playlist-bulk-add-items', args=[self.playlist.pk])
+        videos = [{'video_id': 'existing', 'title': 'Again'}, {'video_id': 'new', 'title': 'New'},
+                  {'video_id': 'new', 'title': 'New again'}, {'title': 'No id'}]
+        response = self.client.post(url, {'videos': videos}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['duplicate', 'added', 'duplicate', 'invalid'])
+        self.assertEqual(response.data['results'][1]['item']['video_id'], 'new')
+        self.assertIn('video_id', response.data['results'][3]['errors'])
+        self.assertEqual(self.playlist.items.count(), 2)
+
+    def test_bulk_add_reports_rows_lost_to_a_concurrent_add(self):
+        url = reverse('playlist-bulk-add-items', args=[self.playlist.pk])
+        reserve_item_orders = Playlist.reserve_item_orders
+
+        def add_concurrently(playlist, count=1):
+            # Another request adds video-1 after the duplicate check.
+            PlaylistItem.objects.bulk_create([PlaylistItem(playlist=playlist, video_id='video-1', title='Raced', order=1)])
+            return reserve_item_orders(playlist, count)
+
+        with patch.object(Playlist, 'reserve_item_orders', add_concurrently):
+            response = self.client.post(url, {'videos': self._videos(3)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['added'], 2)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['added', 'duplicate', 'added'])
+        self.assertNotIn('item', response.data['results'][1])
+        self.assertEqual(self.playlist.items.get(video_id='video-1').title, 'Raced')
+
+    def test_bulk_remove(self):
+        keep = PlaylistItem.objects.create(playlist=self.playlist, video_id='keep', title='Keep')
+        remove = list(self.playlist.items.exclude(pk=keep.pk).values_list('pk', flat=True))
+        other = Playlist.objects.create(user=self.user, name='Other')
+        foreign = PlaylistItem.objects.create(playlist=other, video_id='foreign', title='Foreign')
+        url = reverse('playlist-bulk-remove-items', args=[self.playlist.pk])
+        response = self.client.post(url, {'item_ids': [str(pk) for pk in remove] + [str(foreign.pk)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['removed'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']], ['removed', 'not_found'])
+        self.assertEqual(list(self.playlist.items.values_list('video_id', flat=True)), ['keep'])
+        self.assertTrue(PlaylistItem.objects.filter(pk=foreign.pk).exists())
+
+    def test_single_item_remove_takes_uuid(self):
+        item = self.playlist.items.get()
+        response = self.client.delete(reverse('playlist-remove-item', args=[self.playlist.pk, item.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.playlist.items.exists())
+
+class PlaylistItemSequenceTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            email='sequence@example.com',
+            password='testpass123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.playlist = Playlist.objects.create(user=self.user, name='Sequence')
+
+    def test_reserved_orders_never_repeat(self):
+        self.assertEqual(self.playlist.reserve_item_orders(), [ORDER_GAP])
+        self.assertEqual(self.playlist.reserve_item_orders(3), [2 * ORDER_GAP, 3 * ORDER_GAP, 4 * ORDER_GAP])
+        # A second, stale copy of the playlist still gets fresh positions.
+        stale = Playlist.objects.get(pk=self.playlist.pk)
+        stale.item_seq = 0
+        self.assertEqual(stale.reserve_item_orders(), [5 * ORDER_GAP])
+
+    def test_playlist_save_keeps_sequence(self):
+        stale = Playlist.objects.get(pk=self.playlist.pk)
+        self.playlist.reserve_item_orders(2)
+        stale.name = 'Renamed'
+        stale.save()
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.name, 'Renamed')
+        self.assertEqual(self.playlist.item_seq, 2 * ORDER_GAP)
+
+    def test_add_video_appends_in_one_statement(self):
+        url = reverse('playlist-add-item', args=[self.playlist.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'video_id': 'first', 'title': 'First'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['order'], ORDER_GAP)
+        self.assertFalse([query for query in queries if 'ORDER BY' in query['sql'] and 'playlistitem' in query['sql']])
+        response = self.client.post(url, {'video_id': 'second', 'title': 'Second'}, format='json')
+        self.assertEqual(response.data['order'], 2 * ORDER_GAP)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'playlist-discovery-tests'}})
+class PlaylistVisibilityTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='viewer@example.com', password='testpass123', is_active=True)
+        self.owner = User.objects.create_user(email='owner@example.com', password='testpass123', is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.own = Playlist.objects.create(user=self.user, name='Own')
+        self.shared = Playlist.objects.create(user=self.owner, name='Shared')
+        self.shared.shared_with.add(self.user)
+        self.public = Playlist.objects.create(user=self.owner, name='Public', is_public=True)
+        # Shared with the viewer and public: must still be listed once.
+        self.both = Playlist.objects.create(user=self.owner, name='Both', is_public=True)
+        self.both.shared_with.add(self.user)
+        Playlist.objects.create(user=self.owner, name='Private')
+
+    def test_list_includes_owned_shared_and_public_once(self):
+        response = self.client.get(reverse('playlist-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(playlist['name'] for playlist in response.data), ['Both', 'Own', 'Public', 'Shared'])
+
+    def test_private_playlists_of_others_are_hidden(self):
+        private = Playlist.objects.get(name='Private')
+        response = self.client.get(reverse('playlist-detail', args=[private.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('playlist-detail', args=[self.shared.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_discover_lists_public_playlists_from_cache(self):
+        url = reverse('playlist-discover')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([playlist['name'] for playlist in response.data['results']], ['Both', 'Public'])
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(cached.data, response.data)
+
+    def test_discover_cache_ignores_extra_params_and_builds_links_per_request(self):
+        url = reverse('playlist-discover')
+        first = self.client.get(url, {'page_size': 1})
+        self.assertTrue(first.data['next'].startswith('http://testserver/'))
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, {'page_size': 1, 'junk': 'x'}, secure=True)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(cached.data['results'], first.data['results'])
+        self.assertTrue(cached.data['next'].startswith('https://testserver/'))
+
+        second = self.client.get(cached.data['next'])
+        self.assertEqual([playlist['name'] for playlist in second.data['results']], ['Public'])
+        self.assertIsNone(second.data['next'])
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_discover_is_invalidated_by_make_public_and_edits(self):
+        url = reverse('playlist-discover')
+        self.client.get(url)
+        response = self.client.post(reverse('playlist-make-public', args=[self.own.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual([playlist['name'] for playlist in response.data['results']], ['Both', 'Public', 'Own'])
+
+        PlaylistItem.objects.create(playlist=self.own, video_id='before', title='Before')
+        self.client.post(reverse('playlist-add-item', args=[self.own.pk]), {'video_id': 'new', 'title': 'New'})
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][-1]['item_count'], 2)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PlaylistViewSet, PlaylistRetrieveUpdateDestroyAPIView, PlaylistListCreateAPIView, AddVideoToPlaylistAPIView, PlaylistItemDestroyAPIView, PlaylistReorderItemsAPIView
+from .views import PlaylistViewSet, PlaylistRetrieveUpdateDestroyAPIView, PlaylistListCreateAPIView, AddVideoToPlaylistAPIView, PlaylistItemDestroyAPIView, PlaylistReorderItemsAPIView, PlaylistMoveItemAPIView, BulkAddVideosToPlaylistAPIView, BulkRemovePlaylistItemsAPIView
 
 router = DefaultRouter()
 router.register(r'playlists', PlaylistViewSet, basename='playlist')
@@ -16,8 +16,11 @@ urlpatterns = [
     path('playlists/', PlaylistListCreateAPIView.as_view(), name='playlist-list-create'),
     path('playlists/<uuid:pk>/', PlaylistRetrieveUpdateDestroyAPIView.as_view(), name='playlist-detail'), 
     path('playlists/<uuid:playlist_pk>/items/', AddVideoToPlaylistAPIView.as_view(), name='playlist-add-item'),
-    path('playlists/<uuid:playlist_pk>/items/<int:item_pk>/', PlaylistItemDestroyAPIView.as_view(), name='playlist-remove-item'),
+    path('playlists/<uuid:playlist_pk>/items/bulk-add/', BulkAddVideosToPlaylistAPIView.as_view(), name='playlist-bulk-add-items'),
+    path('playlists/<uuid:playlist_pk>/items/bulk-remove/', BulkRemovePlaylistItemsAPIView.as_view(), name='playlist-bulk-remove-items'),
+    path('playlists/<uuid:playlist_pk>/items/<uuid:item_pk>/', PlaylistItemDestroyAPIView.as_view(), name='playlist-remove-item'),
     path('playlists/<uuid:playlist_pk>/reorder-items/', PlaylistReorderItemsAPIView.as_view(), name='playlist-reorder-items'),
+    path('playlists/<uuid:playlist_pk>/items/<uuid:item_pk>/move/', PlaylistMoveItemAPIView.as_view(), name='playlist-move-item'),
 ]
 
 # URLs generated by router will include:
@@ -1,18 +1,29 @@
 from rest_framework import generics, status, serializers, viewsets
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
+from .discovery import get_page, set_page, invalidate_public_playlists
 from .models import Playlist, PlaylistItem
+from .pagination import PublicPlaylistCursorPagination
 from .serializers import (
     PlaylistSerializer,
+    PlaylistSummarySerializer,
     PlaylistCreateSerializer,
     PlaylistItemSerializer,
     PlaylistItemCreateSerializer,
-    PlaylistItemReorderSerializer
+    PlaylistItemReorderSerializer,
+    PlaylistItemMoveSerializer,
+    PlaylistItemBulkCreateSerializer,
+    PlaylistItemBulkRemoveSerializer
 )
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from django.db import models
+from django.db.models import prefetch_related_objects
+
+def invalidate_if_public(playlist):
+    """Drop the cached discovery listing after a change to a public playlist."""
+    if playlist.is_public:
+        invalidate_public_playlists()
 
 class PlaylistListCreateAPIView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
@@ -20,13 +31,14 @@ class PlaylistListCreateAPIView(generics.ListCreateAPIView):
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return PlaylistCreateSerializer
-        return PlaylistSerializer
+        return PlaylistSummarySerializer
 
     def get_queryset(self):
         # Fix: Avoid filtering by user if this is a schema (Swagger) generation request
         if getattr(self, 'swagger_fake_view', False):
             return Playlist.objects.none()
-        return Playlist.objects.filter(user=self.request.user).prefetch_related('items')
+        # Listings only carry summaries; items are loaded by the detail endpoint.
+        return Playlist.objects.filter(user=self.request.user).with_summary()
 
     def perform_create(self, serializer):
         serializer.save() # The user is passed in the serializer context or handled in the serializer's create method.
@@ -50,6 +62,14 @@ class PlaylistRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
         playlist = get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'], user=self.request.user)
         return playlist
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_if_public(serializer.instance)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_if_public(instance)
+
 class AddVideoToPlaylistAPIView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = PlaylistItemCreateSerializer
@@ -65,11 +85,9 @@ class AddVideoToPlaylistAPIView(generics.CreateAPIView):
             # Alternative approaches could include returning the existing item or a specific message.
             raise serializers.ValidationError({"video_id": "This video already exists in this playlist."})
 
-        # Determine the order for the new item.
-        last_item = playlist.items.order_by('-order').first()
-        order = (last_item.order + 1) if last_item else 1
-        
-        serializer.save(playlist=playlist, order=order)
+        # Take the next append position from the playlist's sequence.
+        serializer.save(playlist=playlist, order=playlist.reserve_item_orders()[0])
+        invalidate_if_public(playlist)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -91,8 +109,8 @@ class PlaylistItemDestroyAPIView(generics.DestroyAPIView):
         # Ensures items are queried within the context of the user's playlist.
         playlist_pk = self.kwargs.get('playlist_pk')
         # Ensures the playlist belongs to the current authenticated user.
-        playlist = get_object_or_404(Playlist, pk=playlist_pk, user=self.request.user)
-        return PlaylistItem.objects.filter(playlist=playlist)
+        self.playlist = get_object_or_404(Playlist, pk=playlist_pk, user=self.request.user)
+        return PlaylistItem.objects.filter(playlist=self.playlist)
 
     def get_object(self):
         # Standard object lookup; the queryset is already filtered by user and playlist.
@@ -101,10 +119,106 @@ class PlaylistItemDestroyAPIView(generics.DestroyAPIView):
 
     def perform_destroy(self, instance):
         super().perform_destroy(instance)
+        invalidate_if_public(self.playlist)
         # Optional: Re-ordering remaining items if 'order' needs to be contiguous.
         # This can be complex and might be better handled separately or omitted.
         # Currently, deleting an item will leave a gap in 'order' numbers if they were contiguous.
 
+class BulkAddVideosToPlaylistAPIView(generics.GenericAPIView):
+    """
+    Append a list of videos (e.g. a whole search page) to a playlist.
+
+    Uses a fixed number of queries whatever the list size: the ownership
+    lookup, one query for the existing video IDs, one to reserve append
+    positions, one `bulk_create` and one to read back which rows it inserted.
+    Videos already in the playlist (or repeated in the request) are skipped,
+    and each entry gets its own outcome in the response.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = PlaylistItemBulkCreateSerializer
+
+    def post(self, request, *args, **kwargs):
+        playlist = get_object_or_404(Playlist, pk=self.kwargs['playlist_pk'], user=request.user)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = []
+        valid = []  # (result index, validated data)
+        for entry in serializer.validated_data['videos']:
+            item_serializer = PlaylistItemCreateSerializer(data=entry)
+            if item_serializer.is_valid():
+                valid.append((len(results), item_serializer.validated_data))
+                results.append({"video_id": item_serializer.validated_data['video_id'], "status": "added"})
+            else:
+                results.append({"video_id": entry.get('video_id'), "status": "invalid", "errors": item_serializer.errors})
+
+        existing_video_ids = set(playlist.items.filter(
+            video_id__in=[data['video_id'] for _, data in valid]
+        ).values_list('video_id', flat=True))
+
+        new_items = []  # (result index, item)
+        for index, data in valid:
+            if data['video_id'] in existing_video_ids:
+                results[index]['status'] = "duplicate"
+                continue
+            existing_video_ids.add(data['video_id'])
+            new_items.append((index, PlaylistItem(playlist=playlist, **data)))
+
+        if new_items:
+            # One statement reserves consecutive positions for all new items.
+            for (_, item), order in zip(new_items, playlist.reserve_item_orders(len(new_items))):
+                item.order = order
+
+        added = 0
+        if new_items:
+            # ignore_conflicts covers a concurrent add of the same video between
+            # the duplicate check above and the insert. Rows it skipped keep
+            # their unsaved pks, so read back which ones were really inserted.
+            PlaylistItem.objects.bulk_create([item for _, item in new_items], ignore_conflicts=True)
+            inserted = set(PlaylistItem.objects.filter(
+                pk__in=[item.pk for _, item in new_items]
+            ).values_list('pk', flat=True))
+            for index, item in new_items:
+                if item.pk in inserted:
+                    results[index]['item'] = PlaylistItemSerializer(item).data
+                    added += 1
+                else:
+                    results[index]['status'] = "duplicate"
+        if added:
+            invalidate_if_public(playlist)
+
+        return Response(
+            {"added": added, "results": results},
+            status=status.HTTP_201_CREATED if added else status.HTTP_200_OK
+        )
+
+class BulkRemovePlaylistItemsAPIView(generics.GenericAPIView):
+    """
+    Remove a list of items from a playlist with one DELETE, reporting for each
+    requested ID whether it was removed or not found in the playlist.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = PlaylistItemBulkRemoveSerializer
+
+    def post(self, request, *args, **kwargs):
+        playlist = get_object_or_404(Playlist, pk=self.kwargs['playlist_pk'], user=request.user)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item_ids = list(dict.fromkeys(serializer.validated_data['item_ids']))
+
+        with transaction.atomic():
+            found = set(playlist.items.filter(pk__in=item_ids).values_list('pk', flat=True))
+            if found:
+                playlist.items.filter(pk__in=found).delete()
+        if found:
+            invalidate_if_public(playlist)
+
+        results = [
+            {"id": str(item_id), "status": "removed" if item_id in found else "not_found"}
+            for item_id in item_ids
+        ]
+        return Response({"removed": len(found), "results": results}, status=status.HTTP_200_OK)
+
 # Future enhancements could include views for updating playlist items (e.g., reordering).
 # For example, a PlaylistItemUpdateAPIView could be implemented.
 
@@ -140,9 +254,9 @@ class PlaylistReorderItemsAPIView(generics.GenericAPIView):
             extra_items = input_item_pks - current_playlist_item_pks
             error_messages = []
             if missing_items:
-                error_messages.append(f"The following item IDs from the playlist are missing in the input: {list(missing_items)}.")
+                error_messages.append(f"The following item IDs from the playlist are missing in the input: {sorted(map(str, missing_items))}.")
             if extra_items:
-                error_messages.append(f"The following input item IDs do not belong to this playlist: {list(extra_items)}.")
+                error_messages.append(f"The following input item IDs do not belong to this playlist: {sorted(map(str, extra_items))}.")
             
             return Response(
                 {"error": "The provided list of item IDs does not exactly match the items in the playlist. " + " ".join(error_messages) + " A full list of all items in their new order is required."},
@@ -150,19 +264,16 @@ class PlaylistReorderItemsAPIView(generics.GenericAPIView):
             )
 
         # --- Perform Reorder Operation ---
+        # The whole new order is written with a single CASE update (batched for very large playlists).
         try:
             with transaction.atomic():
-                # Create a mapping of pk to item instance for efficient updates
-                items_map = {item.pk: item for item in playlist.items.all()}
-                for index, item_id in enumerate(item_ids_ordered_input):
-                    item_to_update = items_map.get(item_id)
-                    # This check is a safeguard, though previous validation should ensure item_to_update is found.
-                    if item_to_update is None: 
-                        # This state should not be reached if above validations are correct.
-                        # Consider logging this as a server-side anomaly.
-                        raise PlaylistItem.DoesNotExist(f"PlaylistItem with id {item_id} not found in playlist during reorder, despite passing validation.")
-                    item_to_update.order = index + 1 # Assuming 1-based order for client-facing display or consistency.
-                    item_to_update.save(update_fields=['order'])
+                updated = playlist.items.set_order(item_ids_ordered_input)
+                if updated != len(item_ids_ordered_input):
+                    # This state should not be reached if above validations are correct
+                    # (e.g. an item was deleted concurrently).
+                    raise PlaylistItem.DoesNotExist(
+                        f"Updated {updated} of {len(item_ids_ordered_input)} items during reorder, despite passing validation."
+                    )
         except PlaylistItem.DoesNotExist as e:
             # Log this exception, as it indicates a potential flaw in validation logic if reached.
             # logger.error(f"Error during reorder: {str(e)}") # Use logging if needed
@@ -177,26 +288,108 @@ class PlaylistReorderItemsAPIView(generics.GenericAPIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
             
+        invalidate_if_public(playlist)
         # Return the updated playlist, reflecting the new order.
-        # Fetching the playlist again to ensure items are correctly ordered in the serializer.
-        updated_playlist = Playlist.objects.prefetch_related('items').get(pk=playlist.pk)
-        updated_playlist_serializer = PlaylistSerializer(updated_playlist)
+        # Only the items are loaded again; the playlist itself is unchanged.
+        prefetch_related_objects([playlist], 'items')
+        updated_playlist_serializer = PlaylistSerializer(playlist)
         return Response(updated_playlist_serializer.data, status=status.HTTP_200_OK)
 
+class PlaylistMoveItemAPIView(generics.GenericAPIView):
+    """
+    Move one item directly before or after another item of the same playlist.
+    Only the moved item is rewritten (see `PlaylistItemQuerySet.move_item`),
+    so drag-and-drop doesn't need to send the full order.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = PlaylistItemMoveSerializer
+
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        before = serializer.validated_data.get('before')
+        after = serializer.validated_data.get('after')
+        item_pk = self.kwargs['item_pk']
+        if (before or after) == item_pk:
+            return Response(
+                {"error": "An item cannot be moved relative to itself."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            # Locking the playlist row serializes concurrent moves within one playlist.
+            playlist = get_object_or_404(
+                Playlist.objects.select_for_update(), pk=self.kwargs['playlist_pk'], user=request.user
+            )
+            items = {item.pk: item for item in playlist.items.filter(pk__in=[item_pk, before or after])}
+            if item_pk not in items:
+                return Response({"error": "Item not found in this playlist."}, status=status.HTTP_404_NOT_FOUND)
+            if (before or after) not in items:
+                return Response(
+                    {"error": "The target item does not belong to this playlist."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            item = items[item_pk]
+            item.order = playlist.items.move_item(
+                item,
+                before=items[before] if before else None,
+                after=items[after] if after else None
+            )
+        invalidate_if_public(playlist)
+        return Response(PlaylistItemSerializer(item).data, status=status.HTTP_200_OK)
+
 class PlaylistViewSet(viewsets.ModelViewSet):
     serializer_class = PlaylistSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action in ('list', 'discover'):
+            return PlaylistSummarySerializer
+        return PlaylistSerializer
+
     def get_queryset(self):
-        return Playlist.objects.filter(
-            models.Q(user=self.request.user) |
-            models.Q(shared_with=self.request.user) |
-            models.Q(is_public=True)
-        ).distinct()
+        if self.action == 'discover':
+            return Playlist.objects.filter(is_public=True).with_summary()
+        queryset = Playlist.objects.visible_to(self.request.user)
+        if self.action == 'list':
+            # Listings only carry summaries; items are loaded by the detail endpoint.
+            return queryset.with_summary()
+        return queryset.select_related('user').prefetch_related('items')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_if_public(serializer.instance)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_if_public(instance)
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny],
+            pagination_class=PublicPlaylistCursorPagination)
+    def discover(self, request):
+        """
+        Public playlists, newest first, as cursor-paginated summaries. Pages
+        are the same for every user and are served from the cache until a
+        public playlist changes (see `playlists.discovery`).
+        """
+        paginator = self.paginator
+        cursor = paginator.decode_cursor(request)  # 404 for a malformed cursor
+        page_size = paginator.get_page_size(request)
+        cached = get_page(cursor, page_size)
+        if cached is None:
+            page = self.paginate_queryset(self.get_queryset())
+            cached = (self.get_serializer(page, many=True).data, *paginator.get_page_cursors())
+            set_page(cursor, page_size, cached)
+        results, next_cursor, previous_cursor = cached
+        return Response({
+            'next': paginator.get_link(request, next_cursor),
+            'previous': paginator.get_link(request, previous_cursor),
+            'results': results,
+        })
+
     @action(detail=True, methods=['post'])
     def share(self, request, pk=None):
         playlist = self.get_object()
@@ -231,4 +424,5 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         
         playlist.is_public = True
         playlist.save()
+        invalidate_public_playlists()
         return Response({"message": "Playlist is now public"})